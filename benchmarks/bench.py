@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# PartMgr - Database benchmarks
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from partmgr.core.database import *
+from partmgr.core.version import *
+from gendb import *
+
+import argparse
+import contextlib
+import json
+import platform
+import sqlite3
+import tempfile
+import time
+
+
+class Benchmark:
+	"""Database benchmark runner.
+	Each benchmark is a method bench_<name>(db) that returns
+	the number of processed operations.
+	The database caches are cleared before each run.
+	"""
+
+	# Number of stock items modified by the modify benchmarks.
+	NR_MODIFY = 200
+
+	# Time budgets in seconds: { benchmark name : seconds }
+	# They apply to databases with up to BUDGET_ITEMS stock items.
+	BUDGETS = {
+		"globalStats"	: 0.2,
+	}
+	BUDGET_ITEMS = 100000
+
+	def __init__(self, filename, repeat=3):
+		self.filename = filename
+		self.repeat = repeat
+
+	def run(self, names=None):
+		"""Run the benchmarks 'names' (or all).
+		Returns a list of result dicts.
+		"""
+		results = []
+		if not names or "open" in names:
+			results.append(self.__measure("open", self.bench_open, None))
+		db = Database(self.filename)
+		try:
+			nrItems = db.getGlobalStats().counts["stock"]
+			for name in sorted(dir(self)):
+				if not name.startswith("bench_") or name == "bench_open":
+					continue
+				name = name[len("bench_"):]
+				if names and name not in names:
+					continue
+				result = self.__measure(name,
+					getattr(self, "bench_" + name), db)
+				budget = self.BUDGETS.get(name)
+				if budget is not None and nrItems <= self.BUDGET_ITEMS:
+					result["budget"] = budget
+					result["overBudget"] = result["seconds"] > budget
+				results.append(result)
+		finally:
+			db.close(collectGarbage=False, updateRevision=False)
+		return results
+
+	def __measure(self, name, func, db):
+		times, ops = [], 0
+		for i in range(self.repeat):
+			databaseCache.clear(DatabaseCache.ALL)
+			start = time.perf_counter()
+			ops = func(db)
+			times.append(time.perf_counter() - start)
+		best = min(times)
+		result = {
+			"name"		: name,
+			"seconds"	: best,
+			"allSeconds"	: times,
+			"ops"		: ops,
+			"opsPerSec"	: (ops / best) if best > 0 else None,
+		}
+		print("%-24s %10.4f s %10d ops %12.1f ops/s" % (
+		      name, best, ops, result["opsPerSec"] or 0.0))
+		return result
+
+	def bench_open(self, db):
+		db = Database(self.filename)
+		db.close(collectGarbage=False, updateRevision=False)
+		return 1
+
+	def bench_treeExpand(self, db):
+		# Expand the whole category tree like the GUI tree does.
+		ops = 0
+		categories = db.getRootCategories()
+		while categories:
+			nextCategories = []
+			for category in categories:
+				db.countChildCategories(category)
+				db.countStockItemsByCategory(category)
+				db.getStockItemsByCategory(category)
+				nextCategories.extend(db.getChildCategories(category))
+				ops += 1
+			categories = nextCategories
+		return ops
+
+	def bench_stockItemsToPurchase(self, db):
+		return len(db.getStockItemsToPurchase())
+
+	def bench_hydrateStockItems(self, db):
+		return len(db.getAllStockItems())
+
+	def bench_hydrateDetails(self, db):
+		# Load origins, storages and parameters like the
+		# stock item view does.
+		ops = 0
+		for stockItem in db.getAllStockItems()[:self.NR_MODIFY * 10]:
+			db.getOriginsByStockItem(stockItem)
+			db.getStoragesByStockItem(stockItem)
+			db.getAllParametersByParent(Parameter.PTYPE_STOCKITEM,
+						    stockItem)
+			ops += 1
+		return ops
+
+	def bench_page(self, db):
+		ops, key = 0, None
+		while True:
+			entities, key = db.page("StockItem", key, limit=500)
+			ops += len(entities)
+			if key is None:
+				return ops
+
+	def bench_globalStats(self, db):
+		db.getGlobalStats()
+		return 1
+
+	def bench_valuation(self, db):
+		db.getValuation()
+		return 1
+
+	def bench_modify(self, db):
+		# Every modification commits on its own.
+		stockItems = db.getAllStockItems()[:self.NR_MODIFY]
+		for stockItem in stockItems:
+			stockItem.minQuantity += 1
+			db.modifyStockItem(stockItem)
+		return len(stockItems)
+
+	def bench_modifyTransaction(self, db):
+		stockItems = db.getAllStockItems()[:self.NR_MODIFY * 10]
+		with db.transaction():
+			for stockItem in stockItems:
+				stockItem.minQuantity += 1
+				db.modifyStockItem(stockItem)
+		return len(stockItems)
+
+def main(argv, out=sys.stdout):
+	p = argparse.ArgumentParser(
+		description="Run the PartMgr database benchmarks. "
+			    "Exits with status 2, if a benchmark exceeds "
+			    "its time budget.")
+	p.add_argument("-n", "--items", type=int, action="append",
+		       help="Number of stock items of the generated database. "
+			    "Can be given multiple times. (default: 1000)")
+	p.add_argument("-D", "--database",
+		       help="Benchmark an existing .pmg file "
+			    "instead of generated ones. It is modified.")
+	p.add_argument("-r", "--repeat", type=int, default=3,
+		       help="Repetitions per benchmark. The best time "
+			    "is reported. (default: 3)")
+	p.add_argument("-b", "--bench", action="append",
+		       help="Only run this benchmark. "
+			    "Can be given multiple times.")
+	p.add_argument("-o", "--output",
+		       help="Write the JSON results to this file "
+			    "(default: stdout)")
+	args = p.parse_args(argv[1:])
+
+	report = {
+		"partmgrVersion"	: VERSION_STRING,
+		"python"		: platform.python_version(),
+		"sqlite"		: sqlite3.sqlite_version,
+		"platform"		: platform.platform(),
+		"time"			: time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"runs"			: [],
+	}
+	try:
+		with tempfile.TemporaryDirectory() as tmpdir:
+			if args.database:
+				databases = [ (None, args.database) ]
+			else:
+				databases = []
+				for nrItems in args.items or [ 1000 ]:
+					filename = os.path.join(tmpdir,
+						"bench-%d.pmg" % nrItems)
+					print("Generating %d stock items..." % nrItems)
+					start = time.perf_counter()
+					DatabaseGenerator(GeneratorConfig(
+						nrStockItems=nrItems)).generate(filename)
+					print("Generated in %.2f s" % (
+					      time.perf_counter() - start))
+					databases.append((nrItems, filename))
+			for nrItems, filename in databases:
+				results = Benchmark(filename, args.repeat).run(args.bench)
+				report["runs"].append({
+					"items"		: nrItems,
+					"fileSize"	: os.path.getsize(filename),
+					"results"	: results,
+				})
+	except PartMgrError as e:
+		print("Error: %s" % str(e), file=sys.stderr)
+		return 1
+
+	text = json.dumps(report, indent=2)
+	if args.output:
+		with open(args.output, "w", encoding="UTF-8") as fd:
+			fd.write(text + "\n")
+	else:
+		print(text, file=out)
+
+	overBudget = [ (run["items"], r) for run in report["runs"]
+		       for r in run["results"] if r.get("overBudget") ]
+	for nrItems, r in overBudget:
+		print("Over budget: %s took %.4f s (budget %.4f s)%s" % (
+		      r["name"], r["seconds"], r["budget"],
+		      "" if nrItems is None else " with %d items" % nrItems),
+		      file=sys.stderr)
+	return 2 if overBudget else 0
+
+if __name__ == "__main__":
+	# Keep the JSON on stdout clean of the Database status messages.
+	out = sys.stdout
+	with contextlib.redirect_stdout(sys.stderr):
+		ret = main(sys.argv, out)
+	sys.exit(ret)
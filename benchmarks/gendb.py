@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# PartMgr - Synthetic benchmark database generator
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from partmgr.core.database import *
+
+import argparse
+import random
+import struct
+import zlib
+
+
+class GeneratorConfig:
+	"Synthetic database parameters."
+
+	def __init__(self,
+		     nrStockItems=1000,
+		     categoryDepth=3,
+		     categoryFanout=6,
+		     nrSuppliers=8,
+		     nrLocations=50,
+		     nrFootprints=40,
+		     partsRatio=0.25,
+		     footprintImageSize=64,
+		     maxOriginsPerItem=3,
+		     maxStoragesPerItem=2,
+		     maxParametersPerItem=3,
+		     seed=42):
+		self.nrStockItems = nrStockItems
+		self.categoryDepth = categoryDepth
+		self.categoryFanout = categoryFanout
+		self.nrSuppliers = nrSuppliers
+		self.nrLocations = nrLocations
+		self.nrFootprints = nrFootprints
+		# Number of parts per stock item. About half of the
+		# stock items reference a part.
+		self.partsRatio = partsRatio
+		self.footprintImageSize = footprintImageSize
+		self.maxOriginsPerItem = maxOriginsPerItem
+		self.maxStoragesPerItem = maxStoragesPerItem
+		self.maxParametersPerItem = maxParametersPerItem
+		self.seed = seed
+
+class DatabaseGenerator:
+	"""Generate a realistic .pmg file for benchmarking.
+	The rows are inserted with raw SQL in one transaction.
+	"""
+
+	# Number of stock items inserted per executemany() batch.
+	CHUNK_SIZE = 5000
+
+	VALUE_PREFIXES	= ("R", "C", "L", "D", "Q", "U", "J", "F", "Y")
+	VALUE_SUFFIXES	= ("", "k", "M", "p", "n", "u", "m")
+	PARAM_NAMES	= ("value", "tolerance", "voltage", "power",
+			   "package", "manufacturer")
+	FOOTPRINTS	= ("R_0402", "R_0603", "R_0805", "C_0402", "C_0603",
+			   "C_0805", "SOT-23", "SOT-223", "SOIC-8", "SOIC-16",
+			   "TSSOP-20", "QFN-32", "TQFP-44", "DIP-8", "TO-220")
+
+	def __init__(self, config):
+		self.config = config
+		self.rand = random.Random(config.seed)
+
+	def generate(self, filename):
+		"""Create the database 'filename'.
+		An existing file is replaced.
+		"""
+		if os.path.exists(filename):
+			os.unlink(filename)
+		db = Database(filename)
+		try:
+			stamp = Timestamp()
+			stamp.setNow()
+			self.now = stamp.getStampInt()
+			with db.transaction() as c:
+				categories = self.__genCategories(c)
+				suppliers = self.__genNamed(c, "suppliers",
+					("Supplier %d" % i
+					 for i in range(self.config.nrSuppliers)),
+					("url",), lambda: (toBase64("https://example.com"),))
+				locations = self.__genNamed(c, "locations",
+					("Box %d" % i
+					 for i in range(self.config.nrLocations)))
+				footprints = self.__genNamed(c, "footprints",
+					("%s-%d" % (self.FOOTPRINTS[i % len(self.FOOTPRINTS)], i)
+					 for i in range(self.config.nrFootprints)),
+					("image",), lambda: (self.__genImage(),))
+				parts = self.__genParts(c, categories)
+				self.__genStock(c, categories, parts, suppliers,
+						locations, footprints)
+		finally:
+			db.close()
+
+	def __entityRow(self, name):
+		return (toBase64(name), toBase64(""), 0, self.now, self.now)
+
+	def __genNamed(self, c, table, names, columns=(), values=lambda: ()):
+		c.executemany("INSERT INTO %s(name, description, flags, "
+			      "createTimeStamp, modifyTimeStamp%s) "
+			      "VALUES(?,?,?,?,?%s);" % (
+			      table,
+			      "".join(", " + col for col in columns),
+			      ",?" * len(columns)),
+			      (self.__entityRow(name) + values() for name in names))
+		c.execute("SELECT id FROM %s ORDER BY id;" % table)
+		return [ int(d[0]) for d in c.fetchall() ]
+
+	def __genCategories(self, c):
+		# Returns the list of leaf category ids.
+		level = [ Entity.NO_ID ]
+		for depth in range(max(self.config.categoryDepth, 1)):
+			nextLevel = []
+			for parent in level:
+				for i in range(self.config.categoryFanout):
+					c.execute("INSERT INTO categories(name, "
+						  "description, flags, "
+						  "createTimeStamp, modifyTimeStamp, "
+						  "parent) VALUES(?,?,?,?,?,?);",
+						  self.__entityRow("Category %d.%d" % (
+						  depth, len(nextLevel))) + (parent,))
+					nextLevel.append(c.lastrowid)
+			level = nextLevel
+		return level
+
+	def __genParts(self, c, categories):
+		# Returns a list of (part id, category id).
+		parts = []
+		for i in range(int(self.config.nrStockItems *
+				   self.config.partsRatio)):
+			category = self.rand.choice(categories)
+			c.execute("INSERT INTO parts(name, description, flags, "
+				  "createTimeStamp, modifyTimeStamp, category) "
+				  "VALUES(?,?,?,?,?,?);",
+				  self.__entityRow("Part %d" % i) + (category,))
+			parts.append((c.lastrowid, category))
+		return parts
+
+	def __genImage(self):
+		# Random noise PNG image. Noise does not compress, so this
+		# is the worst case for the footprint image size.
+		size = self.config.footprintImageSize
+		raw = b"".join(b"\x00" + bytes(self.rand.getrandbits(8)
+					       for i in range(size * 3))
+			       for y in range(size))
+		def chunk(tag, data):
+			return struct.pack(">I", len(data)) + tag + data +\
+			       struct.pack(">I", zlib.crc32(tag + data))
+		png = b"\x89PNG\r\n\x1a\n" +\
+		      chunk(b"IHDR", struct.pack(">IIBBBBB", size, size,
+						 8, 2, 0, 0, 0)) +\
+		      chunk(b"IDAT", zlib.compress(raw)) +\
+		      chunk(b"IEND", b"")
+		return toBase64(png)
+
+	def __genValue(self):
+		return "%s%d%s" % (self.rand.choice(self.VALUE_PREFIXES),
+				   self.rand.choice((1, 2, 3, 4, 5, 6, 8)) *
+				   10 ** self.rand.randint(0, 2),
+				   self.rand.choice(self.VALUE_SUFFIXES))
+
+	def __genStock(self, c, categories, parts, suppliers, locations,
+		       footprints):
+		cfg = self.config
+		rand = self.rand
+		c.execute("SELECT IFNULL(MAX(id), 0) FROM stock;")
+		nextId = int(c.fetchone()[0]) + 1
+		for first in range(0, cfg.nrStockItems, self.CHUNK_SIZE):
+			stockRows, originRows, storageRows, paramRows = [], [], [], []
+			for i in range(first, min(first + self.CHUNK_SIZE,
+						  cfg.nrStockItems)):
+				stockId = nextId
+				nextId += 1
+				value = self.__genValue()
+				minQuantity = rand.choice((0, 0, 10, 100))
+				if parts and rand.random() < 0.5:
+					part, category = rand.choice(parts)
+				else:
+					part, category = Entity.NO_ID, rand.choice(categories)
+				stockRows.append((stockId,) +
+					self.__entityRow("%s #%d" % (value, i)) +
+					(part, category,
+					 rand.choice(footprints) if footprints and
+					 rand.random() < 0.8 else Entity.NO_ID,
+					 minQuantity, minQuantity * 2,
+					 StockItem.UNIT_PC))
+				for j in range(rand.randint(0, cfg.maxOriginsPerItem)):
+					price = round(rand.uniform(0.01, 20.0), 3)
+					originRows.append(self.__entityRow("") +
+						(stockId,
+						 rand.choice(suppliers) if suppliers
+						 else Entity.NO_ID,
+						 toBase64("%06d" % rand.randint(0, 999999)),
+						 price if rand.random() < 0.9
+						 else Origin.NO_PRICE,
+						 self.now, rand.choice((1.0, 1.0, 0.01))))
+				for j in range(rand.randint(0, cfg.maxStoragesPerItem)):
+					storageRows.append(self.__entityRow("") +
+						(stockId,
+						 rand.choice(locations) if locations
+						 else Entity.NO_ID,
+						 rand.randint(0, 500)))
+				for j in range(rand.randint(0, cfg.maxParametersPerItem)):
+					paramRows.append(self.__entityRow(
+						rand.choice(self.PARAM_NAMES)) +
+						(Parameter.PTYPE_STOCKITEM, stockId,
+						 toBase64(value if j == 0
+							  else self.__genValue())))
+			c.executemany("INSERT INTO stock(id, name, description, "
+				      "flags, createTimeStamp, modifyTimeStamp, "
+				      "part, category, footprint, minQuantity, "
+				      "targetQuantity, quantityUnits) "
+				      "VALUES(?,?,?,?,?,?,?,?,?,?,?,?);",
+				      stockRows)
+			c.executemany("INSERT INTO origins(name, description, "
+				      "flags, createTimeStamp, modifyTimeStamp, "
+				      "stockItem, supplier, orderCode, price, "
+				      "priceTimeStamp, priceFact) "
+				      "VALUES(?,?,?,?,?,?,?,?,?,?,?);",
+				      originRows)
+			c.executemany("INSERT INTO storages(name, description, "
+				      "flags, createTimeStamp, modifyTimeStamp, "
+				      "stockItem, location, quantity) "
+				      "VALUES(?,?,?,?,?,?,?,?);",
+				      storageRows)
+			c.executemany("INSERT INTO parameters(name, description, "
+				      "flags, createTimeStamp, modifyTimeStamp, "
+				      "parentType, parent, data) "
+				      "VALUES(?,?,?,?,?,?,?,?);",
+				      paramRows)
+
+def main(argv):
+	p = argparse.ArgumentParser(
+		description="Generate a synthetic PartMgr benchmark database")
+	p.add_argument("filename", help="Output .pmg file")
+	p.add_argument("-n", "--items", type=int, default=1000,
+		       help="Number of stock items (default: 1000)")
+	p.add_argument("-d", "--depth", type=int, default=3,
+		       help="Category tree depth (default: 3)")
+	p.add_argument("-f", "--fanout", type=int, default=6,
+		       help="Sub categories per category (default: 6)")
+	p.add_argument("-s", "--seed", type=int, default=42,
+		       help="Random seed (default: 42)")
+	args = p.parse_args(argv[1:])
+	try:
+		DatabaseGenerator(GeneratorConfig(nrStockItems=args.items,
+						  categoryDepth=args.depth,
+						  categoryFanout=args.fanout,
+						  seed=args.seed)).generate(args.filename)
+	except PartMgrError as e:
+		print("Error: %s" % str(e), file=sys.stderr)
+		return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
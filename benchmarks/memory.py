@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# PartMgr - Entity memory benchmark
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from partmgr.core.database import *
+from gendb import *
+
+import argparse
+import contextlib
+import gc
+import json
+import tempfile
+import tracemalloc
+
+
+class MemoryBenchmark:
+	"""Measure the memory of hydrated entities.
+	The entities are loaded with the database cache disabled,
+	so only the entity objects themselves are accounted.
+	"""
+
+	def __init__(self, filename):
+		self.filename = filename
+
+	def run(self):
+		"""Returns a list of result dicts.
+		"""
+		db = Database(self.filename)
+		databaseCache.ENABLED = False
+		try:
+			stockItems = db.getAllStockItems()
+			results = [
+				self.__measure("StockItem",
+					lambda: db.getAllStockItems()),
+				self.__measure("Origin",
+					lambda: [ o for s in stockItems
+						  for o in db.getOriginsByStockItem(s) ]),
+				self.__measure("Storage",
+					lambda: [ s for item in stockItems
+						  for s in db.getStoragesByStockItem(item) ]),
+			]
+		finally:
+			databaseCache.ENABLED = True
+			db.close(collectGarbage=False, updateRevision=False)
+		return results
+
+	def __measure(self, name, load):
+		gc.collect()
+		tracemalloc.start()
+		try:
+			before = tracemalloc.get_traced_memory()[0]
+			entities = load()
+			after = tracemalloc.get_traced_memory()[0]
+		finally:
+			tracemalloc.stop()
+		count = len(entities)
+		result = {
+			"entity"		: name,
+			"count"			: count,
+			"bytes"			: after - before,
+			"bytesPerEntity"	: ((after - before) / count) if count else None,
+		}
+		print("%-12s %8d entities %12d bytes %10.1f bytes/entity" % (
+		      name, count, result["bytes"],
+		      result["bytesPerEntity"] or 0.0))
+		return result
+
+def main(argv, out=sys.stdout):
+	p = argparse.ArgumentParser(
+		description="Measure the memory used per hydrated PartMgr entity")
+	p.add_argument("-n", "--items", type=int, default=10000,
+		       help="Number of stock items of the generated database "
+			    "(default: 10000)")
+	p.add_argument("-D", "--database",
+		       help="Measure an existing .pmg file "
+			    "instead of a generated one.")
+	args = p.parse_args(argv[1:])
+	try:
+		with tempfile.TemporaryDirectory() as tmpdir:
+			filename = args.database
+			if not filename:
+				filename = os.path.join(tmpdir, "memory.pmg")
+				DatabaseGenerator(GeneratorConfig(
+					nrStockItems=args.items)).generate(filename)
+			results = MemoryBenchmark(filename).run()
+	except PartMgrError as e:
+		print("Error: %s" % str(e), file=sys.stderr)
+		return 1
+	print(json.dumps(results, indent=2), file=out)
+	return 0
+
+if __name__ == "__main__":
+	# Keep the JSON on stdout clean of the Database status messages.
+	out = sys.stdout
+	with contextlib.redirect_stdout(sys.stderr):
+		ret = main(sys.argv, out)
+	sys.exit(ret)
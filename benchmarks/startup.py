@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# PartMgr - GUI startup benchmark
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from partmgr.core.exception import *
+
+import argparse
+import contextlib
+import json
+import subprocess
+import tempfile
+import time
+
+
+class StartupBenchmark:
+	"""Measure the time from the process start until the main window
+	is shown with the database 'filename' loaded.
+	Each measurement starts a new Python interpreter.
+	"""
+
+	# Printed by the child process, when the main window is shown.
+	MARKER = "PARTMGR-STARTUP-SHOWN"
+
+	# Runs in the child process. argv[1] is the database file.
+	SCRIPT = """
+import os, sys
+from partmgr.gui.mainwindow import *
+app = QApplication(sys.argv[:1])
+mainwnd = PartMgrMainWindow()
+if not mainwnd.loadDatabaseFile(sys.argv[1]):
+	sys.exit(1)
+mainwnd.show()
+def shown():
+	print("%s", flush=True)
+	# Don't measure the shutdown.
+	os._exit(0)
+QTimer.singleShot(0, shown)
+app.exec()
+"""
+
+	def __init__(self, filename, platform=None):
+		self.filename = filename
+		self.platform = platform
+
+	def measure(self):
+		"""Start the GUI once. Returns the startup time in seconds.
+		"""
+		rootdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+		env = dict(os.environ)
+		env["PYTHONPATH"] = os.pathsep.join(
+			p for p in (rootdir, env.get("PYTHONPATH")) if p)
+		if self.platform:
+			env["QT_QPA_PLATFORM"] = self.platform
+		start = time.perf_counter()
+		proc = subprocess.Popen([ sys.executable, "-c",
+					  self.SCRIPT % self.MARKER,
+					  self.filename ],
+					env=env, cwd=rootdir,
+					stdin=subprocess.DEVNULL,
+					stdout=subprocess.PIPE,
+					stderr=subprocess.PIPE,
+					text=True)
+		elapsed = None
+		for line in proc.stdout:
+			if line.strip() == self.MARKER:
+				elapsed = time.perf_counter() - start
+				break
+		stdout, stderr = proc.communicate()
+		if elapsed is None:
+			raise PartMgrError("GUI startup failed:\n%s" % stderr)
+		return elapsed
+
+	def run(self, repeat=3):
+		"""Returns a result dict. The best time is reported.
+		"""
+		times = [ self.measure() for i in range(repeat) ]
+		best = min(times)
+		print("%-24s %10.4f s" % ("startup", best))
+		return {
+			"name"		: "startup",
+			"seconds"	: best,
+			"allSeconds"	: times,
+		}
+
+def main(argv, out=sys.stdout):
+	p = argparse.ArgumentParser(
+		description="Measure the PartMgr GUI startup time")
+	p.add_argument("-n", "--items", type=int, default=1000,
+		       help="Number of stock items of the generated database "
+			    "(default: 1000)")
+	p.add_argument("-D", "--database",
+		       help="Load an existing .pmg file "
+			    "instead of a generated one. It is modified.")
+	p.add_argument("-r", "--repeat", type=int, default=3,
+		       help="Repetitions. The best time is reported. "
+			    "(default: 3)")
+	p.add_argument("-p", "--platform",
+		       help="Qt platform plugin, e.g. 'offscreen' "
+			    "(default: QT_QPA_PLATFORM)")
+	args = p.parse_args(argv[1:])
+	try:
+		with tempfile.TemporaryDirectory() as tmpdir:
+			filename = args.database
+			if not filename:
+				from gendb import DatabaseGenerator, GeneratorConfig
+				filename = os.path.join(tmpdir, "startup.pmg")
+				DatabaseGenerator(GeneratorConfig(
+					nrStockItems=args.items)).generate(filename)
+			result = StartupBenchmark(filename, args.platform).run(
+				args.repeat)
+	except PartMgrError as e:
+		print("Error: %s" % str(e), file=sys.stderr)
+		return 1
+	print(json.dumps(result, indent=2), file=out)
+	return 0
+
+if __name__ == "__main__":
+	# Keep the JSON on stdout clean of the Database status messages.
+	out = sys.stdout
+	with contextlib.redirect_stdout(sys.stderr):
+		ret = main(sys.argv, out)
+	sys.exit(ret)
@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+#
+# PartMgr - Command line interface
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from partmgr.core.database import *
+from partmgr.core.importer import *
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+
+
+class RecordWriter:
+	"""Streaming record output.
+	Format 'csv' writes a header line and one CSV line per record.
+	Format 'json' writes one JSON object per line (JSON lines).
+	"""
+
+	FORMATS = ("csv", "json")
+
+	def __init__(self, fd, fmt, fields):
+		self.fd = fd
+		self.fmt = fmt
+		self.fields = fields
+		self.__csv = None
+		if fmt == "csv":
+			self.__csv = csv.writer(fd, lineterminator="\n")
+			self.__csv.writerow(fields)
+
+	def write(self, record):
+		"""Write the record dict. Missing fields are empty.
+		"""
+		if self.__csv:
+			self.__csv.writerow([ record.get(f, "") for f in self.fields ])
+		else:
+			self.fd.write(json.dumps({ f : record.get(f) for f in self.fields },
+						 ensure_ascii=False) + "\n")
+
+	@classmethod
+	def writeObject(cls, fd, fmt, obj):
+		"""Write one nested object (dicts and lists).
+		JSON writes it as one line. CSV writes 'field,value' lines
+		with the flattened field names (e.g. 'storages.0.quantity').
+		"""
+		if fmt == "json":
+			fd.write(json.dumps(obj, ensure_ascii=False) + "\n")
+			return
+		writer = cls(fd, fmt, ("field", "value"))
+		def flatten(prefix, value):
+			if isinstance(value, dict):
+				items = value.items()
+			elif isinstance(value, list):
+				items = enumerate(value)
+			else:
+				writer.write({ "field" : prefix, "value" : value })
+				return
+			for key, v in items:
+				flatten("%s.%s" % (prefix, key) if prefix else str(key), v)
+		flatten("", obj)
+
+class EntityNames:
+	"""Cached lookup of the names of referenced entities.
+	"""
+
+	CATEGORY_SEPARATOR = StockImporter.CATEGORY_SEPARATOR
+
+	def __init__(self, db):
+		self.db = db
+		self.__cache = {}
+
+	def __get(self, getter, entityId):
+		if not Entity.isValidId(entityId):
+			return ""
+		key = (getter, entityId)
+		name = self.__cache.get(key)
+		if name is None:
+			entity = getattr(self.db, getter)(entityId)
+			name = self.__cache[key] = entity.getName() if entity else ""
+		return name
+
+	def category(self, categoryId):
+		"""Get the category path, e.g. 'Passive/Resistors'.
+		"""
+		if not Entity.isValidId(categoryId):
+			return ""
+		key = ("categoryPath", categoryId)
+		path = self.__cache.get(key)
+		if path is None:
+			category = self.db.getCategory(categoryId)
+			if category:
+				path = self.category(category.parent)
+				if path:
+					path += self.CATEGORY_SEPARATOR
+				path += category.getName()
+			self.__cache[key] = path = path or ""
+		return path
+
+	def part(self, partId):
+		return self.__get("getPart", partId)
+
+	def footprint(self, footprintId):
+		return self.__get("getFootprint", footprintId)
+
+	def supplier(self, supplierId):
+		return self.__get("getSupplier", supplierId)
+
+	def location(self, locationId):
+		return self.__get("getLocation", locationId)
+
+class Cli:
+	"""partmgr-cli command implementations.
+	Each command is a method cmd_<name>(args), that writes its
+	output to self.out and returns the process exit code.
+	"""
+
+	STOCK_FIELDS = ("id", "name", "description", "category", "part",
+			"footprint", "quantity", "minQuantity",
+			"targetQuantity", "orderQuantity", "units")
+
+	ORDER_FIELDS = STOCK_FIELDS + ("orderCodes",)
+
+	STORAGE_FIELDS = ("id", "stockItem", "name", "location",
+			  "oldQuantity", "quantity", "units")
+
+	PRICE_FIELDS = ("origin", "stockItem", "name", "supplier",
+			"orderCode", "status", "oldPrice", "price")
+
+	# Commands that are run on a read-write database.
+	WRITE_COMMANDS = ("set-qty", "add-stock", "import", "fetch-prices")
+
+	# The StockImporter record format.
+	EXPORT_FIELDS = ("name", "description", "category", "part",
+			 "footprint", "minQuantity", "targetQuantity",
+			 "quantityUnits", "supplier", "orderCode", "price",
+			 "priceFact", "location", "quantity")
+
+	def __init__(self, db, fmt="csv", out=sys.stdout, inp=sys.stdin):
+		self.db = db
+		self.fmt = fmt
+		self.out = out
+		self.inp = inp
+		self.names = EntityNames(db)
+
+	def writer(self, fields):
+		return RecordWriter(self.out, self.fmt, fields)
+
+	def itemName(self, stockItem):
+		# StockItem.getName() may write the part name to the
+		# database, which fails on read-only databases.
+		return Entity.getName(stockItem) or self.names.part(stockItem.part)
+
+	def stockRecord(self, stockItem, quantity):
+		targetQuantity = max(stockItem.minQuantity, stockItem.targetQuantity)
+		return {
+			"id"		: stockItem.getId(),
+			"name"		: self.itemName(stockItem),
+			"description"	: stockItem.getDescription(),
+			"category"	: self.names.category(stockItem.category),
+			"part"		: self.names.part(stockItem.part),
+			"footprint"	: self.names.footprint(stockItem.footprint),
+			"quantity"	: quantity,
+			"minQuantity"	: stockItem.minQuantity,
+			"targetQuantity" : stockItem.targetQuantity,
+			"orderQuantity"	: max(0, targetQuantity - quantity),
+			"units"		: stockItem.getQuantityUnitsShort(),
+		}
+
+	def iterWithQuantities(self, stockItems):
+		"""Yield (stockItem, global quantity) for the stock item
+		iterable. The quantities are fetched in batches.
+		"""
+		stockItems = iter(stockItems)
+		while True:
+			batch = list(itertools.islice(stockItems,
+						      self.db.ITER_CHUNK_SIZE))
+			if not batch:
+				break
+			quantities = self.db.getGlobalQuantities(batch)
+			for stockItem in batch:
+				yield stockItem, quantities.get(stockItem.getId(), 0)
+
+	def getStockItem(self, stockItemId):
+		stockItem = self.db.getStockItem(stockItemId)
+		if not stockItem:
+			raise PartMgrError("Stock item %d does not exist" % stockItemId)
+		return stockItem
+
+	def cmd_search(self, args):
+		pattern = args.pattern.lower()
+		category = args.category.strip(EntityNames.CATEGORY_SEPARATOR)
+		writer = self.writer(self.STOCK_FIELDS)
+		def matches(stockItem):
+			if category:
+				path = self.names.category(stockItem.category)
+				if path != category and\
+				   not path.startswith(category + EntityNames.CATEGORY_SEPARATOR):
+					return False
+			return any(pattern in text.lower() for text in (
+				   self.itemName(stockItem),
+				   stockItem.getDescription(),
+				   self.names.part(stockItem.part),
+				   self.names.footprint(stockItem.footprint)))
+		for stockItem, quantity in self.iterWithQuantities(
+				filter(matches, self.db.iterStockItems())):
+			writer.write(self.stockRecord(stockItem, quantity))
+		return 0
+
+	def cmd_show(self, args):
+		stockItem = self.getStockItem(args.id)
+		storages = self.db.getStoragesByStockItem(stockItem)
+		obj = self.stockRecord(stockItem,
+				       sum(s.quantity for s in storages))
+		obj["origins"] = [ {
+			"id"		: o.getId(),
+			"supplier"	: self.names.supplier(o.supplier),
+			"orderCode"	: o.getOrderCode(),
+			"price"		: o.getPrice(),
+			"priceFact"	: o.getPriceFact(),
+			"priceTimeStamp" : o.getPriceTimeStampInt(),
+		} for o in self.db.getOriginsByStockItem(stockItem) ]
+		obj["storages"] = [ {
+			"id"		: s.getId(),
+			"location"	: self.names.location(s.location),
+			"quantity"	: s.quantity,
+		} for s in storages ]
+		obj["parameters"] = {
+			p.getName() : p.getData().decode(STR_ENCODING, "replace")
+			for p in self.db.getAllParametersByParent(
+				Parameter.PTYPE_STOCKITEM, stockItem)
+		}
+		RecordWriter.writeObject(self.out, self.fmt, obj)
+		return 0
+
+	def __getStorage(self, stockItem, locationName, create):
+		storages = self.db.getStoragesByStockItem(stockItem)
+		if locationName is None:
+			if len(storages) != 1:
+				raise PartMgrError("Stock item %d has %d storages. "
+					"Select one with --location." % (
+					stockItem.getId(), len(storages)))
+			return storages[0]
+		for storage in storages:
+			if self.names.location(storage.location) == locationName:
+				return storage
+		if not create:
+			raise PartMgrError("Stock item %d is not stored in '%s'" % (
+					   stockItem.getId(), locationName))
+		for location in self.db.getLocations():
+			if location.getName() == locationName:
+				return Storage("", stockItem=stockItem,
+					       location=location, quantity=0)
+		raise PartMgrError("Location '%s' does not exist" % locationName)
+
+	def __changeQuantity(self, args, newQuantity):
+		with self.db.transaction():
+			stockItem = self.getStockItem(args.id)
+			storage = self.__getStorage(stockItem, args.location,
+						    args.create)
+			oldQuantity = storage.quantity
+			quantity = newQuantity(oldQuantity)
+			if quantity < 0:
+				raise PartMgrError("The quantity of stock item %d "
+					"can not become negative (%d)" % (
+					stockItem.getId(), quantity))
+			storage.quantity = quantity
+			self.db.modifyStorage(storage)
+		# No output on errors, not even the CSV header.
+		self.writer(self.STORAGE_FIELDS).write({
+			"id"		: storage.getId(),
+			"stockItem"	: stockItem.getId(),
+			"name"		: self.itemName(stockItem),
+			"location"	: self.names.location(storage.location),
+			"oldQuantity"	: oldQuantity,
+			"quantity"	: quantity,
+			"units"		: stockItem.getQuantityUnitsShort(),
+		})
+		return 0
+
+	def cmd_set_qty(self, args):
+		return self.__changeQuantity(args, lambda old: args.quantity)
+
+	def cmd_add_stock(self, args):
+		return self.__changeQuantity(args, lambda old: old + args.quantity)
+
+	def cmd_to_order(self, args):
+		writer = self.writer(self.ORDER_FIELDS)
+		for stockItem, quantity in self.iterWithQuantities(
+				self.db.iterStockItemsToPurchase()):
+			record = self.stockRecord(stockItem, quantity)
+			record["orderCodes"] = "; ".join(
+				"%s: %s" % (self.names.supplier(o.supplier),
+					    o.getOrderCode())
+				for o in self.db.getOriginsByStockItem(stockItem))
+			writer.write(record)
+		return 0
+
+	def cmd_stats(self, args):
+		stats = self.db.getGlobalStats()
+		RecordWriter.writeObject(self.out, self.fmt, {
+			"counts"		: stats.counts,
+			"belowMinimum"		: stats.belowMinimum,
+			"withoutPrice"		: stats.withoutPrice,
+			"totalQuantity"		: stats.totalQuantity,
+			"inventoryValue"	: stats.inventoryValue,
+		})
+		return 0
+
+	def cmd_export(self, args):
+		# Only the first origin and storage fit into a record.
+		writer = self.writer(self.EXPORT_FIELDS)
+		for stockItem in self.db.iterStockItems():
+			record = self.stockRecord(stockItem, 0)
+			record["quantityUnits"] = record["units"]
+			origins = self.db.getOriginsByStockItem(stockItem)
+			if origins:
+				o = origins[0]
+				record["supplier"] = self.names.supplier(o.supplier)
+				record["orderCode"] = o.getOrderCode()
+				if o.hasPrice():
+					record["price"] = o.getPrice()
+				record["priceFact"] = o.getPriceFact()
+			storages = self.db.getStoragesByStockItem(stockItem)
+			if storages:
+				record["location"] = self.names.location(storages[0].location)
+				record["quantity"] = storages[0].quantity
+			writer.write(record)
+		return 0
+
+	def cmd_import(self, args):
+		importer = StockImporter(self.db)
+		if args.file == "-":
+			if self.fmt == "csv":
+				result = importer.importCsv(self.inp)
+			else:
+				result = importer.importJson(self.inp)
+		else:
+			result = importer.importFile(args.file)
+		self.writer(("rows", "seconds")).write({
+			"rows"		: result.rows,
+			"seconds"	: round(result.seconds, 3),
+		})
+		return 0
+
+	def __iterAllOrigins(self):
+		afterKey = None
+		while True:
+			origins, afterKey = self.db.page("Origin", afterKey)
+			yield from origins
+			if afterKey is None:
+				break
+
+	def cmd_fetch_prices(self, args):
+		# The price fetchers need http.client. Only load them here.
+		from partmgr.pricefetch import PriceFetcher
+
+		if args.all:
+			origins = self.__iterAllOrigins()
+		else:
+			origins = (origin
+				   for stockItem in self.db.iterStockItemsWithMissingPrice()
+				   for origin in self.db.getOriginsByStockItem(stockItem))
+		toFetch = {}
+		for origin in origins:
+			supplierName = self.names.supplier(origin.supplier).strip()
+			if supplierName and origin.getOrderCode().strip():
+				toFetch.setdefault(supplierName, []).append(origin)
+
+		currency = self.db.getGlobalParameter("currency")
+		currency = currency.getDataInt() if currency else Param_Currency.CURR_EUR
+		writer = self.writer(self.PRICE_FIELDS)
+		for supplierName in sorted(toFetch):
+			fetcherCls = PriceFetcher.get(supplierName)
+			if not fetcherCls:
+				print("No price fetcher for supplier '%s'" % supplierName)
+				continue
+			origins = toFetch[supplierName]
+			try:
+				self.__fetchPrices(writer, fetcherCls(), supplierName,
+						   origins, currency, args.dry_run)
+			except PriceFetcher.Error as e:
+				raise PartMgrError(str(e))
+		return 0
+
+	def __fetchPrices(self, writer, fetcher, supplierName, origins,
+			  currency, dryRun):
+		results = fetcher.getPrices(o.getOrderCode() for o in origins)
+		for origin, result in zip(origins, results):
+			record = {
+				"origin"	: origin.getId(),
+				"stockItem"	: origin.stockItem,
+				"name"		: self.itemName(self.getStockItem(origin.stockItem)),
+				"supplier"	: supplierName,
+				"orderCode"	: origin.getOrderCode(),
+				"oldPrice"	: origin.getPrice(),
+			}
+			if result.status != result.FOUND:
+				record["status"] = "notfound"
+			elif result.currency != currency:
+				record["status"] = "currency"
+			else:
+				record["status"] = "ok"
+				record["price"] = result.price
+				if not dryRun:
+					origin.setPrice(result.price)
+			writer.write(record)
+			self.out.flush()
+
+	@classmethod
+	def needsWrite(cls, args):
+		return args.command in cls.WRITE_COMMANDS and\
+		       not getattr(args, "dry_run", False)
+
+def parseArgs(argv):
+	p = argparse.ArgumentParser(
+		prog="partmgr-cli",
+		description="PartMgr command line interface. "
+			    "The database is opened read-only, unless "
+			    "the command modifies it.")
+	p.add_argument("-f", "--format", choices=RecordWriter.FORMATS,
+		       default="csv",
+		       help="Output format: CSV or JSON lines (default: csv)")
+	p.add_argument("database", help="PartMgr database file (.pmg)")
+	sub = p.add_subparsers(dest="command", metavar="COMMAND", required=True)
+
+	s = sub.add_parser("search", help="Search stock items")
+	s.add_argument("pattern",
+		       help="Case insensitive text in the name, description, "
+			    "part or footprint")
+	s.add_argument("-c", "--category", default="",
+		       help="Only search in this category path "
+			    "(e.g. 'Passive/Resistors') and its sub categories")
+
+	s = sub.add_parser("show", help="Show a stock item with its origins, "
+					"storages and parameters")
+	s.add_argument("id", type=int, help="Stock item id")
+
+	for name, text in (("set-qty", "Set the stored quantity"),
+			   ("add-stock", "Add to the stored quantity "
+					 "(negative to remove)")):
+		s = sub.add_parser(name, help=text)
+		s.add_argument("id", type=int, help="Stock item id")
+		s.add_argument("quantity", type=int, help="Quantity")
+		s.add_argument("-l", "--location",
+			       help="Storage location name. Required, if the "
+				    "stock item has more than one storage.")
+		s.add_argument("-C", "--create", action="store_true",
+			       help="Create the storage in --location, "
+				    "if it does not exist")
+
+	sub.add_parser("to-order", help="List the stock items below "
+					"their minimum quantity")
+	sub.add_parser("stats", help="Show the database statistics")
+	sub.add_parser("export", help="Export all stock items in the "
+				      "import record format. Only the first "
+				      "origin and storage are exported.")
+
+	s = sub.add_parser("import", help="Import stock items "
+					  "from a .csv, .json or .jsonl file")
+	s.add_argument("file", help="Input file or '-' for stdin "
+				    "(in the --format format)")
+
+	s = sub.add_parser("fetch-prices", help="Fetch origin prices "
+						"from the supplier web shops")
+	s.add_argument("-a", "--all", action="store_true",
+		       help="Update all prices instead of only "
+			    "fetching missing prices")
+	s.add_argument("-n", "--dry-run", action="store_true",
+		       help="Only show the prices. Don't store them.")
+	return p.parse_args(argv[1:])
+
+def main(argv, out=sys.stdout, inp=sys.stdin):
+	args = parseArgs(argv)
+	try:
+		db = Database(args.database, readOnly=not Cli.needsWrite(args))
+		try:
+			cli = Cli(db, args.format, out, inp)
+			return getattr(cli, "cmd_" + args.command.replace("-", "_"))(args)
+		finally:
+			db.close()
+	except PartMgrError as e:
+		print("Error: %s" % str(e), file=sys.stderr)
+		return 1
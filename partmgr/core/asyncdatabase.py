@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# PartMgr - asyncio database facade
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from partmgr.core.database import *
+
+import asyncio
+import concurrent.futures
+import itertools
+
+
+class AsyncDatabase:
+	"""asyncio facade for Database.
+
+	All Database calls are executed on one dedicated worker thread,
+	which also owns the SQLite connection.
+	Calls that are issued while the worker is busy are queued and
+	executed as one batch in a single executor round trip.
+
+	Awaitable versions of all Database get*, count*, modify* and del*
+	methods are available under the same name.
+	Note that the returned entities still reference the synchronous
+	Database. Their convenience methods (e.g. StockItem.getStorages())
+	must not be called from the event loop thread. Use the awaitable
+	methods or run() instead.
+	"""
+
+	# Wrapped Database method name prefixes.
+	METHOD_PREFIXES = ("get", "count", "modify", "del", )
+
+	# Maximum number of calls executed in one batch.
+	BATCH_SIZE = 64
+
+	# Default number of entities fetched per iterate() round trip.
+	ITER_CHUNK_SIZE = 256
+
+	def __init__(self):
+		self.db = None
+		self.__executor = concurrent.futures.ThreadPoolExecutor(
+			max_workers=1,
+			thread_name_prefix="partmgr-db")
+		self.__pending = []
+		self.__busy = False
+
+	@classmethod
+	async def open(cls, filename, **kwargs):
+		"""Open the database 'filename' on a new worker thread.
+		Returns the AsyncDatabase instance.
+		"""
+		self = cls()
+		try:
+			self.db = await self.__submit(Database, filename, **kwargs)
+		except BaseException:
+			self.__executor.shutdown(wait=False)
+			raise
+		return self
+
+	async def close(self, **kwargs):
+		"""Close the database and stop the worker thread.
+		"""
+		try:
+			if self.db:
+				await self.__submit(self.db.close, **kwargs)
+		finally:
+			self.__executor.shutdown(wait=False)
+
+	async def run(self, func, *args, **kwargs):
+		"""Run func(db, *args, **kwargs) on the worker thread.
+		This can be used for everything that is not covered
+		by the awaitable Database methods.
+		"""
+		return await self.__submit(func, self.db, *args, **kwargs)
+
+	async def iterate(self, methodName, *args,
+			  chunkSize=ITER_CHUNK_SIZE, **kwargs):
+		"""Asynchronously iterate over the result of
+		the Database method 'methodName'.
+		The result is transferred from the worker thread
+		in chunks of 'chunkSize' entities.
+		"""
+		method = getattr(self.db, methodName)
+		it = await self.__submit(lambda: iter(method(*args, **kwargs)))
+		try:
+			while True:
+				chunk = await self.__submit(
+					lambda: list(itertools.islice(it, chunkSize)))
+				if not chunk:
+					break
+				for entity in chunk:
+					yield entity
+		finally:
+			close = getattr(it, "close", None)
+			if close:
+				await self.__submit(close)
+
+	def __getattr__(self, name):
+		if not name.startswith(self.METHOD_PREFIXES) or\
+		   not callable(getattr(Database, name, None)):
+			raise AttributeError(name)
+		async def method(*args, **kwargs):
+			return await self.__submit(getattr(self.db, name),
+						   *args, **kwargs)
+		method.__name__ = name
+		return method
+
+	def __submit(self, func, *args, **kwargs):
+		loop = asyncio.get_running_loop()
+		future = loop.create_future()
+		self.__pending.append((future, func, args, kwargs))
+		if not self.__busy:
+			self.__busy = True
+			loop.call_soon(self.__startBatch, loop)
+		return future
+
+	def __startBatch(self, loop):
+		batch = self.__pending[:self.BATCH_SIZE]
+		del self.__pending[:self.BATCH_SIZE]
+		batch = [ b for b in batch if not b[0].cancelled() ]
+		if not batch:
+			self.__batchDone(loop)
+			return
+		try:
+			self.__executor.submit(self.__runBatch, loop, batch)
+		except RuntimeError as e:
+			# The executor has been shut down.
+			for future, func, args, kwargs in batch:
+				future.set_exception(PartMgrError(
+					"AsyncDatabase: %s" % str(e)))
+			self.__batchDone(loop)
+
+	def __runBatch(self, loop, batch):
+		# This runs on the worker thread.
+		results = []
+		for future, func, args, kwargs in batch:
+			try:
+				results.append((future, func(*args, **kwargs), None))
+			except BaseException as e:
+				results.append((future, None, e))
+		loop.call_soon_threadsafe(self.__finishBatch, loop, results)
+
+	def __finishBatch(self, loop, results):
+		for future, result, exception in results:
+			if future.cancelled():
+				continue
+			if exception is None:
+				future.set_result(result)
+			else:
+				future.set_exception(exception)
+		self.__batchDone(loop)
+
+	def __batchDone(self, loop):
+		if self.__pending:
+			self.__startBatch(loop)
+		else:
+			self.__busy = False
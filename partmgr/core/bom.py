@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+#
+# PartMgr - Bill of materials
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from partmgr.core.database import *
+
+import csv
+import os
+import re
+import xml.etree.ElementTree as ET
+
+
+class BomLine:
+	"One line of a bill of materials."
+
+	def __init__(self, value, footprint="", references=(), quantity=None):
+		self.value = value
+		self.footprint = footprint
+		self.references = list(references)
+		if quantity is None:
+			quantity = len(self.references)
+		self.quantity = quantity
+
+	def getFootprintName(self):
+		"""Get the footprint name without KiCad library prefix.
+		"""
+		return self.footprint.rpartition(":")[2]
+
+	def __repr__(self):
+		return "BomLine(%s, %s, %s, %d)" % (
+			self.value, self.footprint,
+			",".join(self.references), self.quantity)
+
+class Bom:
+	"Bill of materials."
+
+	# KiCad CSV column names
+	CSV_REFERENCES	= ("Reference", "References", "Refs", "Ref",
+			   "Designator")
+	CSV_VALUE	= ("Value",)
+	CSV_FOOTPRINT	= ("Footprint",)
+	CSV_QUANTITY	= ("Qty", "Qnty", "Quantity", "Quantity Per PCB")
+	CSV_DNP		= ("DNP",)
+
+	def __init__(self, name="", lines=()):
+		self.name = name
+		self.lines = []
+		self.__lineMap = {}
+		for line in lines:
+			self.addLine(line)
+
+	def getName(self):
+		return self.name
+
+	def getLines(self):
+		return self.lines
+
+	def addLine(self, line):
+		"""Add a BomLine. Lines with equal value and footprint are merged.
+		"""
+		key = (line.value, line.footprint)
+		existing = self.__lineMap.get(key)
+		if existing:
+			existing.references.extend(line.references)
+			existing.quantity += line.quantity
+		else:
+			self.__lineMap[key] = line
+			self.lines.append(line)
+
+	@classmethod
+	def fromFile(cls, filename):
+		"""Read a KiCad .csv or .xml BOM file.
+		"""
+		name = os.path.splitext(os.path.basename(str(filename)))[0]
+		try:
+			if str(filename).lower().endswith(".xml"):
+				with open(filename, "rb") as fd:
+					return cls.fromKiCadXml(fd, name)
+			with open(filename, "r", encoding="UTF-8", newline="") as fd:
+				return cls.fromKiCadCsv(fd, name)
+		except (IOError, UnicodeError) as e:
+			raise PartMgrError("Failed to read %s: %s" %\
+					   (filename, str(e)))
+
+	@classmethod
+	def fromKiCadCsv(cls, fd, name=""):
+		"""Parse a KiCad CSV BOM from the file object 'fd'.
+		Leading lines before the column header line are skipped.
+		"""
+		text = fd.read()
+		try:
+			dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+		except csv.Error:
+			dialect = csv.excel
+		bom = cls(name)
+		columns = None
+		try:
+			for row in csv.reader(text.splitlines(), dialect):
+				row = [ cell.strip() for cell in row ]
+				if columns is None:
+					if any(cell in cls.CSV_VALUE for cell in row):
+						columns = cls.__csvColumns(row)
+					continue
+				line = cls.__csvLine(row, columns)
+				if line:
+					bom.addLine(line)
+		except csv.Error as e:
+			raise PartMgrError("BOM CSV format error: %s" % str(e))
+		if columns is None:
+			raise PartMgrError("BOM CSV: No 'Value' column found")
+		return bom
+
+	@classmethod
+	def __csvColumns(cls, header):
+		def find(names):
+			for i, cell in enumerate(header):
+				if cell in names:
+					return i
+			return None
+		return (find(cls.CSV_REFERENCES), find(cls.CSV_VALUE),
+			find(cls.CSV_FOOTPRINT), find(cls.CSV_QUANTITY),
+			find(cls.CSV_DNP))
+
+	@staticmethod
+	def __csvLine(row, columns):
+		def get(index):
+			if index is None or index >= len(row):
+				return ""
+			return row[index]
+		refCol, valueCol, fpCol, qtyCol, dnpCol = columns
+		value = get(valueCol)
+		if not value or get(dnpCol):
+			return None
+		references = [ r for r in re.split(r"[\s,;]+", get(refCol)) if r ]
+		quantity = None
+		if get(qtyCol):
+			try:
+				quantity = int(float(get(qtyCol)))
+			except ValueError:
+				raise PartMgrError("BOM CSV: Invalid quantity '%s'" %\
+						   get(qtyCol))
+		return BomLine(value, get(fpCol), references, quantity)
+
+	@classmethod
+	def fromKiCadXml(cls, fd, name=""):
+		"""Parse a KiCad XML netlist/BOM from the file object 'fd'.
+		Components marked as DNP or excluded from BOM are skipped.
+		"""
+		try:
+			root = ET.parse(fd).getroot()
+		except ET.ParseError as e:
+			raise PartMgrError("BOM XML format error: %s" % str(e))
+		bom = cls(name)
+		for comp in root.iter("comp"):
+			props = { p.get("name") for p in comp.iter("property") }
+			if "dnp" in props or "exclude_from_bom" in props:
+				continue
+			value = (comp.findtext("value") or "").strip()
+			if not value:
+				continue
+			bom.addLine(BomLine(value,
+					    (comp.findtext("footprint") or "").strip(),
+					    [ comp.get("ref", "") ]))
+		return bom
+
+	def __repr__(self):
+		return "Bom(%s, %d lines)" % (self.name, len(self.lines))
+
+class BomCheckLine:
+	"Availability of one BOM line."
+
+	def __init__(self, bomLine, stockItem, candidates, required, available):
+		self.bomLine = bomLine
+		self.stockItem = stockItem
+		self.candidates = candidates
+		self.required = required
+		self.available = available
+
+	def isMatched(self):
+		return self.stockItem is not None
+
+	def isAmbiguous(self):
+		return len(self.candidates) > 1
+
+	def getToOrder(self):
+		return max(0, self.required - self.available)
+
+	def isShort(self):
+		return self.getToOrder() > 0
+
+def matchBom(db, bom):
+	"""Match all lines of 'bom' against the stock items of 'db'.
+	Stock items are matched by stock item name, part name or parameter
+	value. If the BOM line has a footprint, stock items with a matching
+	footprint name are preferred.
+	Returns a list of (BomLine, [candidate stock items]) tuples.
+	The best candidate is the first one in the list.
+	"""
+	lines = bom.getLines()
+	matches = db.getStockItemsByValue(line.value for line in lines)
+	footprintNames = db.getFootprintNames()
+	ret = []
+	for line in lines:
+		candidates = matches.get(line.value, [])
+		fpName = line.getFootprintName()
+		if fpName:
+			fpMatches = [ s for s in candidates
+				      if footprintNames.get(s.footprint) == fpName ]
+			if fpMatches:
+				candidates = fpMatches
+			else:
+				# Only keep stock items without footprint.
+				candidates = [ s for s in candidates
+					       if not Entity.isValidId(s.footprint) ]
+		ret.append((line, candidates))
+	return ret
+
+def checkBom(db, bom, count=1):
+	"""Check the stock availability for building 'count' times 'bom'.
+	Returns a list of BomCheckLine.
+	"""
+	matches = matchBom(db, bom)
+	quantities = db.getGlobalQuantities(candidates[0]
+					    for line, candidates in matches
+					    if candidates)
+	ret = []
+	for line, candidates in matches:
+		stockItem = candidates[0] if candidates else None
+		available = quantities.get(stockItem.id, 0) if stockItem else 0
+		ret.append(BomCheckLine(line, stockItem, candidates,
+					line.quantity * count, available))
+	return ret
+
+def writeShortageReportCsv(fd, checkLines, shortOnly=False):
+	"""Write a BOM shortage report as CSV to the file object 'fd'.
+	"""
+	w = csv.writer(fd)
+	w.writerow(("References", "Value", "Footprint", "Stock item",
+		    "Required", "Available", "To order"))
+	for line in checkLines:
+		if shortOnly and not line.isShort():
+			continue
+		w.writerow((" ".join(line.bomLine.references),
+			    line.bomLine.value,
+			    line.bomLine.footprint,
+			    line.stockItem.getName() if line.stockItem else "",
+			    line.required,
+			    line.available,
+			    line.getToOrder()))
@@ -26,6 +26,10 @@ from partmgr.core.util import *
 class Category(Entity):
 	"Category descriptor."
 
+	__slots__ = (
+		"parent",
+	)
+
 	def __init__(self, name,
 		     parent=None,
 		     **kwds):
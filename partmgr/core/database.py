@@ -29,10 +29,19 @@ from partmgr.core.image import *
 from partmgr.core.location import *
 from partmgr.core.origin import *
 from partmgr.core.supplier import *
+from partmgr.core.profiler import *
 from partmgr.core.util import *
 
 import sqlite3 as sql
+import base64
+import binascii
+import contextlib
+import csv
 import functools
+import os
+import pathlib
+import re
+import time
 
 
 class DatabaseCache:
@@ -59,6 +68,7 @@ class DatabaseCache:
 			@functools.wraps(func)
 			def wrapper(_self, *args, **kwargs):
 				if self.ENABLED:
+					_self.checkExternalChanges()
 					key = (_self, func)
 					if key not in caches:
 						caches[key] = functools.lru_cache(maxsize=2**10)(func)
@@ -68,45 +78,295 @@ class DatabaseCache:
 			return wrapper
 		return decorator
 
-	def clearCache(self, cacheTypes):
-		"""Returns an LRU cache clear decorator.
+	def clear(self, cacheTypes):
+		"""Clear the LRU caches of the given types.
 		"""
 		if isinstance(cacheTypes, int):
 			cacheTypes = (cacheTypes,)
+		for cacheType in cacheTypes:
+			caches = self.__cachesByType.get(cacheType, None)
+			if caches:
+				for c in caches.values():
+					c.cache_clear()
+
+	def clearCache(self, cacheTypes):
+		"""Returns an LRU cache clear decorator.
+		"""
 		def decorator(func):
 			@functools.wraps(func)
 			def wrapper(_self, *args, **kwargs):
-				for cacheType in cacheTypes:
-					caches = self.__cachesByType.get(cacheType, None)
-					if caches:
-						for c in caches.values():
-							c.cache_clear()
+				self.clear(cacheTypes)
 				return func(_self, *args, **kwargs)
 			return wrapper
 		return decorator
 
 databaseCache = DatabaseCache()
 
+class GlobalStats:
+	"""Database statistics, as returned by Database.getGlobalStats().
+	"""
+
+	def __init__(self):
+		# Number of entities per table: { table name : count }
+		self.counts = {}
+		# Number of stock items below their minimum quantity
+		self.belowMinimum = 0
+		# Number of stock items without any price
+		self.withoutPrice = 0
+		# Total stored quantity
+		self.totalQuantity = 0
+		# Inventory value (cheapest effective price) per currency:
+		# { currency short name : value }
+		self.inventoryValue = {}
+		# Per supplier: [ (id, name, number of stock items,
+		#                  number of origins) ]
+		self.suppliers = []
+		# Per location: [ (id, name, number of stock items, quantity) ]
+		self.locations = []
+		# Largest categories: [ (id, name, number of stock items) ]
+		self.largestCategories = []
+
+class CategoryValuation:
+	"""Inventory value of one category.
+	The 'own*' attributes only count the stock items directly in
+	the category. The 'total*' attributes include all sub categories.
+	"""
+
+	def __init__(self, categoryId, name, parent):
+		self.categoryId = categoryId
+		self.name = name
+		self.parent = parent
+		self.path = name
+		self.ownItems = 0
+		self.ownQuantity = 0
+		self.ownValue = 0.0
+		self.ownUnpriced = 0
+		self.totalItems = 0
+		self.totalQuantity = 0
+		self.totalValue = 0.0
+		self.totalUnpriced = 0
+
+class Valuation:
+	"""Inventory valuation, as returned by Database.getValuation().
+	Stock items are valued with the quantity times the cheapest
+	effective price (price * priceFact) of all origins.
+	"""
+
+	CATEGORY_SEPARATOR = "/"
+
+	def __init__(self, currency, timestamp):
+		# Currency short name
+		self.currency = currency
+		# Valuation time (Timestamp)
+		self.timestamp = timestamp
+		# CategoryValuation objects in category tree order.
+		self.categories = []
+		# Overall number of stock items, quantity and value
+		self.totalItems = 0
+		self.totalQuantity = 0
+		self.totalValue = 0.0
+		# Number of stored stock items without price
+		self.totalUnpriced = 0
+
+	def writeCsv(self, fd):
+		"""Write the valuation as CSV to the file object 'fd'.
+		"""
+		w = csv.writer(fd)
+		w.writerow(("Category", "Stock items", "Quantity",
+			    "Value (%s)" % self.currency, "Unpriced",
+			    "Total stock items", "Total quantity",
+			    "Total value (%s)" % self.currency, "Total unpriced"))
+		for cat in self.categories:
+			w.writerow((cat.path,
+				    cat.ownItems, cat.ownQuantity,
+				    "%.2f" % cat.ownValue, cat.ownUnpriced,
+				    cat.totalItems, cat.totalQuantity,
+				    "%.2f" % cat.totalValue, cat.totalUnpriced))
+		w.writerow(("", "", "", "", "",
+			    self.totalItems, self.totalQuantity,
+			    "%.2f" % self.totalValue, self.totalUnpriced))
+
+class VerifyProblem:
+	"One problem found by Database.verify()."
+
+	def __init__(self, table, entityId, message):
+		self.table = table
+		self.entityId = entityId
+		self.message = message
+
+	def __repr__(self):
+		if self.table:
+			return "%s %d: %s" % (self.table, self.entityId,
+					      self.message)
+		return self.message
+
+class VerifyState:
+	"""State of a resumable Database.verify() run.
+	Pass it back to Database.verify() to continue the run.
+	"""
+
+	def __init__(self, steps):
+		self.steps = steps
+		# Description of the current step
+		self.step = ""
+		# VerifyProblem objects found so far
+		self.problems = []
+		# True, if all checks have been run
+		self.done = False
+
+	def isOk(self):
+		return self.done and not self.problems
+
+class Migration:
+	"""Context of one schema migration step.
+	See Database.MIGRATIONS.
+	"""
+
+	# Number of rows rewritten per rewriteRows() batch.
+	BATCH_SIZE = 1000
+
+	def __init__(self, cursor, fromVersion, toVersion, description,
+		     progressCallback=None):
+		self.cursor = cursor
+		self.fromVersion = fromVersion
+		self.toVersion = toVersion
+		self.description = description
+		self.progressCallback = progressCallback
+		self.startTime = time.monotonic()
+
+	def getElapsed(self):
+		"""Get the elapsed time of this step, in seconds.
+		"""
+		return time.monotonic() - self.startTime
+
+	def progress(self, done=0, total=0):
+		"""Report the progress of this step.
+		"""
+		if self.progressCallback:
+			self.progressCallback(self, done, total)
+
+	def rewriteRows(self, table, columns, rewrite, batchSize=BATCH_SIZE):
+		"""Rewrite 'columns' of all rows of 'table' in batches.
+		rewrite(values) is called with the tuple of column values
+		of each row and returns the tuple of new values or None,
+		if the row is unchanged. Only one batch of rows is held
+		in memory at a time.
+		Returns the number of processed rows.
+		"""
+		c = self.cursor
+		c.execute("SELECT COUNT(*) FROM %s;" % table)
+		total = int(c.fetchone()[0])
+		done, lastId = 0, None
+		while True:
+			if lastId is None:
+				c.execute("SELECT id, %s FROM %s "
+					  "ORDER BY id LIMIT ?;" % (
+					  ", ".join(columns), table),
+					  (batchSize,))
+			else:
+				c.execute("SELECT id, %s FROM %s "
+					  "WHERE id > ? ORDER BY id LIMIT ?;" % (
+					  ", ".join(columns), table),
+					  (lastId, batchSize))
+			rows = c.fetchall()
+			if not rows:
+				break
+			updates = []
+			for d in rows:
+				values = rewrite(tuple(d[1:]))
+				if values is not None:
+					updates.append(tuple(values) + (d[0],))
+			if updates:
+				c.executemany("UPDATE %s SET %s WHERE id=?;" % (
+					      table,
+					      ", ".join("%s=?" % col for col in columns)),
+					      updates)
+			lastId = rows[-1][0]
+			done += len(rows)
+			self.progress(done, total)
+		return done
+
 class Database:
 	"Part database interface."
 
 	# Database version number
-	DB_VERSION	= 1
+	DB_VERSION	= 7
+
+	# Change journal operations (this is database format ABI)
+	CHANGE_INSERT	= 0
+	CHANGE_UPDATE	= 1
+	CHANGE_DELETE	= 2
+
+	# The current time as SQL expression in the time base of
+	# Timestamp.nowInt(), which is the UTC wall time as local time.
+	SQL_NOW		= "(2 * CAST(strftime('%s', 'now') AS INTEGER) - "\
+			  "CAST(strftime('%s', 'now', 'localtime') AS INTEGER))"
+
+	# Tables that are recorded in the change journal
+	JOURNAL_TABLES	= ("parameters", "parts", "categories",
+			   "suppliers", "locations", "footprints",
+			   "stock", "origins", "storages")
+
+	# Caches that depend on the contents of a table
+	TABLE_CACHES	= {
+		"categories"	: (DatabaseCache.CATEGORY,),
+		"stock"		: (DatabaseCache.STOCKITEM,),
+	}
+
+	# Minimum time between two external change checks, in seconds.
+	DATA_VERSION_POLL_INTERVAL = 0.05
+
+	# Number of rows fetched from the cursor at once by the iter* methods.
+	ITER_CHUNK_SIZE	= 256
+
+	# Maximum number of values bound in one batched lookup query.
+	LOOKUP_CHUNK_SIZE = 500
 
 	# User editable parameters
 	USER_PARAMS = {
 		# "name"	: (description, default-value)
 		"currency"	: ("Price currency", Param_Currency.CURR_EUR),
+		"backup_count"	: ("Number of rotated backups "
+				   "(created on close and by the "
+				   "backup interval; 0 = disabled)", 0),
+		"backup_interval" : ("Backup interval in minutes "
+				     "(0 = disabled)", 0),
+		"journal_days"	: ("Days of change journal history to keep "
+				   "(trimmed on open; 0 = unlimited)", 90),
 	}
 
+	# Number of pages copied per backup step.
+	BACKUP_PAGES_PER_STEP = 256
+
 	@databaseCache.clearCache(databaseCache.ALL)
-	def __init__(self, filename):
+	def __init__(self, filename, migrationCallback=None, readOnly=False):
+		"""Open the database 'filename'.
+		An older database version is migrated to DB_VERSION after
+		writing a backup to <filename>.v<old version>.bak
+		migrationCallback(migration, done, total) is called with the
+		Migration object to report the migration progress.
+		If readOnly is True, the file is opened read-only. It must be
+		an existing database of the current version. All modifications
+		fail with PartMgrError.
+		"""
+		self.readOnly = readOnly
 		self.__hadChanges = False
+		self.__transactionDepth = 0
+		self.__dataVersion = None
+		self.__dataVersionPollTime = None
+		self.__externalChangeCount = 0
+		self.__profiler = None
 		try:
-			self.db = sql.connect(str(filename))
+			if readOnly:
+				uri = pathlib.Path(filename).absolute().as_uri()
+				self.db = sql.connect(uri + "?mode=ro", uri=True)
+			else:
+				self.db = sql.connect(str(filename))
 			self.db.text_factory = str
 			self.filename = filename
-			if self.__sqlIsEmpty():
+			if readOnly:
+				self.__openReadOnly()
+			elif self.__sqlIsEmpty():
 				# This is an empty database
 				self.__initTables()
 				ver = Parameter("partmgr_db_version",
@@ -120,13 +380,37 @@ class Database:
 					self.filename = None
 					raise PartMgrError("Invalid database "
 						    "version")
-				if ver == 0:
-					self.__upgrade_0to1() # Upgrade DB version to 1.
-			self.__setUserParameterDefaults()
+				if ver < self.DB_VERSION:
+					self.__migrate(ver, migrationCallback)
+			if not readOnly:
+				self.__setUserParameterDefaults()
+				self.__trimJournal()
+			self.__changeSeq = self.getChangeSeq()
+			self.__dataVersion = self.__getDataVersion()
+			self.__dataVersionPollTime = time.monotonic()
+			if os.environ.get(DatabaseProfiler.ENV_VAR, "0") not in ("", "0"):
+				self.enableProfiling()
+		except PartMgrError:
+			self.filename = None
+			raise
 		except (sql.Error, ValueError, TypeError) as e:
 			self.filename = None
 			self.__databaseError(e)
 
+	def __openReadOnly(self):
+		c = self.db.cursor()
+		c.execute("SELECT 1 FROM sqlite_master "
+			  "WHERE type='table' AND name='parameters';")
+		if not c.fetchone():
+			raise PartMgrError("Not a PartMgr database")
+		ver = self.getGlobalParameter("partmgr_db_version")
+		ver = ver.getDataInt() if ver else None
+		if ver != self.DB_VERSION:
+			raise PartMgrError("Database version %s can not be "
+				"opened read-only. Open it read-write once "
+				"to update it to version %d." % (
+				ver, self.DB_VERSION))
+
 	def __eq__(self, other):
 		return self is other
 
@@ -137,12 +421,115 @@ class Database:
 		return "Database(%s)" % str(self.filename)
 
 	def __commit(self):
-		self.db.commit()
+		if not self.__transactionDepth:
+			self.db.commit()
 		self.__hadChanges = True
 
+	@contextlib.contextmanager
+	def transaction(self):
+		"""Context manager that groups all modifications done in
+		its 'with' block into one transaction.
+		The modify* and del* methods don't commit individually
+		inside of the block. Transactions can be nested.
+		If the block raises an exception, its modifications
+		are rolled back.
+		Yields a database cursor.
+		"""
+		if not self.isOpen():
+			raise PartMgrError("Database is not open")
+
+		depth = self.__transactionDepth
+		savepoint = "partmgr_%d" % depth
+		try:
+			if depth:
+				self.db.execute("SAVEPOINT %s;" % savepoint)
+			else:
+				if self.db.in_transaction:
+					self.db.commit()
+				self.db.execute("BEGIN IMMEDIATE;")
+		except sql.Error as e:
+			self.__databaseError(e)
+		self.__transactionDepth += 1
+		try:
+			yield self.db.cursor()
+		except BaseException:
+			self.__transactionDepth -= 1
+			try:
+				if depth:
+					self.db.execute("ROLLBACK TO %s;" % savepoint)
+					self.db.execute("RELEASE %s;" % savepoint)
+				else:
+					self.db.rollback()
+			finally:
+				databaseCache.clear(DatabaseCache.ALL)
+			raise
+		self.__transactionDepth -= 1
+		try:
+			if depth:
+				self.db.execute("RELEASE %s;" % savepoint)
+			self.__commit()
+		except sql.Error as e:
+			self.__databaseError(e)
+
 	def isOpen(self):
 		return bool(self.filename)
 
+	def __getDataVersion(self):
+		c = self.db.cursor()
+		c.execute("PRAGMA data_version;")
+		return int(c.fetchone()[0])
+
+	def checkExternalChanges(self):
+		"""Check whether another connection committed changes
+		to the database file since the last check.
+		The caches affected by these changes are invalidated.
+		The check is rate limited by DATA_VERSION_POLL_INTERVAL.
+		Returns True, if external changes were detected.
+		"""
+		if not self.isOpen() or self.__dataVersion is None:
+			return False
+
+		now = time.monotonic()
+		if now - self.__dataVersionPollTime < self.DATA_VERSION_POLL_INTERVAL:
+			return False
+		self.__dataVersionPollTime = now
+		try:
+			dataVersion = self.__getDataVersion()
+			if dataVersion == self.__dataVersion:
+				return False
+			self.__dataVersion = dataVersion
+			self.__externalChangeCount += 1
+
+			# Use the change journal to find the affected caches.
+			c = self.db.cursor()
+			c.execute("SELECT MIN(seq) FROM changes "
+				  "WHERE seq>?;",
+				  (self.__changeSeq,))
+			firstSeq = c.fetchone()[0]
+			newChangeSeq = self.getChangeSeq()
+			if newChangeSeq > self.__changeSeq and\
+			   (firstSeq is None or firstSeq > self.__changeSeq + 1):
+				# The journal has been trimmed in the meantime.
+				cacheTypes = DatabaseCache.ALL
+			else:
+				c.execute("SELECT DISTINCT tableName FROM changes "
+					  "WHERE seq>?;",
+					  (self.__changeSeq,))
+				cacheTypes = set()
+				for d in c.fetchall():
+					cacheTypes.update(self.TABLE_CACHES.get(d[0], ()))
+			self.__changeSeq = newChangeSeq
+			databaseCache.clear(cacheTypes)
+			return True
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	def getExternalChangeCount(self):
+		"""Get the number of times checkExternalChanges()
+		detected external changes.
+		"""
+		return self.__externalChangeCount
+
 	@databaseCache.clearCache(databaseCache.ALL)
 	def close(self, collectGarbage = True, updateRevision = True):
 		if not self.isOpen():
@@ -158,9 +545,135 @@ class Database:
 			self.__incRevision()
 		if collectGarbage:
 			self.__collectGarbage()
+		if self.__hadChanges:
+			self.__backupOnClose()
+		if self.__profiler and self.__profiler.enabled:
+			print("Database profile of %s:" % str(self.filename))
+			self.__profiler.dump()
+			self.__profiler.disable()
 		self.db.close()
 		self.filename = None
 
+	def enableProfiling(self):
+		"""Enable the call and SQL profiling of this database.
+		Profiling can also be enabled for all databases with
+		the environment variable PARTMGR_PROFILE=1.
+		The profile is printed on close.
+		Returns the DatabaseProfiler.
+		"""
+		if not self.__profiler:
+			self.__profiler = DatabaseProfiler(self)
+		self.__profiler.enable()
+		return self.__profiler
+
+	def disableProfiling(self):
+		if self.__profiler:
+			self.__profiler.disable()
+
+	def getProfiler(self):
+		"""Get the DatabaseProfiler or None, if profiling
+		has never been enabled.
+		"""
+		return self.__profiler
+
+	def __backupOnClose(self):
+		try:
+			param = self.getGlobalParameter("backup_count")
+			keep = param.getDataInt() if param else 0
+			if keep > 0:
+				self.backupRotated(keep=keep)
+		except PartMgrError as e:
+			# Do not prevent closing the database.
+			print("Backup on close failed: %s" % str(e))
+
+	def backup(self, destPath, pagesPerStep=BACKUP_PAGES_PER_STEP,
+		   progressCallback=None):
+		"""Write a consistent copy of the database to 'destPath'
+		with the SQLite online backup API. The database is copied
+		in steps of 'pagesPerStep' pages. After each step
+		progressCallback(remainingPages, totalPages) is called.
+		The copy is written to a temporary file, which replaces
+		'destPath' only after the backup finished successfully.
+		"""
+		if not self.isOpen():
+			raise PartMgrError("Backup: The database is not open")
+
+		destPath = str(destPath)
+		tmpPath = destPath + ".tmp"
+		def progress(status, remaining, total):
+			if progressCallback:
+				progressCallback(remaining, total)
+		try:
+			dest = sql.connect(tmpPath)
+			try:
+				self.db.backup(dest, pages=max(int(pagesPerStep), 1),
+					       progress=progress)
+			finally:
+				dest.close()
+			os.replace(tmpPath, destPath)
+		except (sql.Error, OSError, ValueError) as e:
+			with contextlib.suppress(OSError):
+				os.unlink(tmpPath)
+			raise PartMgrError("Backup to %s failed: %s" %\
+					   (destPath, str(e)))
+		print("Database backup written to %s" % destPath)
+
+	def backupRotated(self, directory=None, keep=10,
+			  pagesPerStep=BACKUP_PAGES_PER_STEP,
+			  progressCallback=None):
+		"""Write a time stamped backup to 'directory' (defaults to the
+		directory of the database file) and delete the oldest
+		backups, so that at most 'keep' backups remain.
+		Backup files are named <dbname>-YYYYmmdd-HHMMSS.pmg
+		Returns the path of the new backup.
+		"""
+		if not self.isOpen():
+			raise PartMgrError("Backup: The database is not open")
+
+		dbPath = os.path.abspath(str(self.filename))
+		if directory is None:
+			directory = os.path.dirname(dbPath)
+		base = os.path.splitext(os.path.basename(dbPath))[0]
+		stamp = time.strftime("%Y%m%d-%H%M%S")
+		# Backups of the same second get a sequence number suffix.
+		nrs = [ nr for s, nr, f in self.__listBackups(directory, base)
+			if s == stamp ]
+		if nrs:
+			destPath = os.path.join(directory, "%s-%s-%d.pmg" % (
+				base, stamp, max(nrs) + 1))
+		else:
+			destPath = os.path.join(directory, "%s-%s.pmg" % (
+				base, stamp))
+		self.backup(destPath, pagesPerStep, progressCallback)
+
+		backups = self.__listBackups(directory, base)
+		try:
+			for s, nr, f in backups[:max(len(backups) -
+						     max(int(keep), 1), 0)]:
+				os.unlink(os.path.join(directory, f))
+		except OSError as e:
+			raise PartMgrError("Failed to remove old backups: %s" %\
+					   str(e))
+		return destPath
+
+	@staticmethod
+	def __listBackups(directory, base):
+		# Returns a sorted list of (stamp, nr, filename) of the
+		# rotated backups of 'base' in 'directory'.
+		pattern = re.compile(r"^%s-(\d{8}-\d{6})(?:-(\d+))?\.pmg$" %\
+				     re.escape(base))
+		try:
+			files = os.listdir(directory)
+		except OSError as e:
+			raise PartMgrError("Failed to list backups: %s" % str(e))
+		backups = []
+		for f in files:
+			m = pattern.match(f)
+			if m:
+				backups.append((m.group(1), int(m.group(2) or 0), f))
+		backups.sort()
+		return backups
+
 	def __incRevision(self):
 		rev = None
 		try:
@@ -243,14 +756,1110 @@ class Database:
 		c = self.db.cursor()
 		for table in tables:
 			c.execute("CREATE TABLE IF NOT EXISTS %s;" % table)
+		self.__initIndices(c)
+		self.__initJournal(c)
+		self.__initPriceHistory(c)
 		self.__commit()
 
-	def __upgrade_0to1(self):
-		print("Updating database version 0 to version 1.")
+	def __initIndices(self, c):
+		indices = (
+			"parameters_parent ON parameters(parentType, parent)",
+			"parameters_data ON parameters(data)",
+			"parts_category ON parts(category)",
+			"parts_name ON parts(name)",
+			"parts_modify ON parts(modifyTimeStamp)",
+			"categories_parent ON categories(parent)",
+			"footprints_name ON footprints(name)",
+			"stock_category ON stock(category)",
+			"stock_name ON stock(name)",
+			"stock_part ON stock(part)",
+			"stock_modify ON stock(modifyTimeStamp)",
+			"origins_stockItem_price ON origins(stockItem, price, priceFact)",
+			"origins_supplier ON origins(supplier, stockItem)",
+			"origins_modify ON origins(modifyTimeStamp)",
+			"storages_stockItem_quantity ON storages(stockItem, quantity)",
+			"storages_location ON storages(location, stockItem, quantity)",
+			"storages_modify ON storages(modifyTimeStamp)",
+		)
+		for index in indices:
+			c.execute("CREATE INDEX IF NOT EXISTS %s;" % index)
+
+	def __initJournal(self, c):
+		c.execute("CREATE TABLE IF NOT EXISTS "
+			  "changes(seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+			  "tableName TEXT, "
+			  "entityId INTEGER, "
+			  "op INTEGER, "
+			  "timeStamp INTEGER);")
+		for table in self.JOURNAL_TABLES:
+			for event, op, row in (("INSERT", self.CHANGE_INSERT, "NEW"),
+					       ("UPDATE", self.CHANGE_UPDATE, "NEW"),
+					       ("DELETE", self.CHANGE_DELETE, "OLD")):
+				c.execute("CREATE TRIGGER IF NOT EXISTS "
+					  "changes_%s_%s AFTER %s ON %s "
+					  "BEGIN "
+					  "INSERT INTO changes(tableName, entityId, "
+					  "op, timeStamp) "
+					  "VALUES('%s', %s.id, %d, %s); "
+					  "END;" % (
+					  table, event.lower(), event, table,
+					  table, row, op, self.SQL_NOW))
+
+	def __initPriceHistory(self, c):
+		c.execute("CREATE TABLE IF NOT EXISTS "
+			  "price_history(id INTEGER PRIMARY KEY, "
+			  "origin INTEGER, "
+			  "price FLOAT, "
+			  "priceFact FLOAT, "
+			  "timeStamp INTEGER);")
+		c.execute("CREATE INDEX IF NOT EXISTS "
+			  "price_history_origin ON price_history(origin, timeStamp);")
+		# Record the price, if it is set or changed.
+		# The price time stamp of the origin is used, if it has
+		# been updated together with the price.
+		c.execute("CREATE TRIGGER IF NOT EXISTS "
+			  "price_history_insert AFTER INSERT ON origins "
+			  "WHEN NEW.price >= 0 "
+			  "BEGIN "
+			  "INSERT INTO price_history(origin, price, "
+			  "priceFact, timeStamp) "
+			  "VALUES(NEW.id, NEW.price, NEW.priceFact, "
+			  "CASE WHEN NEW.priceTimeStamp > 0 "
+			  "THEN NEW.priceTimeStamp "
+			  "ELSE " + self.SQL_NOW + " END); "
+			  "END;")
+		c.execute("CREATE TRIGGER IF NOT EXISTS "
+			  "price_history_update "
+			  "AFTER UPDATE OF price, priceFact ON origins "
+			  "WHEN NEW.price IS NOT OLD.price "
+			  "OR NEW.priceFact IS NOT OLD.priceFact "
+			  "BEGIN "
+			  "INSERT INTO price_history(origin, price, "
+			  "priceFact, timeStamp) "
+			  "VALUES(NEW.id, NEW.price, NEW.priceFact, "
+			  "CASE WHEN NEW.priceTimeStamp > 0 "
+			  "AND NEW.priceTimeStamp IS NOT OLD.priceTimeStamp "
+			  "THEN NEW.priceTimeStamp "
+			  "ELSE " + self.SQL_NOW + " END); "
+			  "END;")
+
+	# Schema migration steps.
+	# The step functions are called as func(db, migration)
+	# inside of a transaction. 'migration' is a Migration object.
+	# Each step contains the DDL of its version. Steps must not
+	# call the __init* methods, which always create the current schema.
+
+	@staticmethod
+	def __createIndices(c, indices):
+		for index in indices:
+			c.execute("CREATE INDEX IF NOT EXISTS %s;" % index)
+
+	def __migrate_1(self, migration):
+		migration.cursor.execute("ALTER TABLE origins "
+					 "ADD COLUMN priceFact FLOAT DEFAULT 1.0;")
+
+	def __migrate_2(self, migration):
+		self.__createIndices(migration.cursor, (
+			"parameters_parent ON parameters(parentType, parent)",
+			"parts_category ON parts(category)",
+			"parts_modify ON parts(modifyTimeStamp)",
+			"categories_parent ON categories(parent)",
+			"stock_category ON stock(category)",
+			"stock_part ON stock(part)",
+			"stock_modify ON stock(modifyTimeStamp)",
+			"origins_stockItem ON origins(stockItem)",
+			"origins_modify ON origins(modifyTimeStamp)",
+			"storages_stockItem ON storages(stockItem)",
+			"storages_modify ON storages(modifyTimeStamp)",
+		))
+
+	def __migrate_3(self, migration):
+		c = migration.cursor
+		c.execute("CREATE TABLE IF NOT EXISTS "
+			  "changes(seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+			  "tableName TEXT, "
+			  "entityId INTEGER, "
+			  "op INTEGER, "
+			  "timeStamp INTEGER);")
+		for table in ("parameters", "parts", "categories",
+			      "suppliers", "locations", "footprints",
+			      "stock", "origins", "storages"):
+			for event, op, row in (("INSERT", 0, "NEW"),
+					       ("UPDATE", 1, "NEW"),
+					       ("DELETE", 2, "OLD")):
+				c.execute("CREATE TRIGGER IF NOT EXISTS "
+					  "changes_%s_%s AFTER %s ON %s "
+					  "BEGIN "
+					  "INSERT INTO changes(tableName, entityId, "
+					  "op, timeStamp) "
+					  "VALUES('%s', %s.id, %d, "
+					  "CAST(strftime('%%s', 'now') AS INTEGER)); "
+					  "END;" % (
+					  table, event.lower(), event, table,
+					  table, row, op))
+
+	def __migrate_4(self, migration):
+		self.__createIndices(migration.cursor, (
+			"parameters_data ON parameters(data)",
+			"parts_name ON parts(name)",
+			"footprints_name ON footprints(name)",
+			"stock_name ON stock(name)",
+		))
+
+	def __migrate_5(self, migration):
+		c = migration.cursor
+		# Replaced by covering indices.
+		c.execute("DROP INDEX IF EXISTS origins_stockItem;")
+		c.execute("DROP INDEX IF EXISTS storages_stockItem;")
+		self.__createIndices(c, (
+			"origins_stockItem_price ON origins(stockItem, price, priceFact)",
+			"origins_supplier ON origins(supplier, stockItem)",
+			"storages_stockItem_quantity ON storages(stockItem, quantity)",
+			"storages_location ON storages(location, stockItem, quantity)",
+		))
+
+	def __migrate_6(self, migration):
+		c = migration.cursor
+		c.execute("CREATE TABLE IF NOT EXISTS "
+			  "price_history(id INTEGER PRIMARY KEY, "
+			  "origin INTEGER, "
+			  "price FLOAT, "
+			  "priceFact FLOAT, "
+			  "timeStamp INTEGER);")
+		c.execute("CREATE INDEX IF NOT EXISTS "
+			  "price_history_origin ON price_history(origin, timeStamp);")
+		c.execute("CREATE TRIGGER IF NOT EXISTS "
+			  "price_history_insert AFTER INSERT ON origins "
+			  "WHEN NEW.price >= 0 "
+			  "BEGIN "
+			  "INSERT INTO price_history(origin, price, "
+			  "priceFact, timeStamp) "
+			  "VALUES(NEW.id, NEW.price, NEW.priceFact, "
+			  "CASE WHEN NEW.priceTimeStamp > 0 "
+			  "THEN NEW.priceTimeStamp "
+			  "ELSE CAST(strftime('%s', 'now') AS INTEGER) END); "
+			  "END;")
+		c.execute("CREATE TRIGGER IF NOT EXISTS "
+			  "price_history_update "
+			  "AFTER UPDATE OF price, priceFact ON origins "
+			  "WHEN NEW.price IS NOT OLD.price "
+			  "OR NEW.priceFact IS NOT OLD.priceFact "
+			  "BEGIN "
+			  "INSERT INTO price_history(origin, price, "
+			  "priceFact, timeStamp) "
+			  "VALUES(NEW.id, NEW.price, NEW.priceFact, "
+			  "CASE WHEN NEW.priceTimeStamp > 0 "
+			  "AND NEW.priceTimeStamp IS NOT OLD.priceTimeStamp "
+			  "THEN NEW.priceTimeStamp "
+			  "ELSE CAST(strftime('%s', 'now') AS INTEGER) END); "
+			  "END;")
+		# Seed the history with the current prices.
+		c.execute("INSERT INTO price_history(origin, price, "
+			  "priceFact, timeStamp) "
+			  "SELECT id, price, priceFact, priceTimeStamp "
+			  "FROM origins WHERE price >= 0;")
+
+	def __migrate_7(self, migration):
+		c = migration.cursor
+		# Stamp the journal and the price history in the time base
+		# of Timestamp.nowInt() instead of UTC.
+		now = "(2 * CAST(strftime('%s', 'now') AS INTEGER) - "\
+		      "CAST(strftime('%s', 'now', 'localtime') AS INTEGER))"
+		for table in ("parameters", "parts", "categories",
+			      "suppliers", "locations", "footprints",
+			      "stock", "origins", "storages"):
+			for event, op, row in (("INSERT", 0, "NEW"),
+					       ("UPDATE", 1, "NEW"),
+					       ("DELETE", 2, "OLD")):
+				c.execute("DROP TRIGGER IF EXISTS changes_%s_%s;" % (
+					  table, event.lower()))
+				c.execute("CREATE TRIGGER IF NOT EXISTS "
+					  "changes_%s_%s AFTER %s ON %s "
+					  "BEGIN "
+					  "INSERT INTO changes(tableName, entityId, "
+					  "op, timeStamp) "
+					  "VALUES('%s', %s.id, %d, %s); "
+					  "END;" % (
+					  table, event.lower(), event, table,
+					  table, row, op, now))
+		c.execute("DROP TRIGGER IF EXISTS price_history_insert;")
+		c.execute("CREATE TRIGGER IF NOT EXISTS "
+			  "price_history_insert AFTER INSERT ON origins "
+			  "WHEN NEW.price >= 0 "
+			  "BEGIN "
+			  "INSERT INTO price_history(origin, price, "
+			  "priceFact, timeStamp) "
+			  "VALUES(NEW.id, NEW.price, NEW.priceFact, "
+			  "CASE WHEN NEW.priceTimeStamp > 0 "
+			  "THEN NEW.priceTimeStamp "
+			  "ELSE " + now + " END); "
+			  "END;")
+		c.execute("DROP TRIGGER IF EXISTS price_history_update;")
+		c.execute("CREATE TRIGGER IF NOT EXISTS "
+			  "price_history_update "
+			  "AFTER UPDATE OF price, priceFact ON origins "
+			  "WHEN NEW.price IS NOT OLD.price "
+			  "OR NEW.priceFact IS NOT OLD.priceFact "
+			  "BEGIN "
+			  "INSERT INTO price_history(origin, price, "
+			  "priceFact, timeStamp) "
+			  "VALUES(NEW.id, NEW.price, NEW.priceFact, "
+			  "CASE WHEN NEW.priceTimeStamp > 0 "
+			  "AND NEW.priceTimeStamp IS NOT OLD.priceTimeStamp "
+			  "THEN NEW.priceTimeStamp "
+			  "ELSE " + now + " END); "
+			  "END;")
+		# Convert the existing journal stamps from UTC.
+		# (The price history can not tell trigger stamps from
+		# origin price stamps. It is left unchanged.)
+		c.execute("UPDATE changes "
+			  "SET timeStamp = 2 * timeStamp - CAST(strftime('%s', "
+			  "timeStamp, 'unixepoch', 'localtime') AS INTEGER) "
+			  "WHERE timeStamp > 0;")
+
+	# Migration registry: { target version : (description, step function) }
+	MIGRATIONS = {
+		1 : ("Add origin price factor",		__migrate_1),
+		2 : ("Add indices",			__migrate_2),
+		3 : ("Add change journal",		__migrate_3),
+		4 : ("Add indices",			__migrate_4),
+		5 : ("Add covering indices",		__migrate_5),
+		6 : ("Add price history",		__migrate_6),
+		7 : ("Use the entity time base for the journal", __migrate_7),
+	}
+
+	def __migrate(self, fromVersion, progressCallback):
+		versions = range(fromVersion + 1, self.DB_VERSION + 1)
+		missing = [ v for v in versions if v not in self.MIGRATIONS ]
+		if missing:
+			raise PartMgrError("No database migration to version %d" %\
+					   missing[0])
+		if str(self.filename) != ":memory:":
+			self.backup("%s.v%d.bak" % (self.filename, fromVersion))
+		for version in versions:
+			description, func = self.MIGRATIONS[version]
+			print("Updating database version %d to version %d: %s" % (
+			      version - 1, version, description))
+			with self.transaction() as c:
+				migration = Migration(c, version - 1, version,
+						      description, progressCallback)
+				migration.progress()
+				func(self, migration)
+				self.getGlobalParameter("partmgr_db_version").setData(version)
+			migration.progress()
+			print("Updated to version %d in %.3f s" % (
+			      version, migration.getElapsed()))
+
+	def getChangeSeq(self):
+		"""Get the sequence number of the latest change journal entry.
+		Returns 0, if the journal is empty.
+		"""
+		if not self.isOpen():
+			return 0
+
+		try:
+			c = self.db.cursor()
+			# The AUTOINCREMENT counter survives trimChanges().
+			c.execute("SELECT seq FROM sqlite_sequence "
+				  "WHERE name='changes';")
+			data = c.fetchone()
+			if not data or data[0] is None:
+				return 0
+			return int(data[0])
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	def changesSince(self, seq, limit=None):
+		"""Get the change journal entries newer than 'seq'.
+		Returns a list of (seq, tableName, entityId, op, timeStamp)
+		tuples in ascending seq order. op is one of CHANGE_...
+		Use the seq of the last entry for the next call.
+		"""
+		if not self.isOpen():
+			return []
+
+		try:
+			c = self.db.cursor()
+			c.execute("SELECT seq, tableName, entityId, op, timeStamp "
+				  "FROM changes "
+				  "WHERE seq>? "
+				  "ORDER BY seq "
+				  "LIMIT ?;",
+				  (int(seq),
+				   -1 if limit is None else int(limit)))
+			return [ (int(d[0]), d[1], int(d[2]), int(d[3]), int(d[4]))
+				 for d in c.fetchall() ]
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	def __trimJournal(self):
+		param = self.getGlobalParameter("journal_days")
+		days = param.getDataInt() if param else 0
+		if days > 0:
+			self.trimChangesBefore(Timestamp.nowInt() - days * 24 * 60 * 60)
+
+	def trimChanges(self, seq):
+		"""Remove all change journal entries up to and including 'seq'.
+		The journal is trimmed by the "journal_days" retention on
+		every read-write open. A consumer that finds the oldest
+		entry newer than its seq + 1 has missed changes.
+		"""
+		if not self.isOpen():
+			return
+
+		try:
+			c = self.db.cursor()
+			c.execute("DELETE FROM changes "
+				  "WHERE seq<=?;",
+				  (int(seq),))
+			self.__commit()
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	def trimChangesBefore(self, stamp):
+		"""Remove all change journal entries older than the
+		integer time stamp 'stamp'.
+		"""
+		if not self.isOpen():
+			return
+
+		try:
+			c = self.db.cursor()
+			c.execute("DELETE FROM changes "
+				  "WHERE timeStamp<?;",
+				  (int(stamp),))
+			self.__commit()
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	# Parameter parent types and the tables of their parent entities
+	__PARAMETER_PARENT_TABLES = (
+		(Parameter.PTYPE_PART,		"parts"),
+		(Parameter.PTYPE_CATEGORY,	"categories"),
+		(Parameter.PTYPE_SUPPLIER,	"suppliers"),
+		(Parameter.PTYPE_LOCATION,	"locations"),
+		(Parameter.PTYPE_FOOTPRINT,	"footprints"),
+		(Parameter.PTYPE_STOCKITEM,	"stock"),
+		(Parameter.PTYPE_ORIGIN,	"origins"),
+		(Parameter.PTYPE_STORAGE,	"storages"),
+	)
+
+	# References that are reset to NO_ID, if the referenced row is gone.
+	# (table, column, referenced table)
+	__PURGE_REFERENCES = (
+		("stock",	"part",		"parts"),
+		("stock",	"footprint",	"footprints"),
+		("origins",	"supplier",	"suppliers"),
+		("storages",	"location",	"locations"),
+	)
+
+	class __DryRun(Exception):
+		pass
+
+	@databaseCache.clearCache(databaseCache.ALL)
+	def purge(self, dryRun=False):
+		"""Remove orphaned rows from all tables.
+		Categories that are not reachable from a root category,
+		stock items without category, parts without category that
+		are not used by a stock item, origins and storages without
+		stock item, the price history of deleted origins and
+		parameters without parent are deleted.
+		Dangling part, footprint, supplier and location references
+		are reset.
+		If dryRun is True, nothing is changed.
+		Returns a dict with the number of deleted rows per table.
+		The number of reset references is in the "references" entry.
+		"""
+		if not self.isOpen():
+			return {}
+
+		counts = {}
+		try:
+			with self.transaction() as c:
+				c.execute("DELETE FROM categories "
+					  "WHERE id NOT IN ( "
+					  "    WITH RECURSIVE "
+					  "    reachable(id) AS ( "
+					  "        SELECT id FROM categories "
+					  "        WHERE parent=? "
+					  "        UNION "
+					  "        SELECT categories.id "
+					  "        FROM categories JOIN reachable "
+					  "        ON (categories.parent = reachable.id) "
+					  "    ) "
+					  "    SELECT id FROM reachable);",
+					  (Entity.NO_ID,))
+				counts["categories"] = c.rowcount
+				c.execute("DELETE FROM stock "
+					  "WHERE NOT EXISTS ( "
+					  "    SELECT 1 FROM categories "
+					  "    WHERE categories.id = stock.category);")
+				counts["stock"] = c.rowcount
+				c.execute("DELETE FROM parts "
+					  "WHERE NOT EXISTS ( "
+					  "    SELECT 1 FROM categories "
+					  "    WHERE categories.id = parts.category) "
+					  "AND NOT EXISTS ( "
+					  "    SELECT 1 FROM stock "
+					  "    WHERE stock.part = parts.id);")
+				counts["parts"] = c.rowcount
+				for table in ("origins", "storages"):
+					c.execute("DELETE FROM %s "
+						  "WHERE NOT EXISTS ( "
+						  "    SELECT 1 FROM stock "
+						  "    WHERE stock.id = %s.stockItem);" % (
+						  table, table))
+					counts[table] = c.rowcount
+				c.execute("DELETE FROM price_history "
+					  "WHERE NOT EXISTS ( "
+					  "    SELECT 1 FROM origins "
+					  "    WHERE origins.id = price_history.origin);")
+				counts["price_history"] = c.rowcount
+				counts["parameters"] = 0
+				for parentType, table in self.__PARAMETER_PARENT_TABLES:
+					c.execute("DELETE FROM parameters "
+						  "WHERE parentType=? "
+						  "AND NOT EXISTS ( "
+						  "    SELECT 1 FROM %s "
+						  "    WHERE %s.id = parameters.parent);" % (
+						  table, table),
+						  (parentType,))
+					counts["parameters"] += c.rowcount
+				counts["references"] = 0
+				for table, column, refTable in self.__PURGE_REFERENCES:
+					c.execute("UPDATE %s SET %s=? "
+						  "WHERE %s!=? "
+						  "AND NOT EXISTS ( "
+						  "    SELECT 1 FROM %s "
+						  "    WHERE %s.id = %s.%s);" % (
+						  table, column, column,
+						  refTable, refTable, table, column),
+						  (Entity.NO_ID, Entity.NO_ID))
+					counts["references"] += c.rowcount
+				if dryRun:
+					raise self.__DryRun()
+		except self.__DryRun:
+			pass
+		except sql.Error as e:
+			self.__databaseError(e)
+		return counts
+
+	# Number of rows checked per verify() step.
+	VERIFY_CHUNK_SIZE = 1000
+
+	# References checked by verify().
+	# (table, column, referenced table, NO_ID allowed)
+	__VERIFY_REFERENCES = (
+		("categories",	"parent",	"categories",	True),
+		("parts",	"category",	"categories",	True),
+		("stock",	"category",	"categories",	False),
+		("stock",	"part",		"parts",	True),
+		("stock",	"footprint",	"footprints",	True),
+		("origins",	"stockItem",	"stock",	False),
+		("origins",	"supplier",	"suppliers",	True),
+		("storages",	"stockItem",	"stock",	False),
+		("storages",	"location",	"locations",	True),
+	)
+
+	# Base64 encoded columns checked by verify().
+	# (table, columns, binary columns)
+	__VERIFY_BASE64 = (
+		("parameters",	("name", "description", "data"), ()),
+		("parts",	("name", "description"), ()),
+		("categories",	("name", "description"), ()),
+		("suppliers",	("name", "description", "url"), ()),
+		("locations",	("name", "description"), ()),
+		("footprints",	("name", "description"), ("image",)),
+		("stock",	("name", "description"), ()),
+		("origins",	("name", "description", "orderCode"), ()),
+		("storages",	("name", "description"), ()),
+	)
+
+	def verify(self, state=None, timeBudget=None):
+		"""Check the database integrity and consistency.
+		This runs PRAGMA quick_check and checks for dangling
+		references, category cycles, invalid base64 data and
+		invalid quantity units.
+		The checks are done in chunks of VERIFY_CHUNK_SIZE rows.
+		quick_check is done per table. The check of one table
+		can not be interrupted and may exceed the time budget.
+		If 'timeBudget' (in seconds) is not None, verify() returns
+		after the chunk that exceeded the budget. Pass the returned
+		VerifyState as 'state' to continue, until state.done is True.
+		Returns the VerifyState.
+		"""
+		if state is None:
+			state = VerifyState(None)
+			state.steps = self.__verifySteps(state)
+		if state.done or not self.isOpen():
+			return state
+
+		deadline = None
+		if timeBudget is not None:
+			deadline = time.monotonic() + timeBudget
+		try:
+			for step in state.steps:
+				state.step = step
+				if deadline is not None and\
+				   time.monotonic() >= deadline:
+					return state
+			state.done = True
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+		return state
+
+	def __verifyChunks(self, c, table):
+		# Yields (first id, last id) ranges of 'table'.
+		# Separate sub queries, so that both use the rowid B-tree
+		# instead of one full table scan.
+		c.execute("SELECT (SELECT MIN(id) FROM %s), "
+			  "(SELECT MAX(id) FROM %s);" % (table, table))
+		first, last = c.fetchone()
+		if first is None:
+			return
+		for lo in range(int(first), int(last) + 1, self.VERIFY_CHUNK_SIZE):
+			yield lo, lo + self.VERIFY_CHUNK_SIZE - 1
+
+	def __verifySteps(self, state):
+		# Generator that runs one check chunk per iteration
+		# and yields the step description.
+		def problem(table, entityId, message):
+			state.problems.append(VerifyProblem(table, int(entityId),
+							    message))
+
 		c = self.db.cursor()
-		c.execute("ALTER TABLE origins ADD COLUMN priceFact FLOAT DEFAULT 1.0;")
-		self.getGlobalParameter("partmgr_db_version").setData(1)
-		self.__commit()
+
+		# quick_check can not be interrupted. Run it per table
+		# (and its indices), so that each step only takes one table.
+		# The per table check skips the unused page check.
+		if sql.sqlite_version_info >= (3, 33, 0):
+			c.execute("SELECT name FROM sqlite_master "
+				  "WHERE type='table' ORDER BY name;")
+			checks = [ "quick_check(\"%s\")" % d[0] for d in c.fetchall() ]
+		else:
+			checks = [ "quick_check" ]
+		for check in checks:
+			c.execute("PRAGMA %s;" % check)
+			for d in c.fetchall():
+				if d[0] != "ok":
+					problem("", Entity.NO_ID, "quick_check: %s" % d[0])
+			yield check
+
+		references = [ (table, column, refTable, allowNoId, None)
+			       for table, column, refTable, allowNoId
+			       in self.__VERIFY_REFERENCES ]
+		references.extend(("parameters", "parent", refTable, False,
+				   parentType)
+				  for parentType, refTable
+				  in self.__PARAMETER_PARENT_TABLES)
+		for table, column, refTable, allowNoId, parentType in references:
+			step = "%s.%s references" % (table, column)
+			for lo, hi in self.__verifyChunks(c, table):
+				# NULL is never written by PartMgr. Report it.
+				c.execute("SELECT id, %s FROM %s "
+					  "WHERE id BETWEEN ? AND ? "
+					  "%s"
+					  "AND (%s IS NULL OR (%s"
+					  "NOT EXISTS ( "
+					  "    SELECT 1 FROM %s AS ref "
+					  "    WHERE ref.id = %s.%s)));" % (
+					  column, table,
+					  "AND parentType = %d " % parentType
+					  if parentType is not None else "",
+					  column,
+					  "%s != %d AND " % (column, Entity.NO_ID)
+					  if allowNoId else "",
+					  refTable, table, column),
+					  (lo, hi))
+				for d in c.fetchall():
+					if d[1] is None:
+						problem(table, d[0], "Missing %s reference" %\
+							column)
+					else:
+						problem(table, d[0], "Dangling %s reference %s" % (
+							column, d[1]))
+				yield step
+
+		for lo, hi in self.__verifyChunks(c, "categories"):
+			# All (category, ancestor) pairs.
+			# UNION terminates on category cycles.
+			c.execute("SELECT start FROM ( "
+				  "    WITH RECURSIVE "
+				  "    ancestors(start, id) AS ( "
+				  "        SELECT id, parent FROM categories "
+				  "        WHERE id BETWEEN ? AND ? "
+				  "        UNION "
+				  "        SELECT ancestors.start, categories.parent "
+				  "        FROM categories JOIN ancestors "
+				  "        ON (categories.id = ancestors.id) "
+				  "    ) "
+				  "    SELECT start FROM ancestors WHERE id = start "
+				  ") ORDER BY start;",
+				  (lo, hi))
+			for d in c.fetchall():
+				problem("categories", d[0], "Category cycle")
+			yield "category cycles"
+
+		for table, columns, binaryColumns in self.__VERIFY_BASE64:
+			allColumns = columns + binaryColumns
+			for lo, hi in self.__verifyChunks(c, table):
+				c.execute("SELECT id, %s FROM %s "
+					  "WHERE id BETWEEN ? AND ?;" % (
+					  ", ".join(allColumns), table),
+					  (lo, hi))
+				for d in c.fetchall():
+					for column, value in zip(allColumns, d[1:]):
+						try:
+							value = base64.b64decode(
+								value or "",
+								validate=True)
+							if column not in binaryColumns:
+								value.decode(STR_ENCODING)
+						except (ValueError, TypeError,
+							binascii.Error) as e:
+							problem(table, d[0],
+								"Invalid %s data: %s" % (
+								column, str(e)))
+				yield "%s base64 data" % table
+
+		units = sorted(StockItem.UNITNAMES.keys())
+		for lo, hi in self.__verifyChunks(c, "stock"):
+			c.execute("SELECT id, quantityUnits FROM stock "
+				  "WHERE id BETWEEN ? AND ? "
+				  "AND (quantityUnits IS NULL "
+				  "OR quantityUnits NOT IN (%s));" %\
+				  ",".join(str(u) for u in units),
+				  (lo, hi))
+			for d in c.fetchall():
+				problem("stock", d[0], "Invalid quantity units %s" % d[1])
+			yield "stock quantity units"
+
+	# Tables copied by the copy* methods, in copy order, and their
+	# columns (besides the common entity columns).
+	__COPY_TABLES = (
+		("categories",	("parent",)),
+		("parts",	("category",)),
+		("stock",	("part", "category", "footprint",
+				 "minQuantity", "targetQuantity",
+				 "quantityUnits")),
+		("origins",	("stockItem", "supplier", "orderCode",
+				 "price", "priceTimeStamp", "priceFact")),
+		("storages",	("stockItem", "location", "quantity")),
+		("parameters",	("parentType", "parent", "data")),
+	)
+
+	@staticmethod
+	def __copyMapTable(table):
+		return "temp.copymap_" + table
+
+	@classmethod
+	def __copyMapped(cls, table, expr):
+		# SQL expression that maps the id 'expr' of 'table'
+		# to the id of its copy. Ids that are not copied are unchanged.
+		return "COALESCE((SELECT new FROM %s WHERE old = %s), %s)" % (
+			cls.__copyMapTable(table), expr, expr)
+
+	def __copyRows(self, c, table, columns, where, params=(),
+		       exprs={}, exprParams=()):
+		# Copy all rows of 'table' that match 'where'
+		# and record the id mapping in the copy map table.
+		# 'exprs' overrides the copied value of columns.
+		# May be called several times per table. Each call only
+		# copies the rows it added to the map table.
+		mapTable = self.__copyMapTable(table)
+		c.execute("SELECT MAX(id) FROM %s;" % table)
+		base = c.fetchone()[0] or 0
+		c.execute("SELECT seq FROM sqlite_sequence WHERE name=?;",
+			  (table,))
+		seq = c.fetchone()
+		base = max(base, seq[0] if seq else 0)
+		c.execute("INSERT INTO %s(old, new) "
+			  "SELECT id, ? + ROW_NUMBER() OVER (ORDER BY id) "
+			  "FROM %s WHERE %s;" % (mapTable, table, where),
+			  (base,) + tuple(params))
+		if not c.rowcount:
+			return
+		stamp = Timestamp()
+		stamp.setNow()
+		c.execute("INSERT INTO %s(id, name, description, flags, "
+			  "createTimeStamp, modifyTimeStamp, %s) "
+			  "SELECT copymap.new, s.name, s.description, s.flags, "
+			  "?, ?, %s "
+			  "FROM %s AS s JOIN %s AS copymap "
+			  "ON (copymap.old = s.id) "
+			  "WHERE copymap.new > ? "
+			  "ORDER BY copymap.new;" % (
+			  table, ", ".join(columns),
+			  ", ".join(exprs.get(col, "s." + col) for col in columns),
+			  table, mapTable),
+			  (stamp.getStampInt(), stamp.getStampInt()) +
+			  tuple(exprParams) + (base,))
+
+	def __copy(self, c, categoryWhere, categoryParams, categoryParent,
+		   partWhere, partParams, partCategory,
+		   stockWhere, stockParams, stockCategory,
+		   copyQuantities):
+		# Returns the category and stock item id maps { old : new }
+		for table, columns in self.__COPY_TABLES:
+			mapTable = self.__copyMapTable(table)
+			c.execute("DROP TABLE IF EXISTS %s;" % mapTable)
+			c.execute("CREATE TABLE %s("
+				  "old INTEGER PRIMARY KEY, "
+				  "new INTEGER);" % mapTable)
+		columns = dict(self.__COPY_TABLES)
+		try:
+			if categoryWhere:
+				self.__copyRows(c, "categories", columns["categories"],
+					categoryWhere, categoryParams,
+					{ "parent" : categoryParent })
+			self.__copyRows(c, "parts", columns["parts"],
+				partWhere, partParams,
+				{ "category" : partCategory })
+			self.__copyRows(c, "stock", columns["stock"],
+				stockWhere, stockParams,
+				{ "part" : self.__copyMapped("parts", "s.part"),
+				  "category" : stockCategory })
+			stockMap = self.__copyMapTable("stock")
+			self.__copyRows(c, "origins", columns["origins"],
+				"stockItem IN (SELECT old FROM %s)" % stockMap, (),
+				{ "stockItem" : self.__copyMapped("stock",
+								  "s.stockItem") })
+			self.__copyRows(c, "storages", columns["storages"],
+				"stockItem IN (SELECT old FROM %s)" % stockMap, (),
+				{ "stockItem" : self.__copyMapped("stock",
+								  "s.stockItem"),
+				  "quantity" : "s.quantity" if copyQuantities
+					       else "0" })
+			parentTypes = (
+				(Parameter.PTYPE_CATEGORY,	"categories"),
+				(Parameter.PTYPE_PART,		"parts"),
+				(Parameter.PTYPE_STOCKITEM,	"stock"),
+				(Parameter.PTYPE_ORIGIN,	"origins"),
+				(Parameter.PTYPE_STORAGE,	"storages"),
+			)
+			# One copy per parent type, so that each selection
+			# is a lookup in the parameters_parent index.
+			for ptype, table in parentTypes:
+				self.__copyRows(c, "parameters", columns["parameters"],
+					"parentType=%d AND parent IN "
+					"(SELECT old FROM %s)" % (
+					ptype, self.__copyMapTable(table)), (),
+					{ "parent" : self.__copyMapped(table, "s.parent") })
+			ret = []
+			for table in ("categories", "stock"):
+				c.execute("SELECT old, new FROM %s;" %\
+					  self.__copyMapTable(table))
+				ret.append(dict(c.fetchall()))
+			return ret
+		finally:
+			for table, columns in self.__COPY_TABLES:
+				c.execute("DROP TABLE IF EXISTS %s;" %\
+					  self.__copyMapTable(table))
+
+	@databaseCache.clearCache(databaseCache.ALL)
+	def copyStockItem(self, stockItem, targetCategory, copyQuantities=False):
+		"""Copy 'stockItem' with its part, origins, storages and
+		parameters into 'targetCategory'.
+		The storage quantities are only copied, if copyQuantities is True.
+		Otherwise the copied storages are empty.
+		Returns the new StockItem.
+		"""
+		if not self.isOpen():
+			return None
+
+		stockItemId = int(Entity.toId(stockItem))
+		targetCategoryId = int(Entity.toId(targetCategory))
+		try:
+			with self.transaction() as c:
+				categoryMap, stockMap = self.__copy(c, None, (), None,
+					"id=(SELECT part FROM stock WHERE id=?)",
+					(stockItemId,), str(targetCategoryId),
+					"id=?", (stockItemId,), str(targetCategoryId),
+					copyQuantities)
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+		if stockItemId not in stockMap:
+			raise PartMgrError("copyStockItem: Stock item %d "
+					   "does not exist" % stockItemId)
+		return self.getStockItem(stockMap[stockItemId])
+
+	@databaseCache.clearCache(databaseCache.ALL)
+	def copyCategorySubtree(self, category, targetParent, copyQuantities=False):
+		"""Copy 'category' with all sub-categories, parts and stock items
+		(including their origins, storages and parameters)
+		as a child of 'targetParent'.
+		'targetParent' may be None to create a root category.
+		The storage quantities are only copied, if copyQuantities is True.
+		Returns the new Category.
+		"""
+		if not self.isOpen():
+			return None
+
+		categoryId = int(Entity.toId(category))
+		targetParentId = int(Entity.toId(targetParent))
+		# Select the rows through the category index. A plain
+		# "category IN (...)" is planned as a scan in id order.
+		subtree = "id IN (SELECT t.id FROM %s AS m " \
+			  "CROSS JOIN %%s AS t ON (t.category = m.old))" %\
+			  self.__copyMapTable("categories")
+		try:
+			with self.transaction() as c:
+				categoryMap, stockMap = self.__copy(c,
+					"id IN ( "
+					"    WITH RECURSIVE "
+					"    subtree(id) AS ( "
+					"        SELECT ? "
+					"        UNION "
+					"        SELECT categories.id "
+					"        FROM categories JOIN subtree "
+					"        ON (categories.parent = subtree.id) "
+					"    ) "
+					"    SELECT id FROM subtree)",
+					(categoryId,),
+					"CASE WHEN s.id = %d THEN %d ELSE %s END" % (
+					categoryId, targetParentId,
+					self.__copyMapped("categories", "s.parent")),
+					subtree % "parts", (),
+					self.__copyMapped("categories", "s.category"),
+					subtree % "stock", (),
+					self.__copyMapped("categories", "s.category"),
+					copyQuantities)
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+		if categoryId not in categoryMap:
+			raise PartMgrError("copyCategorySubtree: Category %d "
+					   "does not exist" % categoryId)
+		return self.getCategory(categoryMap[categoryId])
+
+	@databaseCache.clearCache(databaseCache.ALL)
+	def moveStockItems(self, stockItems, targetCategory, moveParts=True):
+		"""Move all 'stockItems' (entities or ids) into 'targetCategory'
+		with one UPDATE of the stock table.
+		If 'moveParts' is True, parts that are only used by stock
+		items in 'targetCategory' after the move are moved along.
+		That is a second UPDATE of the parts table in the same
+		transaction.
+		"""
+		if not self.isOpen():
+			return
+
+		ids = [ (int(Entity.toId(s)),) for s in stockItems ]
+		targetCategoryId = int(Entity.toId(targetCategory))
+		if not Entity.isValidId(targetCategoryId):
+			raise PartMgrError("moveStockItems: Invalid target category")
+		stamp = Timestamp()
+		stamp.setNow()
+		try:
+			with self.transaction() as c:
+				c.execute("DROP TABLE IF EXISTS temp.moveids;")
+				c.execute("CREATE TABLE temp.moveids("
+					  "id INTEGER PRIMARY KEY);")
+				c.executemany("INSERT OR IGNORE INTO temp.moveids(id) "
+					      "VALUES(?);", ids)
+				if moveParts:
+					c.execute("UPDATE parts "
+						  "SET category=?, modifyTimeStamp=? "
+						  "WHERE category!=? "
+						  "AND id IN ( "
+						  "    SELECT part FROM stock "
+						  "    WHERE id IN (SELECT id FROM temp.moveids)) "
+						  "AND NOT EXISTS ( "
+						  "    SELECT 1 FROM stock "
+						  "    WHERE stock.part = parts.id "
+						  "    AND stock.category != ? "
+						  "    AND stock.id NOT IN "
+						  "    (SELECT id FROM temp.moveids));",
+						  (targetCategoryId, stamp.getStampInt(),
+						   targetCategoryId, targetCategoryId))
+				c.execute("UPDATE stock "
+					  "SET category=?, modifyTimeStamp=? "
+					  "WHERE category!=? "
+					  "AND id IN (SELECT id FROM temp.moveids);",
+					  (targetCategoryId, stamp.getStampInt(),
+					   targetCategoryId))
+				c.execute("DROP TABLE temp.moveids;")
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	@databaseCache.clearCache(databaseCache.ALL)
+	def moveCategory(self, category, newParent):
+		"""Move 'category' (with its subtree) below 'newParent'.
+		'newParent' may be None to make it a root category.
+		Raises PartMgrError, if the move would create a cycle.
+		"""
+		if not self.isOpen():
+			return
+
+		categoryId = int(Entity.toId(category))
+		newParentId = int(Entity.toId(newParent))
+		stamp = Timestamp()
+		stamp.setNow()
+		try:
+			c = self.db.cursor()
+			c.execute("UPDATE categories "
+				  "SET parent=?, modifyTimeStamp=? "
+				  "WHERE id=? "
+				  "AND ? NOT IN ( "
+				  "    WITH RECURSIVE "
+				  "    subtree(id) AS ( "
+				  "        SELECT ? "
+				  "        UNION "
+				  "        SELECT categories.id "
+				  "        FROM categories JOIN subtree "
+				  "        ON (categories.parent = subtree.id) "
+				  "    ) "
+				  "    SELECT id FROM subtree);",
+				  (newParentId, stamp.getStampInt(),
+				   categoryId, newParentId, categoryId))
+			moved = c.rowcount
+			self.__commit()
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+		if not moved:
+			if not self.getCategory(categoryId):
+				raise PartMgrError("moveCategory: Category %d "
+						   "does not exist" % categoryId)
+			raise PartMgrError("Cannot move category '%s' into "
+					   "its own sub-category" %\
+					   self.getCategory(categoryId).getName())
+
+	def __iterRows(self, query, params=()):
+		"""Execute 'query' and stream the result rows from the cursor.
+		At most ITER_CHUNK_SIZE rows are held in memory at a time.
+		"""
+		c = self.db.cursor()
+		c.execute(query, params)
+		while True:
+			data = c.fetchmany(self.ITER_CHUNK_SIZE)
+			if not data:
+				break
+			yield from data
+
+	# Keyset pagination descriptors:
+	# entityType: (table, extra columns, sort keys, filter keys)
+	# The extra columns follow the common entity columns
+	# id, name, description, flags, createTimeStamp, modifyTimeStamp.
+	# Sort keys map to the result column index.
+	# All sort keys and filter keys are indexed.
+	__PAGE_TABLES = {
+		"Parameter"	: ("parameters",
+				   ("parentType", "parent", "data"),
+				   { "id" : 0, },
+				   ("parentType", "parent")),
+		"Part"		: ("parts",
+				   ("category",),
+				   { "id" : 0, "modifyTimeStamp" : 5, },
+				   ("category",)),
+		"Category"	: ("categories",
+				   ("parent",),
+				   { "id" : 0, },
+				   ("parent",)),
+		"Supplier"	: ("suppliers",
+				   ("url",),
+				   { "id" : 0, },
+				   ()),
+		"Location"	: ("locations",
+				   (),
+				   { "id" : 0, },
+				   ()),
+		"Footprint"	: ("footprints",
+				   ("image",),
+				   { "id" : 0, },
+				   ()),
+		"StockItem"	: ("stock",
+				   ("part", "category", "footprint",
+				    "minQuantity", "targetQuantity",
+				    "quantityUnits"),
+				   { "id" : 0, "modifyTimeStamp" : 5, },
+				   ("category", "part")),
+		"Origin"	: ("origins",
+				   ("stockItem", "supplier", "orderCode",
+				    "price", "priceTimeStamp", "priceFact"),
+				   { "id" : 0, "modifyTimeStamp" : 5, },
+				   ("stockItem",)),
+		"Storage"	: ("storages",
+				   ("stockItem", "location", "quantity"),
+				   { "id" : 0, "modifyTimeStamp" : 5, },
+				   ("stockItem",)),
+	}
+
+	def page(self, entityType, afterKey=None, limit=200,
+		 orderBy="id", filter=None):
+		"""Fetch one page of entities with keyset (seek) pagination.
+		entityType is the Entity.getEntityType() string.
+		Returns a tuple (entities, nextKey). Pass nextKey as afterKey
+		to fetch the following page. nextKey is None after the last page.
+		orderBy is "id" or "modifyTimeStamp" (if indexed for entityType).
+		filter is a dict of column equality constraints on the
+		indexed reference columns, e.g. { "category" : category }.
+		The cost of a page does not depend on its offset.
+		"""
+		if not self.isOpen():
+			return [], None
+
+		try:
+			table, extraColumns, sortKeys, filterKeys =\
+				self.__PAGE_TABLES[entityType]
+		except KeyError as e:
+			raise PartMgrError("page: Unknown entity type '%s'" %\
+					   entityType)
+		if orderBy not in sortKeys:
+			raise PartMgrError("page: Can not order %s by '%s'" %\
+					   (entityType, orderBy))
+		try:
+			where = []
+			params = []
+			for column, value in sorted((filter or {}).items()):
+				if column not in filterKeys:
+					raise PartMgrError("page: Can not filter "
+						"%s by '%s'" % (entityType, column))
+				where.append("%s=?" % column)
+				params.append(int(Entity.toId(value)))
+			if afterKey is not None:
+				if orderBy == "id":
+					where.append("id>?")
+					params.append(int(afterKey))
+				else:
+					where.append("(%s, id)>(?, ?)" % orderBy)
+					params.extend(int(k) for k in afterKey)
+			order = "id" if orderBy == "id" else (orderBy + ", id")
+			c = self.db.cursor()
+			c.execute("SELECT id, name, description, flags, "
+				  "createTimeStamp, "
+				  "modifyTimeStamp%s "
+				  "FROM %s "
+				  "%s"
+				  "ORDER BY %s "
+				  "LIMIT ?;" % (
+				  "".join(", " + col for col in extraColumns),
+				  table,
+				  ("WHERE " + " AND ".join(where) + " ") if where else "",
+				  order),
+				  tuple(params) + (int(limit),))
+			data = c.fetchall()
+			mkEntity = {
+				"Parameter"	: self.__mkParameter,
+				"Part"		: self.__mkPart,
+				"Category"	: self.__mkCategory,
+				"Supplier"	: self.__mkSupplier,
+				"Location"	: self.__mkLocation,
+				"Footprint"	: self.__mkFootprint,
+				"StockItem"	: self.__mkStockItem,
+				"Origin"	: self.__mkOrigin,
+				"Storage"	: self.__mkStorage,
+			}[entityType]
+			entities = [ mkEntity(d) for d in data ]
+			nextKey = None
+			if data and len(data) >= limit:
+				last = data[-1]
+				if orderBy == "id":
+					nextKey = int(last[0])
+				else:
+					nextKey = (int(last[sortKeys[orderBy]]),
+						   int(last[0]))
+			return entities, nextKey
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
 
 	def __sqlIsEmpty(self):
 		try:
@@ -324,6 +1933,18 @@ class Database:
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
+	def __mkParameter(self, d):
+		return Parameter(name = fromBase64(d[1]),
+				 description = fromBase64(d[2]),
+				 flags = int(d[3]),
+				 createTimeStamp = int(d[4]),
+				 modifyTimeStamp = int(d[5]),
+				 parentType = int(d[6]),
+				 parent = int(d[7]),
+				 data = fromBase64(d[8], toBytes=True),
+				 id = int(d[0]),
+				 db = self)
+
 	def getGlobalParameter(self, paramName):
 		return self.getParameterByParent(paramName,
 						 Parameter.PTYPE_GLOBAL,
@@ -364,8 +1985,8 @@ class Database:
 					  (toBase64(parameter.name),
 					   toBase64(parameter.description),
 					   int(parameter.flags),
-					   int(parameter.createTimeStamp.getStampInt()),
-					   int(parameter.modifyTimeStamp.getStampInt()),
+					   parameter.getCreateTimeStampInt(),
+					   parameter.getModifyTimeStampInt(),
 					   int(parameter.parentType),
 					   int(parameter.parent),
 					   toBase64(parameter.data),
@@ -380,8 +2001,8 @@ class Database:
 					  (toBase64(parameter.name),
 					   toBase64(parameter.description),
 					   int(parameter.flags),
-					   int(parameter.createTimeStamp.getStampInt()),
-					   int(parameter.modifyTimeStamp.getStampInt()),
+					   parameter.getCreateTimeStampInt(),
+					   parameter.getModifyTimeStampInt(),
 					   int(parameter.parentType),
 					   int(parameter.parent),
 					   toBase64(parameter.data)))
@@ -434,29 +2055,31 @@ class Database:
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
+	def __mkPart(self, d):
+		return Part(name = fromBase64(d[1]),
+			    description = fromBase64(d[2]),
+			    flags = int(d[3]),
+			    createTimeStamp = int(d[4]),
+			    modifyTimeStamp = int(d[5]),
+			    category = int(d[6]),
+			    id = int(d[0]),
+			    db = self)
+
 	def getParts(self):
+		return list(self.iterParts())
+
+	def iterParts(self):
 		if not self.isOpen():
-			return []
+			return
 
 		try:
-			c = self.db.cursor()
-			c.execute("SELECT id, name, description, flags, "
-				  "createTimeStamp, "
-				  "modifyTimeStamp, "
-				  "category "
-				  "FROM parts;")
-			data = c.fetchall()
-			if not data:
-				return []
-			return [ Part(name = fromBase64(d[1]),
-				      description = fromBase64(d[2]),
-				      flags = int(d[3]),
-				      createTimeStamp = int(d[4]),
-				      modifyTimeStamp = int(d[5]),
-				      category = int(d[6]),
-				      id = int(d[0]),
-				      db = self)
-				for d in data ]
+			for d in self.__iterRows("SELECT id, name, description, flags, "
+						 "createTimeStamp, "
+						 "modifyTimeStamp, "
+						 "category "
+						 "FROM parts "
+						 "ORDER BY id;"):
+				yield self.__mkPart(d)
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
@@ -507,8 +2130,8 @@ class Database:
 					  (toBase64(part.name),
 					   toBase64(part.description),
 					   int(part.flags),
-					   int(part.createTimeStamp.getStampInt()),
-					   int(part.modifyTimeStamp.getStampInt()),
+					   part.getCreateTimeStampInt(),
+					   part.getModifyTimeStampInt(),
 					   int(part.category),
 					   int(part.id)))
 			else:
@@ -521,8 +2144,8 @@ class Database:
 					  (toBase64(part.name),
 					   toBase64(part.description),
 					   int(part.flags),
-					   int(part.createTimeStamp.getStampInt()),
-					   int(part.modifyTimeStamp.getStampInt()),
+					   part.getCreateTimeStampInt(),
+					   part.getModifyTimeStampInt(),
 					   int(part.category)))
 				part.id = c.lastrowid
 				part.db = self
@@ -573,6 +2196,16 @@ class Database:
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
+	def __mkCategory(self, d):
+		return Category(name = fromBase64(d[1]),
+				description = fromBase64(d[2]),
+				flags = int(d[3]),
+				createTimeStamp = int(d[4]),
+				modifyTimeStamp = int(d[5]),
+				parent = int(d[6]),
+				id = int(d[0]),
+				db = self)
+
 	def getRootCategories(self):
 		return self.getChildCategories(None)
 
@@ -597,15 +2230,7 @@ class Database:
 			data = c.fetchall()
 			if not data:
 				return []
-			return [ Category(name = fromBase64(d[1]),
-					  description = fromBase64(d[2]),
-					  flags = int(d[3]),
-					  createTimeStamp = int(d[4]),
-					  modifyTimeStamp = int(d[5]),
-					  parent = int(d[6]),
-					  id = int(d[0]),
-					  db = self)
-				for d in data ]
+			return [ self.__mkCategory(d) for d in data ]
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
@@ -646,8 +2271,8 @@ class Database:
 					  (toBase64(category.name),
 					   toBase64(category.description),
 					   int(category.flags),
-					   int(category.createTimeStamp.getStampInt()),
-					   int(category.modifyTimeStamp.getStampInt()),
+					   category.getCreateTimeStampInt(),
+					   category.getModifyTimeStampInt(),
 					   int(category.parent),
 					   int(category.id)))
 			else:
@@ -660,8 +2285,8 @@ class Database:
 					  (toBase64(category.name),
 					   toBase64(category.description),
 					   int(category.flags),
-					   int(category.createTimeStamp.getStampInt()),
-					   int(category.modifyTimeStamp.getStampInt()),
+					   category.getCreateTimeStampInt(),
+					   category.getModifyTimeStampInt(),
 					   int(category.parent)))
 				category.id = c.lastrowid
 				category.db = self
@@ -713,29 +2338,31 @@ class Database:
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
+	def __mkSupplier(self, d):
+		return Supplier(name = fromBase64(d[1]),
+				description = fromBase64(d[2]),
+				flags = int(d[3]),
+				createTimeStamp = int(d[4]),
+				modifyTimeStamp = int(d[5]),
+				url = fromBase64(d[6]),
+				id = int(d[0]),
+				db = self)
+
 	def getSuppliers(self):
+		return list(self.iterSuppliers())
+
+	def iterSuppliers(self):
 		if not self.isOpen():
-			return []
+			return
 
 		try:
-			c = self.db.cursor()
-			c.execute("SELECT id, name, description, flags, "
-				  "createTimeStamp, "
-				  "modifyTimeStamp, "
-				  "url "
-				  "FROM suppliers;")
-			data = c.fetchall()
-			if not data:
-				return []
-			return [ Supplier(name = fromBase64(d[1]),
-					  description = fromBase64(d[2]),
-					  flags = int(d[3]),
-					  createTimeStamp = int(d[4]),
-					  modifyTimeStamp = int(d[5]),
-					  url = fromBase64(d[6]),
-					  id = int(d[0]),
-					  db = self)
-				for d in data ]
+			for d in self.__iterRows("SELECT id, name, description, flags, "
+						 "createTimeStamp, "
+						 "modifyTimeStamp, "
+						 "url "
+						 "FROM suppliers "
+						 "ORDER BY id;"):
+				yield self.__mkSupplier(d)
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
@@ -756,8 +2383,8 @@ class Database:
 					  (toBase64(supplier.name),
 					   toBase64(supplier.description),
 					   int(supplier.flags),
-					   int(supplier.createTimeStamp.getStampInt()),
-					   int(supplier.modifyTimeStamp.getStampInt()),
+					   supplier.getCreateTimeStampInt(),
+					   supplier.getModifyTimeStampInt(),
 					   toBase64(supplier.url),
 					   int(supplier.id)))
 			else:
@@ -770,8 +2397,8 @@ class Database:
 					  (toBase64(supplier.name),
 					   toBase64(supplier.description),
 					   int(supplier.flags),
-					   int(supplier.createTimeStamp.getStampInt()),
-					   int(supplier.modifyTimeStamp.getStampInt()),
+					   supplier.getCreateTimeStampInt(),
+					   supplier.getModifyTimeStampInt(),
 					   toBase64(supplier.url)))
 				supplier.id = c.lastrowid
 				supplier.db = self
@@ -820,27 +2447,29 @@ class Database:
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
+	def __mkLocation(self, d):
+		return Location(name = fromBase64(d[1]),
+				description = fromBase64(d[2]),
+				flags = int(d[3]),
+				createTimeStamp = int(d[4]),
+				modifyTimeStamp = int(d[5]),
+				id = int(d[0]),
+				db = self)
+
 	def getLocations(self):
+		return list(self.iterLocations())
+
+	def iterLocations(self):
 		if not self.isOpen():
-			return []
+			return
 
 		try:
-			c = self.db.cursor()
-			c.execute("SELECT id, name, description, flags, "
-				  "createTimeStamp, "
-				  "modifyTimeStamp "
-				  "FROM locations;")
-			data = c.fetchall()
-			if not data:
-				return []
-			return [ Location(name = fromBase64(d[1]),
-					  description = fromBase64(d[2]),
-					  flags = int(d[3]),
-					  createTimeStamp = int(d[4]),
-					  modifyTimeStamp = int(d[5]),
-					  id = int(d[0]),
-					  db = self)
-				for d in data ]
+			for d in self.__iterRows("SELECT id, name, description, flags, "
+						 "createTimeStamp, "
+						 "modifyTimeStamp "
+						 "FROM locations "
+						 "ORDER BY id;"):
+				yield self.__mkLocation(d)
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
@@ -860,8 +2489,8 @@ class Database:
 					  (toBase64(location.name),
 					   toBase64(location.description),
 					   int(location.flags),
-					   int(location.createTimeStamp.getStampInt()),
-					   int(location.modifyTimeStamp.getStampInt()),
+					   location.getCreateTimeStampInt(),
+					   location.getModifyTimeStampInt(),
 					   int(location.id)))
 			else:
 				c.execute("INSERT INTO "
@@ -872,8 +2501,8 @@ class Database:
 					  (toBase64(location.name),
 					   toBase64(location.description),
 					   int(location.flags),
-					   int(location.createTimeStamp.getStampInt()),
-					   int(location.modifyTimeStamp.getStampInt())))
+					   location.getCreateTimeStampInt(),
+					   location.getModifyTimeStampInt()))
 				location.id = c.lastrowid
 				location.db = self
 			self.__commit()
@@ -923,29 +2552,46 @@ class Database:
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
-	def getFootprints(self):
+	def getFootprintNames(self):
+		"""Get a dict of all footprint names: { id : name }
+		The footprint images are not loaded.
+		"""
 		if not self.isOpen():
-			return []
+			return {}
 
 		try:
 			c = self.db.cursor()
-			c.execute("SELECT id, name, description, flags, "
-				  "createTimeStamp, "
-				  "modifyTimeStamp, "
-				  "image "
-				  "FROM footprints;")
-			data = c.fetchall()
-			if not data:
-				return []
-			return [ Footprint(name = fromBase64(d[1]),
-					   description = fromBase64(d[2]),
-					   flags = int(d[3]),
-					   createTimeStamp = int(d[4]),
-					   modifyTimeStamp = int(d[5]),
-					   image = Image(d[6]),
-					   id = int(d[0]),
-					   db = self)
-				for d in data ]
+			c.execute("SELECT id, name FROM footprints;")
+			return { int(d[0]) : fromBase64(d[1])
+				 for d in c.fetchall() }
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	def __mkFootprint(self, d):
+		return Footprint(name = fromBase64(d[1]),
+				 description = fromBase64(d[2]),
+				 flags = int(d[3]),
+				 createTimeStamp = int(d[4]),
+				 modifyTimeStamp = int(d[5]),
+				 image = Image(d[6]),
+				 id = int(d[0]),
+				 db = self)
+
+	def getFootprints(self):
+		return list(self.iterFootprints())
+
+	def iterFootprints(self):
+		if not self.isOpen():
+			return
+
+		try:
+			for d in self.__iterRows("SELECT id, name, description, flags, "
+						 "createTimeStamp, "
+						 "modifyTimeStamp, "
+						 "image "
+						 "FROM footprints "
+						 "ORDER BY id;"):
+				yield self.__mkFootprint(d)
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
@@ -966,8 +2612,8 @@ class Database:
 					  (toBase64(footprint.name),
 					   toBase64(footprint.description),
 					   int(footprint.flags),
-					   int(footprint.createTimeStamp.getStampInt()),
-					   int(footprint.modifyTimeStamp.getStampInt()),
+					   footprint.getCreateTimeStampInt(),
+					   footprint.getModifyTimeStampInt(),
 					   footprint.image.toString(),
 					   int(footprint.id)))
 			else:
@@ -980,8 +2626,8 @@ class Database:
 					  (toBase64(footprint.name),
 					   toBase64(footprint.description),
 					   int(footprint.flags),
-					   int(footprint.createTimeStamp.getStampInt()),
-					   int(footprint.modifyTimeStamp.getStampInt()),
+					   footprint.getCreateTimeStampInt(),
+					   footprint.getModifyTimeStampInt(),
 					   footprint.image.toString()))
 				footprint.id = c.lastrowid
 				footprint.db = self
@@ -1040,173 +2686,461 @@ class Database:
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
-	@databaseCache.cache(databaseCache.STOCKITEM)
+	def __mkStockItem(self, d):
+		return StockItem(name = fromBase64(d[1]),
+				 description = fromBase64(d[2]),
+				 flags = int(d[3]),
+				 createTimeStamp = int(d[4]),
+				 modifyTimeStamp = int(d[5]),
+				 part = int(d[6]),
+				 category = int(d[7]),
+				 footprint = int(d[8]),
+				 minQuantity = int(d[9]),
+				 targetQuantity = int(d[10]),
+				 quantityUnits = int(d[11]),
+				 id = int(d[0]),
+				 db = self)
+
 	def getAllStockItems(self):
+		return list(self.iterStockItems())
+
+	def iterStockItems(self, category=None):
+		"""Stream all stock items, or all stock items of 'category'.
+		"""
 		if not self.isOpen():
-			return []
+			return
 
 		try:
-			c = self.db.cursor()
-			c.execute("SELECT id, name, description, flags, "
-				  "createTimeStamp, "
-				  "modifyTimeStamp, "
-				  "part, category, footprint, "
-				  "minQuantity, targetQuantity, "
-				  "quantityUnits "
-				  "FROM stock "
-				  "ORDER BY id;")
-			data = c.fetchall()
-			if not data:
-				return []
-			return [ StockItem(name = fromBase64(d[1]),
-					   description = fromBase64(d[2]),
-					   flags = int(d[3]),
-					   createTimeStamp = int(d[4]),
-					   modifyTimeStamp = int(d[5]),
-					   part = int(d[6]),
-					   category = int(d[7]),
-					   footprint = int(d[8]),
-					   minQuantity = int(d[9]),
-					   targetQuantity = int(d[10]),
-					   quantityUnits = int(d[11]),
-					   id = int(d[0]),
-					   db = self)
-				for d in data ]
+			query = "SELECT id, name, description, flags, "\
+				"createTimeStamp, "\
+				"modifyTimeStamp, "\
+				"part, category, footprint, "\
+				"minQuantity, targetQuantity, "\
+				"quantityUnits "\
+				"FROM stock "
+			params = ()
+			if category is not None:
+				query += "WHERE category=? "
+				params = (int(Entity.toId(category)),)
+			query += "ORDER BY id;"
+			for d in self.__iterRows(query, params):
+				yield self.__mkStockItem(d)
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
 	@databaseCache.cache(databaseCache.STOCKITEM)
 	def getStockItemsByCategory(self, category):
+		return list(self.iterStockItems(Entity.toId(category)))
+
+	def getStockItemsToPurchase(self):
+		return list(self.iterStockItemsToPurchase())
+
+	def iterStockItemsToPurchase(self):
 		if not self.isOpen():
-			return []
+			return
 
-		categoryId = Entity.toId(category)
+		try:
+			for d in self.__iterRows("SELECT stock.id, "
+						 "stock.name, "
+						 "stock.description, "
+						 "stock.flags, "
+						 "stock.createTimeStamp, "
+						 "stock.modifyTimeStamp, "
+						 "stock.part, "
+						 "stock.category, "
+						 "stock.footprint, "
+						 "stock.minQuantity, "
+						 "stock.targetQuantity, "
+						 "stock.quantityUnits "
+						 "FROM stock "
+						 "JOIN ( "
+						 "    SELECT storages.stockItem as sid, "
+						 "    SUM(storages.quantity) AS quantitySum "
+						 "    FROM storages "
+						 "    GROUP BY sid "
+						 ") "
+						 "ON (sid = stock.id) "
+						 "WHERE (quantitySum < stock.minQuantity);"):
+				yield self.__mkStockItem(d)
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	def getStockItemsWithMissingPrice(self):
+		return list(self.iterStockItemsWithMissingPrice())
+
+	def iterStockItemsWithMissingPrice(self):
+		if not self.isOpen():
+			return
+
+		try:
+			for d in self.__iterRows("SELECT stock.id, "
+						 "stock.name, "
+						 "stock.description, "
+						 "stock.flags, "
+						 "stock.createTimeStamp, "
+						 "stock.modifyTimeStamp, "
+						 "stock.part, "
+						 "stock.category, "
+						 "stock.footprint, "
+						 "stock.minQuantity, "
+						 "stock.targetQuantity, "
+						 "stock.quantityUnits "
+						 "FROM stock "
+						 "JOIN ( "
+						 "    SELECT origins.stockItem as sid, "
+						 "    MIN(origins.price) AS minPrice "
+						 "    FROM origins "
+						 "    GROUP BY sid "
+						 ") "
+						 "ON (sid = stock.id) "
+						 "WHERE (minPrice < 0);"):
+				yield self.__mkStockItem(d)
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	def getStockItemsByValue(self, values):
+		"""Look up stock items by value strings.
+		A stock item matches a value, if the stock item name,
+		its part name or the data of one of its stock item or
+		part parameters is equal to the value.
+		Returns a dict: { value : [ matching stock items ] }
+		The lists are sorted by stock item id.
+		"""
+		if not self.isOpen():
+			return {}
+
+		values = list(set(str(v) for v in values))
+		ret = {}
 		try:
 			c = self.db.cursor()
-			c.execute("SELECT id, name, description, flags, "
-				  "createTimeStamp, "
-				  "modifyTimeStamp, "
-				  "part, category, footprint, "
-				  "minQuantity, targetQuantity, "
-				  "quantityUnits "
-				  "FROM stock "
-				  "WHERE category=? "
-				  "ORDER BY id;",
-				  (categoryId,))
-			data = c.fetchall()
-			if not data:
-				return []
-			return [ StockItem(name = fromBase64(d[1]),
-					   description = fromBase64(d[2]),
-					   flags = int(d[3]),
-					   createTimeStamp = int(d[4]),
-					   modifyTimeStamp = int(d[5]),
-					   part = int(d[6]),
-					   category = int(d[7]),
-					   footprint = int(d[8]),
-					   minQuantity = int(d[9]),
-					   targetQuantity = int(d[10]),
-					   quantityUnits = int(d[11]),
-					   id = int(d[0]),
-					   db = self)
-				for d in data ]
+			for i in range(0, len(values), self.LOOKUP_CHUNK_SIZE):
+				chunk = [ toBase64(v) for v in
+					  values[i : i + self.LOOKUP_CHUNK_SIZE] ]
+				inList = ",".join("?" * len(chunk))
+				c.execute("SELECT matches.value, "
+					  "stock.id, "
+					  "stock.name, "
+					  "stock.description, "
+					  "stock.flags, "
+					  "stock.createTimeStamp, "
+					  "stock.modifyTimeStamp, "
+					  "stock.part, "
+					  "stock.category, "
+					  "stock.footprint, "
+					  "stock.minQuantity, "
+					  "stock.targetQuantity, "
+					  "stock.quantityUnits "
+					  "FROM ( "
+					  "    SELECT name AS value, id AS sid "
+					  "    FROM stock WHERE name IN (%s) "
+					  "    UNION "
+					  "    SELECT parts.name, stock.id "
+					  "    FROM parts JOIN stock "
+					  "    ON (stock.part = parts.id) "
+					  "    WHERE parts.name IN (%s) "
+					  "    UNION "
+					  "    SELECT data, parent "
+					  "    FROM parameters "
+					  "    WHERE data IN (%s) AND parentType=? "
+					  "    UNION "
+					  "    SELECT parameters.data, stock.id "
+					  "    FROM parameters JOIN stock "
+					  "    ON (stock.part = parameters.parent) "
+					  "    WHERE parameters.data IN (%s) "
+					  "    AND parameters.parentType=? "
+					  ") AS matches "
+					  "JOIN stock ON (stock.id = matches.sid) "
+					  "ORDER BY stock.id;" % (
+					  inList, inList, inList, inList),
+					  chunk + chunk +
+					  chunk + [ Parameter.PTYPE_STOCKITEM ] +
+					  chunk + [ Parameter.PTYPE_PART ])
+				for d in c.fetchall():
+					ret.setdefault(fromBase64(d[0]), []).append(
+						self.__mkStockItem(d[1:]))
+			return ret
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
-	def getStockItemsToPurchase(self):
+	def getStockItemsByIds(self, stockItems):
+		"""Get the 'stockItems' (entities or ids) with one query
+		per LOOKUP_CHUNK_SIZE ids.
+		Returns a dict: { stock item id : StockItem }
+		Ids that do not exist are not in the dict.
+		"""
 		if not self.isOpen():
-			return []
+			return {}
 
+		ids = list(set(int(Entity.toId(s)) for s in stockItems))
+		ret = {}
 		try:
 			c = self.db.cursor()
-			c.execute("SELECT stock.id, "
-				  "stock.name, "
-				  "stock.description, "
-				  "stock.flags, "
-				  "stock.createTimeStamp, "
-				  "stock.modifyTimeStamp, "
-				  "stock.part, "
-				  "stock.category, "
-				  "stock.footprint, "
-				  "stock.minQuantity, "
-				  "stock.targetQuantity, "
-				  "stock.quantityUnits "
-				  "FROM stock "
-				  "JOIN ( "
-				  "    SELECT storages.stockItem as sid, "
-				  "    SUM(storages.quantity) AS quantitySum "
-				  "    FROM storages "
-				  "    GROUP BY sid "
-				  ") "
-				  "ON (sid = stock.id) "
-				  "WHERE (quantitySum < stock.minQuantity);")
-			data = c.fetchall()
-			if not data:
-				return []
-			return [ StockItem(id = int(d[0]),
-					   name = fromBase64(d[1]),
-					   description = fromBase64(d[2]),
-					   flags = int(d[3]),
-					   createTimeStamp = int(d[4]),
-					   modifyTimeStamp = int(d[5]),
-					   part = int(d[6]),
-					   category = int(d[7]),
-					   footprint = int(d[8]),
-					   minQuantity = int(d[9]),
-					   targetQuantity = int(d[10]),
-					   quantityUnits = int(d[11]),
-					   db = self)
-				for d in data ]
+			for i in range(0, len(ids), self.LOOKUP_CHUNK_SIZE):
+				chunk = ids[i : i + self.LOOKUP_CHUNK_SIZE]
+				c.execute("SELECT id, name, description, flags, "
+					  "createTimeStamp, "
+					  "modifyTimeStamp, "
+					  "part, category, footprint, "
+					  "minQuantity, targetQuantity, "
+					  "quantityUnits "
+					  "FROM stock "
+					  "WHERE id IN (%s);" %\
+					  ",".join("?" * len(chunk)),
+					  chunk)
+				ret.update((int(d[0]), self.__mkStockItem(d))
+					   for d in c.fetchall())
+			return ret
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
-	def getStockItemsWithMissingPrice(self):
+	def getGlobalQuantities(self, stockItems=None):
+		"""Get the global quantities of 'stockItems'
+		(or of all stock items, if None) with one aggregate query.
+		Returns a dict: { stock item id : quantity }
+		Stock items without storages are not in the dict.
+		"""
 		if not self.isOpen():
-			return []
+			return {}
 
 		try:
 			c = self.db.cursor()
-			c.execute("SELECT stock.id, "
-				  "stock.name, "
-				  "stock.description, "
-				  "stock.flags, "
-				  "stock.createTimeStamp, "
-				  "stock.modifyTimeStamp, "
-				  "stock.part, "
-				  "stock.category, "
-				  "stock.footprint, "
-				  "stock.minQuantity, "
-				  "stock.targetQuantity, "
-				  "stock.quantityUnits "
-				  "FROM stock "
-				  "JOIN ( "
-				  "    SELECT origins.stockItem as sid, "
-				  "    MIN(origins.price) AS minPrice "
-				  "    FROM origins "
-				  "    GROUP BY sid "
-				  ") "
-				  "ON (sid = stock.id) "
-				  "WHERE (minPrice < 0);")
-			data = c.fetchall()
-			if not data:
-				return []
-			return [ StockItem(id = int(d[0]),
-					   name = fromBase64(d[1]),
-					   description = fromBase64(d[2]),
-					   flags = int(d[3]),
-					   createTimeStamp = int(d[4]),
-					   modifyTimeStamp = int(d[5]),
-					   part = int(d[6]),
-					   category = int(d[7]),
-					   footprint = int(d[8]),
-					   minQuantity = int(d[9]),
-					   targetQuantity = int(d[10]),
-					   quantityUnits = int(d[11]),
-					   db = self)
-				for d in data ]
+			query = "SELECT stockItem, SUM(quantity) "\
+				"FROM storages "
+			if stockItems is None:
+				c.execute(query + "GROUP BY stockItem;")
+				return { int(d[0]) : int(d[1]) for d in c.fetchall() }
+			ids = list(set(int(Entity.toId(s)) for s in stockItems))
+			ret = {}
+			for i in range(0, len(ids), self.LOOKUP_CHUNK_SIZE):
+				chunk = ids[i : i + self.LOOKUP_CHUNK_SIZE]
+				c.execute(query + "WHERE stockItem IN (%s) "
+					  "GROUP BY stockItem;" %\
+					  ",".join("?" * len(chunk)),
+					  chunk)
+				ret.update((int(d[0]), int(d[1])) for d in c.fetchall())
+			return ret
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
+	def getGlobalStats(self, nrLargestCategories=10):
+		"""Compute the database statistics with a few aggregate queries.
+		Returns a GlobalStats object.
+		"""
+		stats = GlobalStats()
+		if not self.isOpen():
+			return stats
+
+		tables = ("categories", "parts", "stock", "suppliers",
+			  "locations", "footprints", "origins", "storages")
+		try:
+			c = self.db.cursor()
+			c.execute("SELECT %s, "
+				  "(SELECT TOTAL(quantity) FROM storages);" % ", ".join(
+				  "(SELECT COUNT(*) FROM %s)" % t for t in tables))
+			d = c.fetchone()
+			stats.counts = dict(zip(tables, d))
+			stats.totalQuantity = int(d[-1])
+
+			# Index seeks dominate the run time. Each query below
+			# seeks at most once per stock item. Everything else
+			# is streamed from covering indices.
+			# Orphaned origins and storages (see purge()) are
+			# counted, like in the counts above.
+			c.execute("SELECT COUNT(*) FROM stock "
+				  "WHERE minQuantity > 0 AND minQuantity > ( "
+				  "    SELECT TOTAL(quantity) FROM storages "
+				  "    WHERE stockItem = stock.id);")
+			stats.belowMinimum = int(c.fetchone()[0])
+			# Negative prices mean "no price".
+			c.execute("SELECT COUNT(*) FROM stock "
+				  "WHERE NOT EXISTS ( "
+				  "    SELECT 1 FROM origins "
+				  "    WHERE stockItem = stock.id AND price >= 0);")
+			stats.withoutPrice = int(c.fetchone()[0])
+			# The cheapest effective price per priced stock item,
+			# grouped in origins_stockItem_price index order.
+			c.execute("SELECT TOTAL(price * ( "
+				  "    SELECT TOTAL(quantity) FROM storages "
+				  "    WHERE stockItem = cheapest.stockItem)) "
+				  "FROM ( "
+				  "    SELECT stockItem, "
+				  "    MIN(price * priceFact) AS price "
+				  "    FROM origins WHERE price >= 0 "
+				  "    GROUP BY stockItem "
+				  ") AS cheapest;")
+			d = c.fetchone()
+			currency = self.getGlobalParameter("currency")
+			currency = Param_Currency.CURRNAMES[currency.getDataInt()][0]
+			stats.inventoryValue = { currency : float(d[0]) }
+
+			# The DISTINCT sub-queries stream one index range
+			# per supplier or location. A COUNT(DISTINCT) over
+			# all rows needs a temporary B-tree.
+			c.execute("SELECT id, name, ( "
+				  "    SELECT COUNT(*) FROM ( "
+				  "        SELECT DISTINCT stockItem FROM origins "
+				  "        WHERE supplier = suppliers.id)), ( "
+				  "    SELECT COUNT(*) FROM origins "
+				  "    WHERE supplier = suppliers.id) "
+				  "FROM suppliers ORDER BY id;")
+			stats.suppliers = [ (int(d[0]), fromBase64(d[1]),
+					     int(d[2]), int(d[3]))
+					    for d in c.fetchall() ]
+			c.execute("SELECT id, name, ( "
+				  "    SELECT COUNT(*) FROM ( "
+				  "        SELECT DISTINCT stockItem FROM storages "
+				  "        WHERE location = locations.id)), ( "
+				  "    SELECT TOTAL(quantity) FROM storages "
+				  "    WHERE location = locations.id) "
+				  "FROM locations ORDER BY id;")
+			stats.locations = [ (int(d[0]), fromBase64(d[1]),
+					     int(d[2]), int(d[3]))
+					    for d in c.fetchall() ]
+
+			c.execute("SELECT categories.id, categories.name, n "
+				  "FROM ( "
+				  "    SELECT category, COUNT(*) AS n "
+				  "    FROM stock GROUP BY category "
+				  "    ORDER BY n DESC LIMIT ? "
+				  ") "
+				  "JOIN categories ON (categories.id = category) "
+				  "ORDER BY n DESC, categories.id;",
+				  (int(nrLargestCategories),))
+			stats.largestCategories = [ (int(d[0]), fromBase64(d[1]),
+						     int(d[2]))
+						    for d in c.fetchall() ]
+		except (sql.Error, ValueError, TypeError, KeyError) as e:
+			self.__databaseError(e)
+		return stats
+
+	def getValuation(self):
+		"""Compute the inventory valuation per category and overall
+		with one query. The cheapest origin of each stock item is
+		selected with a window function and the category values
+		are rolled up via the category hierarchy.
+		Returns a Valuation object.
+		"""
+		stamp = Timestamp()
+		stamp.setNow()
+		if not self.isOpen():
+			return Valuation("", stamp)
+
+		try:
+			currency = self.getGlobalParameter("currency")
+			valuation = Valuation(
+				Param_Currency.CURRNAMES[currency.getDataInt()][0],
+				stamp)
+
+			c = self.db.cursor()
+			c.execute("WITH RECURSIVE "
+				  "cheapest(stockItem, price) AS ( "
+				  "    SELECT stockItem, price FROM ( "
+				  "        SELECT stockItem, "
+				  "        price * priceFact AS price, "
+				  "        ROW_NUMBER() OVER ( "
+				  "            PARTITION BY stockItem "
+				  "            ORDER BY price * priceFact, id "
+				  "        ) AS n "
+				  "        FROM origins WHERE price >= 0 "
+				  "    ) WHERE n = 1 "
+				  "), "
+				  "items(category, quantity, value, unpriced) AS ( "
+				  "    SELECT stock.category, "
+				  "    IFNULL(q.quantity, 0), "
+				  "    IFNULL(q.quantity * cheapest.price, 0), "
+				  "    IFNULL(q.quantity, 0) > 0 "
+				  "        AND cheapest.price IS NULL "
+				  "    FROM stock "
+				  "    LEFT JOIN ( "
+				  "        SELECT stockItem, "
+				  "        SUM(quantity) AS quantity "
+				  "        FROM storages GROUP BY stockItem "
+				  "    ) AS q ON (q.stockItem = stock.id) "
+				  "    LEFT JOIN cheapest "
+				  "        ON (cheapest.stockItem = stock.id) "
+				  "), "
+				  "own(category, items, quantity, value, unpriced) AS ( "
+				  "    SELECT category, COUNT(*), TOTAL(quantity), "
+				  "    TOTAL(value), TOTAL(unpriced) "
+				  "    FROM items GROUP BY category "
+				  "), "
+				  # All (category, sub category) pairs.
+				  # UNION terminates on category cycles.
+				  "subtree(root, id) AS ( "
+				  "    SELECT id, id FROM categories "
+				  "    UNION "
+				  "    SELECT subtree.root, categories.id "
+				  "    FROM categories JOIN subtree "
+				  "    ON (categories.parent = subtree.id) "
+				  "), "
+				  "total(root, items, quantity, value, unpriced) AS ( "
+				  "    SELECT subtree.root, TOTAL(own.items), "
+				  "    TOTAL(own.quantity), TOTAL(own.value), "
+				  "    TOTAL(own.unpriced) "
+				  "    FROM subtree JOIN own "
+				  "    ON (own.category = subtree.id) "
+				  "    GROUP BY subtree.root "
+				  ") "
+				  "SELECT categories.id, categories.name, "
+				  "categories.parent, "
+				  "own.items, own.quantity, own.value, own.unpriced, "
+				  "total.items, total.quantity, total.value, "
+				  "total.unpriced "
+				  "FROM categories "
+				  "LEFT JOIN own ON (own.category = categories.id) "
+				  "LEFT JOIN total ON (total.root = categories.id) "
+				  # Stock items in nonexistent categories.
+				  "UNION ALL "
+				  "SELECT NULL, NULL, NULL, "
+				  "items, quantity, value, unpriced, "
+				  "NULL, NULL, NULL, NULL "
+				  "FROM own WHERE category NOT IN ( "
+				  "    SELECT id FROM categories "
+				  ");")
+			categories = {}
+			for d in c.fetchall():
+				if d[3] is not None:
+					valuation.totalItems += int(d[3])
+					valuation.totalQuantity += int(d[4])
+					valuation.totalValue += float(d[5])
+					valuation.totalUnpriced += int(d[6])
+				if d[0] is None:
+					continue
+				cat = CategoryValuation(int(d[0]), fromBase64(d[1]),
+							int(d[2]))
+				if d[3] is not None:
+					cat.ownItems = int(d[3])
+					cat.ownQuantity = int(d[4])
+					cat.ownValue = float(d[5])
+					cat.ownUnpriced = int(d[6])
+				if d[7] is not None:
+					cat.totalItems = int(d[7])
+					cat.totalQuantity = int(d[8])
+					cat.totalValue = float(d[9])
+					cat.totalUnpriced = int(d[10])
+				categories[cat.categoryId] = cat
+		except (sql.Error, ValueError, TypeError, KeyError) as e:
+			self.__databaseError(e)
+
+		# Sort the categories in tree order and build the paths.
+		children = {}
+		for cat in categories.values():
+			parent = cat.parent if cat.parent in categories else Entity.NO_ID
+			children.setdefault(parent, []).append(cat)
+		stack = [ (cat, cat.name) for cat in
+			  sorted(children.get(Entity.NO_ID, ()),
+				 key=lambda cat: cat.name, reverse=True) ]
+		while stack:
+			cat, path = stack.pop()
+			cat.path = path
+			valuation.categories.append(cat)
+			stack.extend((child, path + Valuation.CATEGORY_SEPARATOR +
+				      child.name)
+				     for child in sorted(children.get(cat.categoryId, ()),
+							 key=lambda cat: cat.name,
+							 reverse=True))
+		return valuation
+
 	@databaseCache.cache(databaseCache.STOCKITEM)
 	def countStockItemsByCategory(self, category):
 		if not self.isOpen():
@@ -1248,8 +3182,8 @@ class Database:
 					  (toBase64(stockItem.name),
 					   toBase64(stockItem.description),
 					   int(stockItem.flags),
-					   int(stockItem.createTimeStamp.getStampInt()),
-					   int(stockItem.modifyTimeStamp.getStampInt()),
+					   stockItem.getCreateTimeStampInt(),
+					   stockItem.getModifyTimeStampInt(),
 					   int(stockItem.part),
 					   int(stockItem.category),
 					   int(stockItem.footprint),
@@ -1269,8 +3203,8 @@ class Database:
 					  (toBase64(stockItem.name),
 					   toBase64(stockItem.description),
 					   int(stockItem.flags),
-					   int(stockItem.createTimeStamp.getStampInt()),
-					   int(stockItem.modifyTimeStamp.getStampInt()),
+					   stockItem.getCreateTimeStampInt(),
+					   stockItem.getModifyTimeStampInt(),
 					   int(stockItem.part),
 					   int(stockItem.category),
 					   int(stockItem.footprint),
@@ -1340,6 +3274,21 @@ class Database:
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
+	def __mkOrigin(self, d):
+		return Origin(name = fromBase64(d[1]),
+			      description = fromBase64(d[2]),
+			      flags = int(d[3]),
+			      createTimeStamp = int(d[4]),
+			      modifyTimeStamp = int(d[5]),
+			      stockItem = int(d[6]),
+			      supplier = int(d[7]),
+			      orderCode = fromBase64(d[8]),
+			      price = float(d[9]),
+			      priceTimeStamp = int(d[10]),
+			      priceFact = float(d[11]),
+			      id = int(d[0]),
+			      db = self)
+
 	def getOriginsByStockItem(self, stockItem):
 		if not self.isOpen():
 			return []
@@ -1407,8 +3356,8 @@ class Database:
 					  (toBase64(origin.name),
 					   toBase64(origin.description),
 					   int(origin.flags),
-					   int(origin.createTimeStamp.getStampInt()),
-					   int(origin.modifyTimeStamp.getStampInt()),
+					   origin.getCreateTimeStampInt(),
+					   origin.getModifyTimeStampInt(),
 					   int(origin.stockItem),
 					   int(origin.supplier),
 					   toBase64(origin.orderCode),
@@ -1434,8 +3383,8 @@ class Database:
 					  (toBase64(origin.name),
 					   toBase64(origin.description),
 					   int(origin.flags),
-					   int(origin.createTimeStamp.getStampInt()),
-					   int(origin.modifyTimeStamp.getStampInt()),
+					   origin.getCreateTimeStampInt(),
+					   origin.getModifyTimeStampInt(),
 					   int(origin.stockItem),
 					   int(origin.supplier),
 					   toBase64(origin.orderCode),
@@ -1463,6 +3412,127 @@ class Database:
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
+	def getPriceHistory(self, origin, start=None, end=None):
+		"""Get the recorded prices of 'origin', optionally limited
+		to the time range 'start' to 'end' (inclusive).
+		Returns a list of (Timestamp, price, priceFact), oldest first.
+		A price of Origin.NO_PRICE means that the price was removed.
+		"""
+		if not self.isOpen():
+			return []
+
+		try:
+			c = self.db.cursor()
+			c.execute("SELECT timeStamp, price, priceFact "
+				  "FROM price_history "
+				  "WHERE origin=? AND timeStamp BETWEEN ? AND ? "
+				  "ORDER BY timeStamp, id;",
+				  (int(Entity.toId(origin)),
+				   0 if start is None else Timestamp.toInt(start),
+				   2**63 - 1 if end is None else Timestamp.toInt(end)))
+			return [ (Timestamp(d[0]), float(d[1]), float(d[2]))
+				 for d in c.fetchall() ]
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	def getPriceAt(self, origin, stamp):
+		"""Get the price of 'origin' that was valid at time 'stamp'.
+		Returns a (price, priceFact) tuple or None,
+		if there was no price at that time.
+		"""
+		if not self.isOpen():
+			return None
+
+		try:
+			c = self.db.cursor()
+			c.execute("SELECT price, priceFact "
+				  "FROM price_history "
+				  "WHERE origin=? AND timeStamp <= ? "
+				  "ORDER BY timeStamp DESC, id DESC "
+				  "LIMIT 1;",
+				  (int(Entity.toId(origin)), Timestamp.toInt(stamp)))
+			d = c.fetchone()
+			if not d or float(d[0]) < 0.0:
+				return None
+			return (float(d[0]), float(d[1]))
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	def getPriceRange(self, origin, start, end):
+		"""Get the minimum and maximum effective price
+		(price * priceFact) of 'origin' in the time range 'start'
+		to 'end'. The price that was valid at 'start' is included.
+		Returns a (min, max) tuple or None, if there was no price.
+		"""
+		if not self.isOpen():
+			return None
+
+		id = int(Entity.toId(origin))
+		start = Timestamp.toInt(start)
+		try:
+			c = self.db.cursor()
+			c.execute("SELECT MIN(price * priceFact), "
+				  "MAX(price * priceFact) "
+				  "FROM price_history "
+				  "WHERE origin=? AND price >= 0 "
+				  "AND timeStamp <= ? "
+				  "AND timeStamp >= COALESCE(( "
+				  "    SELECT MAX(timeStamp) FROM price_history "
+				  "    WHERE origin=? AND timeStamp <= ? "
+				  "), ?);",
+				  (id, Timestamp.toInt(end), id, start, start))
+			d = c.fetchone()
+			if d[0] is None:
+				return None
+			return (float(d[0]), float(d[1]))
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
+	def compactPriceHistory(self, before, bucketSeconds=60 * 60 * 24 * 30):
+		"""Compact the price history samples older than 'before'
+		into buckets of 'bucketSeconds'. Per origin and bucket only
+		the samples with the lowest and the highest effective price
+		and the last sample are kept. So min/max queries over whole
+		buckets and price-at-date queries after a bucket still
+		return the same results.
+		Returns the number of deleted samples.
+		"""
+		if not self.isOpen():
+			return 0
+
+		bucketSeconds = int(bucketSeconds)
+		if bucketSeconds <= 0:
+			raise PartMgrError("Invalid price history bucket size")
+		try:
+			with self.transaction() as c:
+				c.execute("DELETE FROM price_history "
+					  "WHERE timeStamp < ? AND id NOT IN ( "
+					  "    SELECT id FROM ( "
+					  "        SELECT id, "
+					  "        ROW_NUMBER() OVER (bucket "
+					  "            ORDER BY timeStamp DESC, id DESC "
+					  "        ) AS last, "
+					  "        ROW_NUMBER() OVER (bucket "
+					  "            ORDER BY price < 0, "
+					  "            price * priceFact, id "
+					  "        ) AS low, "
+					  "        ROW_NUMBER() OVER (bucket "
+					  "            ORDER BY price * priceFact DESC, id "
+					  "        ) AS high "
+					  "        FROM price_history "
+					  "        WHERE timeStamp < ? "
+					  "        WINDOW bucket AS ( "
+					  "            PARTITION BY origin, timeStamp / ? "
+					  "        ) "
+					  "    ) WHERE last = 1 OR low = 1 OR high = 1 "
+					  ");",
+					  (Timestamp.toInt(before),
+					   Timestamp.toInt(before),
+					   bucketSeconds))
+				return c.rowcount
+		except (sql.Error, ValueError, TypeError) as e:
+			self.__databaseError(e)
+
 	def getStorage(self, storage):
 		if not self.isOpen():
 			return None
@@ -1493,6 +3563,18 @@ class Database:
 		except (sql.Error, ValueError, TypeError) as e:
 			self.__databaseError(e)
 
+	def __mkStorage(self, d):
+		return Storage(name = fromBase64(d[1]),
+			       description = fromBase64(d[2]),
+			       flags = int(d[3]),
+			       createTimeStamp = int(d[4]),
+			       modifyTimeStamp = int(d[5]),
+			       stockItem = int(d[6]),
+			       location = int(d[7]),
+			       quantity = int(d[8]),
+			       id = int(d[0]),
+			       db = self)
+
 	def getStoragesByStockItem(self, stockItem):
 		if not self.isOpen():
 			return []
@@ -1542,8 +3624,8 @@ class Database:
 					  (toBase64(storage.name),
 					   toBase64(storage.description),
 					   int(storage.flags),
-					   int(storage.createTimeStamp.getStampInt()),
-					   int(storage.modifyTimeStamp.getStampInt()),
+					   storage.getCreateTimeStampInt(),
+					   storage.getModifyTimeStampInt(),
 					   int(storage.stockItem),
 					   int(storage.location),
 					   int(storage.quantity),
@@ -1558,8 +3640,8 @@ class Database:
 					  (toBase64(storage.name),
 					   toBase64(storage.description),
 					   int(storage.flags),
-					   int(storage.createTimeStamp.getStampInt()),
-					   int(storage.modifyTimeStamp.getStampInt()),
+					   storage.getCreateTimeStampInt(),
+					   storage.getModifyTimeStampInt(),
 					   int(storage.stockItem),
 					   int(storage.location),
 					   int(storage.quantity)))
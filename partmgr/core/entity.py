@@ -22,10 +22,27 @@
 from partmgr.core.timestamp import *
 from partmgr.core.util import *
 
+import operator
+
 
 class Entity:
 	"Abstract entity base class."
 
+	# Many thousands of entities are held in memory,
+	# so they don't have a per-instance __dict__.
+	# Subclasses must declare their attributes in __slots__, too.
+	# The time stamps are stored as integer UNIX time stamps.
+	__slots__ = (
+		"name",
+		"description",
+		"flags",
+		"createStamp",
+		"modifyStamp",
+		"id",
+		"db",
+		"entityType",
+	)
+
 	FLG_OFFSET = 8	# Offset for user-flags
 
 	NO_ID = -1	# Invalid ID
@@ -39,12 +56,12 @@ class Entity:
 		self.name = name
 		self.description = description
 		self.flags = flags
-		self.createTimeStamp = Timestamp(createTimeStamp)
-		if not self.createTimeStamp.isValid():
-			self.createTimeStamp.setNow()
-		self.modifyTimeStamp = Timestamp(modifyTimeStamp)
-		if not self.modifyTimeStamp.isValid():
-			self.modifyTimeStamp.setStamp(self.createTimeStamp.getStamp())
+		self.createStamp = Timestamp.toInt(createTimeStamp)
+		if self.createStamp <= 0:
+			self.createStamp = Timestamp.nowInt()
+		self.modifyStamp = Timestamp.toInt(modifyTimeStamp)
+		if self.modifyStamp <= 0:
+			self.modifyStamp = self.createStamp
 		self.id = id
 		self.db = db
 		self.entityType = entityType
@@ -67,10 +84,16 @@ class Entity:
 		self.syncDatabase()
 
 	def getCreateTimeStamp(self):
-		return self.createTimeStamp.getStamp()
+		return Timestamp.toDatetime(self.createStamp)
+
+	def getCreateTimeStampInt(self):
+		return self.createStamp
 
 	def getModifyTimeStamp(self):
-		return self.modifyTimeStamp.getStamp()
+		return Timestamp.toDatetime(self.modifyStamp)
+
+	def getModifyTimeStampInt(self):
+		return self.modifyStamp
 
 	def getAllParameters(self):
 		assert(self.PARAMETER_PTYPE is not None)
@@ -99,6 +122,33 @@ class Entity:
 		assert(isinstance(entity, Entity))
 		return entity.id
 
+	@staticmethod
+	def maxStamp(entities, attr="modifyStamp"):
+		"""Get the newest integer stamp 'attr' of the entities.
+		Returns 0, if there is no valid stamp.
+		"""
+		return Timestamp.maxInt(map(operator.attrgetter(attr), entities))
+
+	@staticmethod
+	def minStamp(entities, attr="modifyStamp"):
+		"""Get the oldest integer stamp 'attr' of the entities.
+		Returns 0, if there is no valid stamp.
+		"""
+		return Timestamp.minInt(map(operator.attrgetter(attr), entities))
+
+	@staticmethod
+	def filterByStamp(entities, start=None, end=None, attr="modifyStamp"):
+		"""Get a list of the entities with
+		start <= stamp 'attr' <= end.
+		'start' and 'end' are integer stamps, datetime or None.
+		"""
+		start = Timestamp.toInt(start) if start is not None else None
+		end = Timestamp.toInt(end) if end is not None else None
+		getter = operator.attrgetter(attr)
+		return [ e for e in entities
+			 if (start is None or getter(e) >= start) and
+			    (end is None or getter(e) <= end) ]
+
 	def hasValidId(self):
 		return Entity.isValidId(self.id)
 
@@ -112,7 +162,7 @@ class Entity:
 		pass # Override this in subclass, if required.
 
 	def updateModifyTimeStamp(self):
-		self.modifyTimeStamp.setNow()
+		self.modifyStamp = Timestamp.nowInt()
 
 	def delete(self):
 		self.db = None
@@ -141,8 +191,8 @@ class Entity:
 		args.append(str(self.name))
 		args.append(str(self.description))
 		args.append(str(self.flags))
-		args.append(str(self.createTimeStamp))
-		args.append(str(self.modifyTimeStamp))
+		args.append(str(Timestamp(self.createStamp)))
+		args.append(str(Timestamp(self.modifyStamp)))
 		args.append(str(self.id))
 		args.append(str(self.db))
 		args.append(str(self.entityType))
@@ -27,6 +27,10 @@ from partmgr.core.util import *
 class Footprint(Entity):
 	"Footprint descriptor."
 
+	__slots__ = (
+		"image",
+	)
+
 	def __init__(self, name,
 		     image=None,
 		     **kwds):
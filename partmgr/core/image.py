@@ -23,66 +23,62 @@ from partmgr.core.util import *
 
 
 class Image:
+	"""Encoded image data (usually PNG).
+	The data is kept as raw bytes. Decoding to a pixmap is done
+	by the GUI (see partmgr.gui.image), so the core does not
+	depend on Qt.
+	"""
+
+	__slots__ = (
+		"data",
+	)
+
 	def __init__(self, data=None):
 		self.convertFrom(data)
 
 	def isNull(self):
-		return self.pixmap.isNull()
+		return not self.data
 
-	def convertFrom(self, data, dataFormat="PNG"):
-		self.pixmap = QPixmap()
+	def convertFrom(self, data):
+		self.data = b""
 		if not data:
 			return
 		if isinstance(data, str):
 			data = fromBase64(data, toBytes=True)
-			if not data:
-				return
-		if isinstance(data, bytes):
-			data = QByteArray(data)
-		if isinstance(data, QByteArray):
-			pix = QPixmap()
-			pix.loadFromData(data, dataFormat)
-			data = pix
-		if not isinstance(data, QPixmap):
+		if isinstance(data, Image):
+			data = data.data
+		if isinstance(data, (bytearray, memoryview)):
+			data = bytes(data)
+		if not isinstance(data, bytes):
 			raise PartMgrError("Unsupported Image object type")
-		self.pixmap = data
+		self.data = data
 
-	def fromFile(self, filename, fileFormat):
+	def fromFile(self, filename):
+		"""Read the raw image file.
+		The data is not converted.
+		"""
 		try:
-			fd = open(filename, "rb")
-			data = fd.read()
-			fd.close()
+			with open(filename, "rb") as fd:
+				data = fd.read()
 		except IOError as e:
 			raise PartMgrError("Failed to read %s: %s" %\
 				    (filename, str(e)))
-		self.convertFrom(data, fileFormat)
-		if self.isNull():
-			raise PartMgrError("%s: Unknown image format" % filename)
+		self.convertFrom(data)
 
 	def toString(self):
 		return toBase64(self.toBytes())
 
 	def toBytes(self):
-		return self.toQByteArray().data()
+		return self.data
 
-	def toQByteArray(self):
-		ba = QByteArray()
-		buf = QBuffer(ba)
-		buf.open(QIODeviceBase.OpenModeFlag.WriteOnly)
-		self.toPixmap().save(buf, "PNG")
-		return ba
+	def __eq__(self, other):
+		return isinstance(other, Image) and self.data == other.data
 
-	def toPixmap(self):
-		return self.pixmap
+	def __ne__(self, other):
+		return not self.__eq__(other)
 
-	def size(self):
-		return self.pixmap.size()
+	def __hash__(self):
+		return hash(self.data)
 
-	def scaleToMaxSize(self, maxSize):
-		if self.size().height() <= maxSize.height() and\
-		   self.size().width() <= maxSize.width():
-			return self
-		return Image(self.pixmap.scaled(
-				maxSize,
-				Qt.AspectRatioMode.KeepAspectRatio,
-				Qt.TransformationMode.SmoothTransformation))
+	def __repr__(self):
+		return "Image(%d bytes)" % len(self.data)
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+#
+# PartMgr - Bulk stock item importer
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from partmgr.core.database import *
+
+import csv
+import json
+import sqlite3 as sql
+import time
+
+
+class ImportResult:
+	"Bulk import statistics."
+
+	def __init__(self, rows, seconds):
+		self.rows = rows
+		self.seconds = seconds
+
+	def getRowsPerSec(self):
+		if self.seconds <= 0.0:
+			return float(self.rows)
+		return self.rows / self.seconds
+
+	def __repr__(self):
+		return "Imported %d rows in %.3f s (%.1f rows/s)" % (
+			self.rows, self.seconds, self.getRowsPerSec())
+
+class StockImporter:
+	"""Bulk stock item importer.
+
+	Every input record creates one stock item. Records are dicts
+	with the following (optional) keys:
+
+	name		Stock item name (mandatory)
+	description	Stock item description
+	category	Category path. Path elements are separated by '/'.
+	part		Part name. The part is looked up in the category.
+	footprint	Footprint name
+	minQuantity	Minimum quantity
+	targetQuantity	Target quantity
+	quantityUnits	Unit short name (e.g. "pc") or unit number
+	supplier	Supplier name
+	orderCode	Supplier order code
+	price		Price per unit
+	priceFact	Price factor
+	location	Storage location name
+	quantity	Stored quantity
+
+	Categories, parts, suppliers, locations and footprints
+	are resolved by name and created, if they do not exist.
+	The whole import runs in one transaction.
+	"""
+
+	CATEGORY_SEPARATOR = "/"
+
+	# Number of records inserted per executemany() call.
+	CHUNK_SIZE = 1000
+
+	# Read size for streaming JSON input.
+	JSON_READ_SIZE = 1024 * 64
+
+	def __init__(self, db):
+		self.db = db
+
+	def importFile(self, filename):
+		"""Import a .csv, .json or .jsonl file.
+		"""
+		try:
+			with open(filename, "r", encoding="UTF-8", newline="") as fd:
+				if str(filename).lower().endswith(".csv"):
+					return self.importCsv(fd)
+				return self.importJson(fd)
+		except (IOError, UnicodeError) as e:
+			raise PartMgrError("Failed to read %s: %s" %\
+					   (filename, str(e)))
+
+	def importCsv(self, fd):
+		"""Import CSV records from the file object 'fd'.
+		The first CSV line is the header with the record key names.
+		"""
+		try:
+			return self.importRecords(csv.DictReader(fd))
+		except csv.Error as e:
+			raise PartMgrError("CSV format error: %s" % str(e))
+
+	def importJson(self, fd):
+		"""Import JSON records from the file object 'fd'.
+		The input is a JSON array of record objects or a sequence
+		of record objects (JSON lines). The input is streamed.
+		"""
+		return self.importRecords(self.__iterJson(fd))
+
+	def __iterJson(self, fd):
+		decoder = json.JSONDecoder()
+		buf, pos, eof = "", 0, False
+		while True:
+			while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+				pos += 1
+			try:
+				obj, pos = decoder.raw_decode(buf, pos)
+			except json.JSONDecodeError as e:
+				if eof:
+					if pos >= len(buf):
+						return
+					raise PartMgrError("JSON format error: %s" % str(e))
+				buf = buf[pos:]
+				pos = 0
+				data = fd.read(self.JSON_READ_SIZE)
+				buf += data
+				eof = not data
+				continue
+			if not isinstance(obj, dict):
+				raise PartMgrError("JSON format error: "
+						   "Record is not an object")
+			yield obj
+
+	def importRecords(self, records):
+		"""Import an iterable of record dicts.
+		Returns an ImportResult.
+		"""
+		startTime = time.monotonic()
+		count = 0
+		with self.db.transaction() as c:
+			try:
+				self.__prepare(c)
+				stockRows, originRows, storageRows = [], [], []
+				for count, record in enumerate(records, 1):
+					try:
+						self.__addRecord(c, record,
+								 stockRows,
+								 originRows,
+								 storageRows)
+					except (ValueError, TypeError, KeyError) as e:
+						raise PartMgrError("Import record %d: "
+							"Invalid value: %s" % (count, str(e)))
+					if len(stockRows) >= self.CHUNK_SIZE:
+						self.__flush(c, stockRows,
+							     originRows,
+							     storageRows)
+				self.__flush(c, stockRows, originRows, storageRows)
+			except sql.Error as e:
+				raise PartMgrError("SQL error: %s" % str(e))
+		databaseCache.clear(DatabaseCache.ALL)
+		result = ImportResult(count, time.monotonic() - startTime)
+		print(result)
+		return result
+
+	def __prepare(self, c):
+		stamp = Timestamp()
+		stamp.setNow()
+		self.__now = stamp.getStampInt()
+
+		self.__categories = {}
+		categories = {}
+		for d in c.execute("SELECT id, name, parent "
+				   "FROM categories ORDER BY id;"):
+			categories[int(d[0])] = (fromBase64(d[1]), int(d[2]))
+		for catId in categories:
+			path, parentId = [], catId
+			while parentId in categories and len(path) <= len(categories):
+				name, parentId = categories[parentId]
+				path.insert(0, name)
+			self.__categories.setdefault(tuple(path), catId)
+
+		self.__parts = {}
+		for d in c.execute("SELECT id, name, category "
+				   "FROM parts ORDER BY id;"):
+			self.__parts.setdefault((int(d[2]), fromBase64(d[1])),
+						int(d[0]))
+
+		self.__suppliers = self.__loadNames(c, "suppliers")
+		self.__locations = self.__loadNames(c, "locations")
+		self.__footprints = self.__loadNames(c, "footprints")
+
+		self.__units = {}
+		for unit, (short, long) in StockItem.UNITNAMES.items():
+			self.__units[short] = unit
+			self.__units[long] = unit
+
+		c.execute("SELECT MAX(id) FROM stock;")
+		maxId = c.fetchone()[0] or 0
+		c.execute("SELECT seq FROM sqlite_sequence WHERE name='stock';")
+		seq = c.fetchone()
+		self.__nextStockId = max(maxId, seq[0] if seq else 0) + 1
+
+	@staticmethod
+	def __loadNames(c, table):
+		names = {}
+		for d in c.execute("SELECT id, name FROM %s ORDER BY id;" % table):
+			names.setdefault(fromBase64(d[1]), int(d[0]))
+		return names
+
+	def __insertEntity(self, c, table, name, columns=(), values=()):
+		c.execute("INSERT INTO %s(name, description, flags, "
+			  "createTimeStamp, modifyTimeStamp%s) "
+			  "VALUES(?,?,?,?,?%s);" % (
+			  table,
+			  "".join(", " + col for col in columns),
+			  ",?" * len(columns)),
+			  (toBase64(name), toBase64(""), 0,
+			   self.__now, self.__now) + tuple(values))
+		return c.lastrowid
+
+	def __getCategory(self, c, path):
+		path = tuple(p.strip() for p in path.split(self.CATEGORY_SEPARATOR)
+			     if p.strip())
+		if not path:
+			raise ValueError("No category")
+		parentId = Entity.NO_ID
+		for i in range(1, len(path) + 1):
+			catId = self.__categories.get(path[:i])
+			if catId is None:
+				catId = self.__insertEntity(c, "categories",
+							    path[i - 1],
+							    ("parent",),
+							    (parentId,))
+				self.__categories[path[:i]] = catId
+			parentId = catId
+		return parentId
+
+	def __getNamed(self, c, names, table, name, columns=(), values=()):
+		if not name:
+			return Entity.NO_ID
+		entityId = names.get(name)
+		if entityId is None:
+			entityId = self.__insertEntity(c, table, name,
+						       columns, values)
+			names[name] = entityId
+		return entityId
+
+	def __getUnit(self, value):
+		if not value:
+			return StockItem.UNIT_PC
+		value = str(value).strip()
+		if value in self.__units:
+			return self.__units[value]
+		unit = int(value)
+		if unit not in StockItem.UNITNAMES:
+			raise ValueError("Unknown unit %s" % value)
+		return unit
+
+	def __addRecord(self, c, record, stockRows, originRows, storageRows):
+		def get(key, default=""):
+			value = record.get(key)
+			if value is None:
+				return default
+			if isinstance(value, str):
+				value = value.strip()
+				if not value:
+					return default
+			return value
+
+		name = str(get("name"))
+		if not name:
+			raise ValueError("No stock item name")
+		categoryId = self.__getCategory(c, str(get("category")))
+		partId = Entity.NO_ID
+		partName = str(get("part"))
+		if partName:
+			partId = self.__parts.get((categoryId, partName))
+			if partId is None:
+				partId = self.__insertEntity(c, "parts", partName,
+							     ("category",),
+							     (categoryId,))
+				self.__parts[(categoryId, partName)] = partId
+		footprintId = self.__getNamed(c, self.__footprints, "footprints",
+					      str(get("footprint")),
+					      ("image",), ("",))
+
+		stockId = self.__nextStockId
+		self.__nextStockId += 1
+		stockRows.append((stockId,
+				  toBase64(name),
+				  toBase64(str(get("description"))),
+				  0, self.__now, self.__now,
+				  partId, categoryId, footprintId,
+				  int(get("minQuantity", 0)),
+				  int(get("targetQuantity", 0)),
+				  self.__getUnit(get("quantityUnits"))))
+
+		supplierName = str(get("supplier"))
+		orderCode = str(get("orderCode"))
+		price = float(get("price", Origin.NO_PRICE))
+		if supplierName or orderCode or price >= 0.0:
+			supplierId = self.__getNamed(c, self.__suppliers,
+						     "suppliers", supplierName,
+						     ("url",), ("",))
+			originRows.append((toBase64(""), toBase64(""),
+					   0, self.__now, self.__now,
+					   stockId, supplierId,
+					   toBase64(orderCode), price,
+					   self.__now if price >= 0.0 else 0,
+					   float(get("priceFact", 1.0))))
+
+		locationName = str(get("location"))
+		quantity = int(get("quantity", 0))
+		if locationName or quantity:
+			locationId = self.__getNamed(c, self.__locations,
+						     "locations", locationName)
+			storageRows.append((toBase64(""), toBase64(""),
+					    0, self.__now, self.__now,
+					    stockId, locationId, quantity))
+
+	@staticmethod
+	def __flush(c, stockRows, originRows, storageRows):
+		if stockRows:
+			c.executemany("INSERT INTO "
+				      "stock(id, name, description, flags, "
+				      "createTimeStamp, modifyTimeStamp, "
+				      "part, category, footprint, "
+				      "minQuantity, targetQuantity, "
+				      "quantityUnits) "
+				      "VALUES(?,?,?,?,?,?,?,?,?,?,?,?);",
+				      stockRows)
+		if originRows:
+			c.executemany("INSERT INTO "
+				      "origins(name, description, flags, "
+				      "createTimeStamp, modifyTimeStamp, "
+				      "stockItem, supplier, orderCode, "
+				      "price, priceTimeStamp, priceFact) "
+				      "VALUES(?,?,?,?,?,?,?,?,?,?,?);",
+				      originRows)
+		if storageRows:
+			c.executemany("INSERT INTO "
+				      "storages(name, description, flags, "
+				      "createTimeStamp, modifyTimeStamp, "
+				      "stockItem, location, quantity) "
+				      "VALUES(?,?,?,?,?,?,?,?);",
+				      storageRows)
+		del stockRows[:]
+		del originRows[:]
+		del storageRows[:]
@@ -26,6 +26,8 @@ from partmgr.core.util import *
 class Location(Entity):
 	"Location descriptor."
 
+	__slots__ = ()
+
 	def __init__(self, name,
 		     **kwds):
 		Entity.__init__(self,
@@ -29,6 +29,15 @@ class Origin(Entity):
 
 	NO_PRICE = -0.1
 
+	__slots__ = (
+		"stockItem",
+		"supplier",
+		"orderCode",
+		"price",
+		"priceStamp",
+		"priceFact",
+	)
+
 	def __init__(
 		self,
 		name,
@@ -48,7 +57,7 @@ class Origin(Entity):
 		self.supplier = Entity.toId(supplier)
 		self.orderCode = orderCode
 		self.price = float(price)
-		self.priceStamp = Timestamp(priceTimeStamp)
+		self.priceStamp = Timestamp.toInt(priceTimeStamp)
 		self.priceFact = float(priceFact)
 
 	def syncDatabase(self):
@@ -101,18 +110,18 @@ class Origin(Entity):
 		return self.getPrice() * self.getPriceFact()
 
 	def setPriceTimeStampNow(self):
-		self.priceStamp.setNow()
+		self.priceStamp = Timestamp.nowInt()
 		self.syncDatabase()
 
 	def setPriceTimeStamp(self, newStamp):
-		self.priceStamp.setStamp(newStamp)
+		self.priceStamp = Timestamp.toInt(newStamp)
 		self.syncDatabase()
 
 	def getPriceTimeStamp(self):
-		return self.priceStamp.getStamp()
+		return Timestamp.toDatetime(self.priceStamp)
 
 	def getPriceTimeStampInt(self):
-		return self.priceStamp.getStampInt()
+		return self.priceStamp
 
 	def delete(self):
 		self.db.delOrigin(self)
@@ -37,6 +37,12 @@ class Parameter(Entity):
 	PTYPE_ORIGIN	= 7
 	PTYPE_STORAGE	= 8
 
+	__slots__ = (
+		"parentType",
+		"parent",
+		"data",
+	)
+
 	def __init__(self, name,
 		     parentType=PTYPE_GLOBAL,
 		     parent=None,
@@ -117,6 +123,8 @@ class Parameter(Entity):
 		return "Parameter(" + ", ".join(args) + ")"
 
 class Param_Currency(Parameter):
+	__slots__ = ()
+
 	# "currency" parameter data
 	CURR_EUR	= 0
 	CURR_USD	= 1
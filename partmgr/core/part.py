@@ -27,6 +27,10 @@ from partmgr.core.parameter import *
 class Part(Entity):
 	"Part descriptor."
 
+	__slots__ = (
+		"category",
+	)
+
 	PARAMETER_PTYPE = Parameter.PTYPE_PART
 
 	def __init__(self, name,
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# PartMgr - Multi-BOM build planner
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from partmgr.core.bom import *
+
+import csv
+import fractions
+
+
+class PurchaseLine:
+	"Combined demand of one stock item (or unmatched BOM value)."
+
+	def __init__(self, stockItem, value, footprint):
+		self.stockItem = stockItem
+		self.value = value
+		self.footprint = footprint
+		self.demand = 0
+		self.available = 0
+
+	def getName(self):
+		if self.stockItem:
+			return self.stockItem.getName()
+		return self.value
+
+	def getToOrder(self):
+		return max(0, self.demand - self.available)
+
+class PlannedBom:
+	"Build plan result for one BOM."
+
+	def __init__(self, bom, count):
+		self.bom = bom
+		self.count = count
+		# Number of boards that can be built from stock,
+		# if only this BOM is built.
+		self.maxBuildable = 0
+		# Number of boards that can be built from stock,
+		# if all BOMs are built together. Shared stock items
+		# are split proportionally to the demand.
+		self.buildable = 0
+
+	def isBuildable(self):
+		return self.buildable >= self.count
+
+class BuildPlan:
+	"Build plan result."
+
+	def __init__(self, plannedBoms, purchaseLines):
+		self.plannedBoms = plannedBoms
+		self.purchaseLines = purchaseLines
+
+	def getPlannedBoms(self):
+		return self.plannedBoms
+
+	def getPurchaseList(self):
+		"""Get the list of PurchaseLines that need ordering.
+		"""
+		return [ p for p in self.purchaseLines if p.getToOrder() > 0 ]
+
+	def isBuildable(self):
+		return not self.getPurchaseList()
+
+	def writePurchaseListCsv(self, fd):
+		w = csv.writer(fd)
+		w.writerow(("Stock item", "Value", "Footprint",
+			    "Demand", "Available", "To order"))
+		for p in self.getPurchaseList():
+			w.writerow((p.stockItem.getName() if p.stockItem else "",
+				    p.value, p.footprint,
+				    p.demand, p.available, p.getToOrder()))
+
+class BuildPlanner:
+	"""Plan building several BOMs from the current stock.
+
+	Usage:
+		planner = BuildPlanner(db)
+		planner.addBom(boardA, 50)
+		planner.addBom(boardB, 20)
+		plan = planner.plan()
+	"""
+
+	def __init__(self, db):
+		self.db = db
+		self.boms = []
+
+	def addBom(self, bom, count):
+		"""Plan building 'count' boards of 'bom'.
+		'count' must be a positive integer.
+		"""
+		if isinstance(count, bool) or not isinstance(count, int) or\
+		   count <= 0:
+			raise PartMgrError("BOM '%s': Invalid board count '%s'. "
+					   "Expected a positive integer." % (
+					   bom.getName(), count))
+		self.boms.append((bom, count))
+
+	def plan(self):
+		purchaseLines = {}
+		# Per BOM: list of (PurchaseLine, quantity per board)
+		bomDemands = []
+		for bom, count in self.boms:
+			demands = {}
+			for line, candidates in matchBom(self.db, bom):
+				if candidates:
+					key = candidates[0].id
+				else:
+					key = (line.value, line.getFootprintName())
+				p = purchaseLines.get(key)
+				if not p:
+					p = PurchaseLine(candidates[0] if candidates else None,
+							 line.value, line.footprint)
+					purchaseLines[key] = p
+				p.demand += line.quantity * count
+				demands[key] = demands.get(key, 0) + line.quantity
+			bomDemands.append([ (purchaseLines[k], qty)
+					    for k, qty in demands.items() if qty > 0 ])
+
+		quantities = self.db.getGlobalQuantities()
+		for p in purchaseLines.values():
+			if p.stockItem:
+				p.available = max(0, quantities.get(p.stockItem.id, 0))
+
+		plannedBoms = []
+		for (bom, count), demands in zip(self.boms, bomDemands):
+			planned = PlannedBom(bom, count)
+			if demands:
+				planned.maxBuildable = min(p.available // qty
+							   for p, qty in demands)
+				# Share of the combined demand that can be
+				# satisfied for the most limiting stock item.
+				ratio = min([ fractions.Fraction(p.available, p.demand)
+					      for p, qty in demands
+					      if p.demand > 0 ] + [ 1 ])
+				planned.buildable = min(int(count * ratio),
+							planned.maxBuildable)
+			else:
+				planned.maxBuildable = planned.buildable = count
+			plannedBoms.append(planned)
+		return BuildPlan(plannedBoms, list(purchaseLines.values()))
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#
+# PartMgr - Database call and SQL profiler
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from partmgr.core.util import *
+
+import sqlite3 as sql
+import collections
+import contextlib
+import functools
+import inspect
+import sys
+import time
+
+
+class MethodStats:
+	"Profiling statistics of one Database method."
+
+	# Number of latency samples kept for the percentiles.
+	MAX_SAMPLES	= 10000
+
+	# Number of distinct SQL statements recorded per method.
+	MAX_SQL		= 50
+
+	def __init__(self, name):
+		self.name = name
+		self.calls = 0
+		self.totalTime = 0.0
+		self.maxTime = 0.0
+		self.rows = 0
+		self.statements = 0
+		# { SQL text : number of executions }
+		self.sql = {}
+		self.samples = collections.deque(maxlen=self.MAX_SAMPLES)
+
+	def addCall(self, seconds, rows):
+		self.calls += 1
+		self.totalTime += seconds
+		self.maxTime = max(self.maxTime, seconds)
+		self.rows += rows
+		self.samples.append(seconds)
+
+	def addStatement(self, statement):
+		self.statements += 1
+		if statement in self.sql or len(self.sql) < self.MAX_SQL:
+			self.sql[statement] = self.sql.get(statement, 0) + 1
+
+	def getMeanTime(self):
+		return (self.totalTime / self.calls) if self.calls else 0.0
+
+	def getPercentile(self, percent):
+		"""Get the latency percentile (0-100) of the recent calls.
+		"""
+		if not self.samples:
+			return 0.0
+		samples = sorted(self.samples)
+		index = int(round((len(samples) - 1) * percent / 100.0))
+		return samples[min(max(index, 0), len(samples) - 1)]
+
+class DatabaseProfiler:
+	"""Opt-in profiler for a Database instance.
+
+	All public Database methods of the instance are wrapped to record
+	call counts, latencies and the number of returned rows.
+	The SQL statements are recorded with the sqlite3 trace callback
+	and are accounted to the innermost running Database method.
+	Time spent in the methods called by other methods is included
+	in the time of the callers.
+	"""
+
+	# Environment variable that enables profiling for all databases.
+	ENV_VAR = "PARTMGR_PROFILE"
+
+	# Public Database methods that are not wrapped.
+	EXCLUDE = ("close", "isOpen", "transaction",
+		   "enableProfiling", "disableProfiling", "getProfiler")
+
+	def __init__(self, db):
+		self.db = db
+		self.enabled = False
+		self.__stats = {}
+		self.__stack = []
+		self.__unaccounted = MethodStats("<no method>")
+
+	def enable(self):
+		if self.enabled:
+			return
+		for name, func in inspect.getmembers(type(self.db),
+						     inspect.isfunction):
+			if name.startswith("_") or name in self.EXCLUDE:
+				continue
+			setattr(self.db, name,
+				self.__wrap(name, getattr(self.db, name)))
+		self.db.db.set_trace_callback(self.__trace)
+		self.enabled = True
+
+	def disable(self):
+		if not self.enabled:
+			return
+		for name in list(vars(self.db)):
+			if getattr(getattr(self.db, name), "_profilerWrapped", False):
+				delattr(self.db, name)
+		# The connection may already be closed.
+		with contextlib.suppress(sql.ProgrammingError):
+			self.db.db.set_trace_callback(None)
+		self.enabled = False
+
+	def reset(self):
+		self.__stats.clear()
+		self.__unaccounted = MethodStats("<no method>")
+
+	def getCurrentMethod(self):
+		"""Get the name of the innermost running Database method
+		or None, if no method is running.
+		"""
+		return self.__stack[-1].name if self.__stack else None
+
+	def getStats(self):
+		"""Get a list of MethodStats, sorted by total time.
+		"""
+		stats = [ s for s in self.__stats.values() if s.calls ]
+		if self.__unaccounted.statements:
+			stats.append(self.__unaccounted)
+		stats.sort(key=lambda s: (-s.totalTime, s.name))
+		return stats
+
+	def dump(self, fd=None, withSql=True):
+		"""Write a text report to the file object 'fd' (stdout).
+		"""
+		fd = fd or sys.stdout
+		fd.write("%-32s %8s %10s %10s %10s %10s %10s %8s %6s\n" % (
+			 "Method", "Calls", "Total ms", "Mean ms", "p50 ms",
+			 "p95 ms", "p99 ms", "Rows", "SQL"))
+		for s in self.getStats():
+			fd.write("%-32s %8d %10.2f %10.3f %10.3f %10.3f %10.3f "
+				 "%8d %6d\n" % (
+				 s.name, s.calls, s.totalTime * 1000.0,
+				 s.getMeanTime() * 1000.0,
+				 s.getPercentile(50) * 1000.0,
+				 s.getPercentile(95) * 1000.0,
+				 s.getPercentile(99) * 1000.0,
+				 s.rows, s.statements))
+			if withSql:
+				for statement, count in sorted(s.sql.items(),
+							      key=lambda x: -x[1]):
+					fd.write("    %6dx %s\n" % (
+						 count, " ".join(statement.split())))
+
+	def __getStats(self, name):
+		stats = self.__stats.get(name)
+		if stats is None:
+			stats = self.__stats[name] = MethodStats(name)
+		return stats
+
+	def __trace(self, statement):
+		if self.__stack:
+			self.__stack[-1].addStatement(statement)
+		else:
+			self.__unaccounted.addStatement(statement)
+
+	@staticmethod
+	def __countRows(result):
+		if result is None:
+			return 0
+		if isinstance(result, (list, tuple, dict, set)):
+			return len(result)
+		return 1
+
+	def __wrap(self, name, method):
+		stats = self.__getStats(name)
+		@functools.wraps(method)
+		def wrapper(*args, **kwargs):
+			self.__stack.append(stats)
+			start = time.perf_counter()
+			try:
+				result = method(*args, **kwargs)
+			finally:
+				elapsed = time.perf_counter() - start
+				self.__stack.pop()
+			if inspect.isgenerator(result):
+				return self.__wrapGenerator(stats, result, elapsed)
+			stats.addCall(elapsed, self.__countRows(result))
+			return result
+		wrapper._profilerWrapped = True
+		return wrapper
+
+	def __wrapGenerator(self, stats, generator, elapsed):
+		# The call is recorded, when the generator is finished.
+		rows = 0
+		try:
+			while True:
+				self.__stack.append(stats)
+				start = time.perf_counter()
+				try:
+					item = next(generator)
+				except StopIteration:
+					break
+				finally:
+					elapsed += time.perf_counter() - start
+					self.__stack.pop()
+				rows += 1
+				yield item
+		finally:
+			generator.close()
+			stats.addCall(elapsed, rows)
@@ -112,6 +112,15 @@ class StockItem(Entity):
 		UNIT_CUBM	: ("m^3", "cubic meter"),
 	}
 
+	__slots__ = (
+		"part",
+		"category",
+		"footprint",
+		"minQuantity",
+		"targetQuantity",
+		"quantityUnits",
+	)
+
 	def __init__(self, name,
 		     part=None, category=None, footprint=None,
 		     minQuantity=0, targetQuantity=0, quantityUnits=UNIT_PC,
@@ -26,6 +26,12 @@ from partmgr.core.util import *
 class Storage(Entity):
 	"Item storage descriptor."
 
+	__slots__ = (
+		"stockItem",
+		"location",
+		"quantity",
+	)
+
 	def __init__(self, name,
 		     stockItem=None, location=None, quantity=0,
 		     **kwds):
@@ -26,6 +26,10 @@ from partmgr.core.util import *
 class Supplier(Entity):
 	"Supplier descriptor."
 
+	__slots__ = (
+		"url",
+	)
+
 	def __init__(self, name,
 		     url="",
 		     **kwds):
@@ -22,32 +22,86 @@
 from partmgr.core.util import *
 
 import datetime
+import functools
 
 
 class Timestamp:
+	"""Integer UNIX time stamp.
+	The stamp is kept as integer. The conversion to datetime
+	is only done on request and the results are cached.
+	A stamp <= 0 is invalid.
+	"""
+
+	__slots__ = (
+		"stamp",
+	)
+
+	# Number of cached datetime conversions.
+	CACHE_SIZE = 2**14
+
 	def __init__(self, stamp=None):
 		self.setStamp(stamp)
 
 	def isValid(self):
-		return self.getStampInt() > 0
+		return self.stamp > 0
 
 	def setStamp(self, stamp):
-		if not stamp:
-			stamp = 0
-		if isinstance(stamp, datetime.datetime):
-			stamp = int(round(stamp.timestamp()))
-		self.stamp = int(stamp)
+		self.stamp = self.toInt(stamp)
 
 	def setNow(self):
-		self.setStamp(datetime.datetime.utcnow())
+		self.stamp = self.nowInt()
 
 	def getStamp(self):
-		if not self.isValid():
-			return None
-		return datetime.datetime.fromtimestamp(self.getStampInt())
+		return self.toDatetime(self.stamp)
 
 	def getStampInt(self):
 		return self.stamp
 
+	@staticmethod
+	def toInt(stamp):
+		"""Convert a Timestamp, datetime, integer or None
+		to an integer stamp.
+		"""
+		if isinstance(stamp, int):
+			return stamp
+		if not stamp:
+			return 0
+		if isinstance(stamp, Timestamp):
+			return stamp.stamp
+		if isinstance(stamp, datetime.datetime):
+			return int(round(stamp.timestamp()))
+		return int(stamp)
+
+	@staticmethod
+	def nowInt():
+		"""Get the current time as integer stamp.
+		"""
+		return int(round(datetime.datetime.utcnow().timestamp()))
+
+	@staticmethod
+	@functools.lru_cache(maxsize=CACHE_SIZE)
+	def toDatetime(stamp):
+		"""Convert an integer stamp to datetime.
+		Returns None for invalid stamps.
+		"""
+		if stamp <= 0:
+			return None
+		return datetime.datetime.fromtimestamp(stamp)
+
+	@staticmethod
+	def maxInt(stamps):
+		"""Get the newest valid integer stamp of the iterable 'stamps'.
+		Returns 0, if there is no valid stamp.
+		"""
+		stamp = max(stamps, default=0)
+		return stamp if stamp > 0 else 0
+
+	@staticmethod
+	def minInt(stamps):
+		"""Get the oldest valid integer stamp of the iterable 'stamps'.
+		Returns 0, if there is no valid stamp.
+		"""
+		return min((s for s in stamps if s > 0), default=0)
+
 	def __repr__(self):
 		return str(self.getStamp())
@@ -21,8 +21,6 @@
 
 import base64
 
-from partmgr.qt_bindings import *
-
 from partmgr.core.exception import *
 from partmgr.core.version import *
 
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#
+# PartMgr GUI - Database profiling statistics
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from partmgr.gui.util import *
+
+
+class DatabaseProfileDialog(QDialog):
+	"""Live view of the Database method and SQL statistics.
+	"""
+
+	# Refresh interval in milliseconds
+	UPDATE_INTERVAL = 1000
+
+	COLUMNS = (("Method", 220), ("Calls", 70), ("Total ms", 90),
+		   ("Mean ms", 80), ("p50 ms", 80), ("p95 ms", 80),
+		   ("p99 ms", 80), ("Max ms", 80), ("Rows", 80), ("SQL", 60))
+
+	def __init__(self, db, parent=None):
+		QDialog.__init__(self, parent)
+		self.setLayout(QGridLayout())
+		self.setWindowTitle("Parts manager - Database statistics")
+
+		self.db = db
+
+		self.enableCheck = QCheckBox("&Enable profiling", self)
+		self.layout().addWidget(self.enableCheck, 0, 0, 1, 4)
+
+		self.splitter = QSplitter(Qt.Orientation.Vertical, self)
+		self.layout().addWidget(self.splitter, 1, 0, 1, 4)
+
+		self.table = QTableWidget(self)
+		self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+		self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+		self.table.verticalHeader().hide()
+		self.table.setColumnCount(len(self.COLUMNS))
+		self.table.setHorizontalHeaderLabels(tuple(c[0] for c in self.COLUMNS))
+		for i, (colName, colWidth) in enumerate(self.COLUMNS):
+			self.table.setColumnWidth(i, colWidth)
+		self.splitter.addWidget(self.table)
+
+		self.sqlText = QPlainTextEdit(self)
+		self.sqlText.setReadOnly(True)
+		self.sqlText.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+		self.splitter.addWidget(self.sqlText)
+
+		self.resetButton = QPushButton("&Reset", self)
+		self.layout().addWidget(self.resetButton, 2, 2)
+
+		self.closeButton = QPushButton("&Close", self)
+		self.layout().addWidget(self.closeButton, 2, 3)
+
+		profiler = self.db.getProfiler()
+		self.enableCheck.setChecked(bool(profiler and profiler.enabled))
+
+		self.enableCheck.stateChanged.connect(self.__enableChanged)
+		self.resetButton.released.connect(self.__reset)
+		self.closeButton.released.connect(self.accept)
+		self.table.currentCellChanged.connect(self.__selectionChanged)
+
+		self.timer = QTimer(self)
+		self.timer.timeout.connect(self.__updateTable)
+		self.timer.start(self.UPDATE_INTERVAL)
+
+		self.__stats = []
+		self.resize(1000, 600)
+		self.__updateTable()
+
+	def done(self, result):
+		self.timer.stop()
+		QDialog.done(self, result)
+
+	def __enableChanged(self, newState):
+		if newState == Qt.CheckState.Checked.value:
+			self.db.enableProfiling()
+		else:
+			self.db.disableProfiling()
+		self.__updateTable()
+
+	def __reset(self):
+		profiler = self.db.getProfiler()
+		if profiler:
+			profiler.reset()
+		self.__updateTable()
+
+	def __updateTable(self):
+		profiler = self.db.getProfiler()
+		self.__stats = profiler.getStats() if profiler else []
+		selected = self.table.currentRow()
+		self.table.setRowCount(len(self.__stats))
+		for i, s in enumerate(self.__stats):
+			row = (s.name, s.calls,
+			       "%.2f" % (s.totalTime * 1000.0),
+			       "%.3f" % (s.getMeanTime() * 1000.0),
+			       "%.3f" % (s.getPercentile(50) * 1000.0),
+			       "%.3f" % (s.getPercentile(95) * 1000.0),
+			       "%.3f" % (s.getPercentile(99) * 1000.0),
+			       "%.3f" % (s.maxTime * 1000.0),
+			       s.rows, s.statements)
+			for j, value in enumerate(row):
+				item = QTableWidgetItem(str(value),
+							QTableWidgetItem.ItemType.Type)
+				if j > 0:
+					item.setTextAlignment(
+						Qt.AlignmentFlag.AlignRight |
+						Qt.AlignmentFlag.AlignVCenter)
+				self.table.setItem(i, j, item)
+		if 0 <= selected < len(self.__stats):
+			self.table.setCurrentCell(selected, 0)
+		self.__selectionChanged(self.table.currentRow())
+
+	def __selectionChanged(self, row, *args):
+		if 0 <= row < len(self.__stats):
+			text = "\n".join("%6dx  %s" % (count, " ".join(sql.split()))
+					 for sql, count in sorted(
+						self.__stats[row].sql.items(),
+						key=lambda x: -x[1]))
+		else:
+			text = ""
+		if text != self.sqlText.toPlainText():
+			self.sqlText.setPlainText(text)
@@ -72,6 +72,9 @@ class AbstractEntityManageDialog(QDialog):
 	READONLY_NAME		= 1 << 3
 	NO_PARAMETERS		= 1 << 4
 
+	# Number of entities fetched at once by updateDataPaged()
+	PAGE_SIZE		= 200
+
 	class ListItem(QListWidgetItem):
 		def __init__(self, entity):
 			QListWidgetItem.__init__(self, entity.getName())
@@ -90,6 +93,7 @@ class AbstractEntityManageDialog(QDialog):
 		self.db = db
 		self.entFlags = entFlags
 		self.updateBlocked = 0
+		self.__pageGeneration = 0
 
 		self.titleLabel = QLabel(title, self)
 		self.titleLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -99,6 +103,7 @@ class AbstractEntityManageDialog(QDialog):
 		self.layout().addWidget(self.titleLabel, 0, 0, 1, 3)
 
 		self.entityList = QListWidget(self)
+		self.entityList.setSortingEnabled(True)
 		self.layout().addWidget(self.entityList, 1, 0, 4, 1)
 
 		rightLayout = QGridLayout()
@@ -183,20 +188,45 @@ class AbstractEntityManageDialog(QDialog):
 		self.entSelChanged(curItem, curItem)
 
 	def updateData(self, entities=[], selectEntity=None):
+		self.__pageGeneration += 1
+		self.entityList.clear()
+		self.__addEntities(entities, selectEntity)
+
+	def updateDataPaged(self, entityType, selectEntity=None, filter=None):
+		"""Fetch the entities of entityType from the database page by page.
+		The first page is shown immediately and the remaining pages
+		are fetched from the event loop.
+		"""
+		self.__pageGeneration += 1
 		self.entityList.clear()
-		entities.sort(key=lambda ent: ent.getName())
-		selectItem = None
+		self.__fetchPage(self.__pageGeneration, entityType, None,
+				 selectEntity, filter)
+
+	def __fetchPage(self, generation, entityType, afterKey,
+			selectEntity, filter):
+		if generation != self.__pageGeneration:
+			return # The list has been reloaded in the meantime.
+		entities, nextKey = self.db.page(entityType, afterKey,
+						 self.PAGE_SIZE,
+						 filter=filter)
+		self.__addEntities(entities, selectEntity)
+		if nextKey is not None:
+			QTimer.singleShot(0, lambda: self.__fetchPage(
+				generation, entityType, nextKey,
+				selectEntity, filter))
+
+	def __addEntities(self, entities, selectEntity):
 		for entity in entities:
 			item = self.ListItem(entity)
 			self.entityList.addItem(item)
 			if selectEntity and selectEntity == entity:
-				selectItem = item
-		if selectItem:
-			self.entityList.setCurrentItem(selectItem)
+				self.entityList.setCurrentItem(item)
 
 	def edit(self, selectEntity=None):
 		self.updateData(selectEntity)
-		return self.exec()
+		ret = self.exec()
+		self.__pageGeneration += 1 # Stop fetching pages.
+		return ret
 
 	def entSelChanged(self, item=None, prevItem=None):
 		self.updateBlocked += 1
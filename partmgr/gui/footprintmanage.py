@@ -20,6 +20,7 @@
 #
 
 from partmgr.gui.entitymanage import *
+from partmgr.gui.image import *
 from partmgr.gui.util import *
 
 from partmgr.core.footprint import *
@@ -59,7 +60,7 @@ class FootprintEditWidget(QWidget):
 
 		self.imageLabel.clear()
 		if footprint:
-			pix = footprint.getImage().toPixmap()
+			pix = imageToPixmap(footprint.getImage())
 			if pix.isNull():
 				self.imageLabel.setText("< no image >")
 			else:
@@ -79,11 +80,9 @@ class FootprintEditWidget(QWidget):
 		if not fn:
 			return
 		try:
-			img = Image()
-			img.fromFile(fn, None)
-			img = img.scaleToMaxSize(QSize(150, 150))
+			img = imageFromFile(fn, QSize(150, 150))
 			self.currentFootprint.setImage(img)
-		except Error as e:
+		except PartMgrError as e:
 			QMessageBox.critical(self,
 				"Image import failed",
 				"Image import failed:\n" + str(e))
@@ -116,8 +115,8 @@ class FootprintManageDialog(AbstractEntityManageDialog):
 		self.nameLabel.setText("Footprint name:")
 
 	def updateData(self, selectFootprint=None):
-		AbstractEntityManageDialog.updateData(self,
-			self.db.getFootprints(),
+		AbstractEntityManageDialog.updateDataPaged(self,
+			"Footprint",
 			selectFootprint)
 
 	def entSelChanged(self, item=None, prevItem=None):
@@ -25,4 +25,95 @@ from partmgr.gui.util import *
 class GlobalStatsDialog(QDialog):
 	def __init__(self, db, parent=None):
 		QDialog.__init__(self, parent)
-		pass#TODO
+		self.setLayout(QGridLayout())
+		self.setWindowTitle("Parts manager - Global statistics")
+
+		self.db = db
+
+		self.tabs = QTabWidget(self)
+		self.layout().addWidget(self.tabs, 0, 0, 1, 3)
+
+		self.overviewTable = self.__makeTable()
+		self.tabs.addTab(self.overviewTable, "&Overview")
+		self.supplierTable = self.__makeTable()
+		self.tabs.addTab(self.supplierTable, "&Suppliers")
+		self.locationTable = self.__makeTable()
+		self.tabs.addTab(self.locationTable, "&Locations")
+		self.categoryTable = self.__makeTable()
+		self.tabs.addTab(self.categoryTable, "Largest &categories")
+
+		self.closeButton = QPushButton("&Close", self)
+		self.layout().addWidget(self.closeButton, 1, 2)
+
+		self.updateButton = QPushButton("&Update", self)
+		self.layout().addWidget(self.updateButton, 1, 1)
+
+		self.updateButton.released.connect(self.__updateTables)
+		self.closeButton.released.connect(self.accept)
+
+		self.resize(600, 450)
+		self.__updateTables()
+
+	def __makeTable(self):
+		table = QTableWidget(self)
+		table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+		table.verticalHeader().hide()
+		return table
+
+	@staticmethod
+	def __fillTable(table, columns, rows):
+		table.clear()
+		table.setColumnCount(len(columns))
+		table.setHorizontalHeaderLabels(tuple(c[0] for c in columns))
+		for i, (colName, colWidth) in enumerate(columns):
+			table.setColumnWidth(i, colWidth)
+		table.setRowCount(len(rows))
+		for i, row in enumerate(rows):
+			for j, value in enumerate(row):
+				item = QTableWidgetItem(str(value),
+							QTableWidgetItem.ItemType.Type)
+				if not isinstance(value, str):
+					item.setTextAlignment(
+						Qt.AlignmentFlag.AlignRight |
+						Qt.AlignmentFlag.AlignVCenter)
+				table.setItem(i, j, item)
+
+	def __updateTables(self):
+		try:
+			stats = self.db.getGlobalStats()
+		except PartMgrError as e:
+			QMessageBox.critical(self, "Failed to get statistics",
+					     str(e))
+			return
+
+		counts = stats.counts
+		overview = [
+			("Categories", counts.get("categories", 0)),
+			("Parts", counts.get("parts", 0)),
+			("Stock items", counts.get("stock", 0)),
+			("Suppliers", counts.get("suppliers", 0)),
+			("Locations", counts.get("locations", 0)),
+			("Footprints", counts.get("footprints", 0)),
+			("Origins", counts.get("origins", 0)),
+			("Storages", counts.get("storages", 0)),
+			("Stock items below minimum quantity", stats.belowMinimum),
+			("Stock items without price", stats.withoutPrice),
+			("Total stored quantity", stats.totalQuantity),
+		]
+		for currency, value in sorted(stats.inventoryValue.items()):
+			overview.append(("Inventory value",
+					 "%.2f %s" % (value, currency)))
+		self.__fillTable(self.overviewTable,
+				 (("Statistic", 300), ("Value", 200)),
+				 overview)
+		self.__fillTable(self.supplierTable,
+				 (("Supplier", 250), ("Stock items", 120),
+				  ("Origins", 120)),
+				 [ s[1:] for s in stats.suppliers ])
+		self.__fillTable(self.locationTable,
+				 (("Location", 250), ("Stock items", 120),
+				  ("Quantity", 120)),
+				 [ l[1:] for l in stats.locations ])
+		self.__fillTable(self.categoryTable,
+				 (("Category", 250), ("Stock items", 120)),
+				 [ c[1:] for c in stats.largestCategories ])
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# PartMgr GUI - Image conversion
+#
+# Copyright 2014-2026 Michael Buesch <m@bues.ch>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from partmgr.gui.util import *
+from partmgr.core.image import *
+
+
+def imageToPixmap(image, maxSize=None):
+	"""Decode the core Image to a QPixmap.
+	The pixmap is scaled down to 'maxSize' (QSize), if it is bigger.
+	Returns a null pixmap, if the image is empty or can not be decoded.
+	"""
+	pix = QPixmap()
+	if image and not image.isNull():
+		pix.loadFromData(QByteArray(image.toBytes()))
+	if maxSize is not None:
+		pix = scalePixmap(pix, maxSize)
+	return pix
+
+def pixmapToImage(pixmap):
+	"""Encode a QPixmap to a PNG core Image.
+	"""
+	ba = QByteArray()
+	buf = QBuffer(ba)
+	buf.open(QIODeviceBase.OpenModeFlag.WriteOnly)
+	pixmap.save(buf, "PNG")
+	return Image(bytes(ba.data()))
+
+def scalePixmap(pixmap, maxSize):
+	if pixmap.height() <= maxSize.height() and\
+	   pixmap.width() <= maxSize.width():
+		return pixmap
+	return pixmap.scaled(maxSize,
+			     Qt.AspectRatioMode.KeepAspectRatio,
+			     Qt.TransformationMode.SmoothTransformation)
+
+def imageFromFile(filename, maxSize=None):
+	"""Load an image file of any format supported by Qt
+	and convert it to a PNG core Image.
+	"""
+	image = Image()
+	image.fromFile(filename)
+	pix = imageToPixmap(image, maxSize)
+	if pix.isNull():
+		raise PartMgrError("%s: Unknown image format" % filename)
+	return pixmapToImage(pix)
@@ -36,8 +36,8 @@ class LocationManageDialog(AbstractEntityManageDialog):
 		self.nameLabel.setText("Location name:")
 
 	def updateData(self, selectLocation=None):
-		AbstractEntityManageDialog.updateData(self,
-			self.db.getLocations(),
+		AbstractEntityManageDialog.updateDataPaged(self,
+			"Location",
 			selectLocation)
 
 	def newEntity(self):
@@ -22,17 +22,30 @@
 from partmgr.gui.tree import *
 from partmgr.gui.stockitem import *
 from partmgr.gui.partselect import *
-from partmgr.gui.partstoorder import *
-from partmgr.gui.globalstats import *
-from partmgr.gui.footprintmanage import *
-from partmgr.gui.locationmanage import *
-from partmgr.gui.suppliermanage import *
-from partmgr.gui.parametermanage import *
-from partmgr.gui.pricefetch import *
 from partmgr.gui.util import *
 
 from partmgr.core.database import *
 
+import importlib
+
+# The dialog modules are imported on first use to speed up the startup.
+# { dialog class name : module }
+_LAZY_DIALOGS = {
+	"GlobalStatsDialog"		: "partmgr.gui.globalstats",
+	"PartsToOrderDialog"		: "partmgr.gui.partstoorder",
+	"DatabaseProfileDialog"		: "partmgr.gui.dbprofile",
+	"GlobalParametersManageDialog"	: "partmgr.gui.parametermanage",
+	"FootprintManageDialog"		: "partmgr.gui.footprintmanage",
+	"LocationManageDialog"		: "partmgr.gui.locationmanage",
+	"SupplierManageDialog"		: "partmgr.gui.suppliermanage",
+	"PriceFetchDialog"		: "partmgr.gui.pricefetch",
+}
+
+def _lazyDialog(name):
+	"""Import the module of the dialog class 'name' and return the class.
+	"""
+	return getattr(importlib.import_module(_LAZY_DIALOGS[name]), name)
+
 
 class _RightWidget(QWidget):
 	def __init__(self, subWidgets, parent=None):
@@ -66,6 +79,47 @@ class PartMgrMainWidget(QWidget):
 		self.tree.itemChanged.connect(self.itemChanged)
 		self.editEnable.stateChanged.connect(self.__editChanged)
 
+		# Poll for changes written by other processes.
+		self.__externalChangeCount = db.getExternalChangeCount()
+		self.externalChangeTimer = QTimer(self)
+		self.externalChangeTimer.timeout.connect(self.__checkExternalChanges)
+		self.externalChangeTimer.start(1000)
+
+		# Periodic rotated backups.
+		self.backupTimer = QTimer(self)
+		self.backupTimer.timeout.connect(self.__periodicBackup)
+		self.__updateBackupTimer()
+
+	def __updateBackupTimer(self):
+		self.backupTimer.stop()
+		param = self.db.getGlobalParameter("backup_interval")
+		minutes = param.getDataInt() if param else 0
+		if minutes > 0:
+			self.backupTimer.start(minutes * 60 * 1000)
+
+	def __periodicBackup(self):
+		param = self.db.getGlobalParameter("backup_count")
+		keep = param.getDataInt() if param else 0
+		if keep <= 0:
+			return
+		try:
+			self.db.backupRotated(keep=keep,
+				progressCallback=lambda remaining, total:
+					QApplication.processEvents())
+		except PartMgrError as e:
+			print("Periodic backup failed: %s" % str(e))
+
+	def __checkExternalChanges(self):
+		self.db.checkExternalChanges()
+		count = self.db.getExternalChangeCount()
+		if count != self.__externalChangeCount:
+			self.__externalChangeCount = count
+			self.tree.realModel().reload()
+			stockItem = self.stock.currentItem
+			if stockItem:
+				stockItem = self.db.getStockItem(stockItem.getId())
+			self.stock.setStockItem(stockItem)
+
 	def __editChanged(self, newState):
 		self.stock.setProtected(newState != Qt.CheckState.Checked.value)
 
@@ -77,41 +131,144 @@ class PartMgrMainWidget(QWidget):
 		self.editEnable.setEnabled(bool(stockItem))
 
 	def shutdown(self):
+		self.externalChangeTimer.stop()
+		self.backupTimer.stop()
 		self.db.close()
 
 	def showGlobalStats(self):
-		dlg = GlobalStatsDialog(self.db, self)
+		dlg = _lazyDialog("GlobalStatsDialog")(self.db, self)
 		dlg.exec()
 
 	def showPartsToOrder(self):
-		dlg = PartsToOrderDialog(self.db, self)
+		dlg = _lazyDialog("PartsToOrderDialog")(self.db, self)
 		dlg.show()
 
+	def showDatabaseProfile(self):
+		dlg = _lazyDialog("DatabaseProfileDialog")(self.db, self)
+		dlg.show()
+
+	def exportValuation(self):
+		fn, filt = QFileDialog.getSaveFileName(self,
+				"Export inventory valuation", "valuation.csv",
+				"CSV files (*.csv);;"
+				"All files (*)")
+		if not fn:
+			return
+		try:
+			valuation = self.db.getValuation()
+			with open(fn, "w", encoding="UTF-8", newline="") as fd:
+				valuation.writeCsv(fd)
+		except (PartMgrError, IOError) as e:
+			QMessageBox.critical(self, "Valuation export failed",
+					     str(e))
+
 	def manageGlobalParams(self):
-		dlg = GlobalParametersManageDialog(self.db, self)
+		dlg = _lazyDialog("GlobalParametersManageDialog")(self.db, self)
 		dlg.edit()
 		self.stock.updateData()
+		self.__updateBackupTimer()
+
+	def verifyDatabase(self):
+		progress = QProgressDialog("Verifying database...", "Cancel",
+					   0, 0, self)
+		progress.setWindowModality(Qt.WindowModality.WindowModal)
+		progress.show()
+		# Run the checks in small time slices to keep the GUI responsive.
+		state = None
+		try:
+			while not progress.wasCanceled():
+				state = self.db.verify(state, timeBudget=0.05)
+				if state.done:
+					break
+				progress.setLabelText("Verifying database: %s" % state.step)
+				QApplication.processEvents()
+		except PartMgrError as e:
+			progress.close()
+			QMessageBox.critical(self, "Verify failed", str(e))
+			return
+		progress.close()
+		if not state or not state.done:
+			return
+		if state.isOk():
+			QMessageBox.information(self, "Verify database",
+				"No problems found.")
+			return
+		maxProblems = 50
+		text = "\n".join(str(p) for p in state.problems[:maxProblems])
+		if len(state.problems) > maxProblems:
+			text += "\n... (%d more)" % (len(state.problems) - maxProblems)
+		QMessageBox.warning(self, "Verify database",
+			"%d problems found:\n\n%s\n\n"
+			"Dangling references can be repaired with "
+			"'Purge orphaned data'." % (len(state.problems), text))
+
+	def backupDatabase(self):
+		fn, filt = QFileDialog.getSaveFileName(self,
+				"Backup database", "",
+				"PartMgr files (*.pmg);;"
+				"All files (*)")
+		if not fn:
+			return
+		progress = QProgressDialog("Writing backup...", None, 0, 100, self)
+		progress.setWindowModality(Qt.WindowModality.WindowModal)
+		def update(remaining, total):
+			if total > 0:
+				progress.setValue(100 * (total - remaining) // total)
+			QApplication.processEvents()
+		try:
+			self.db.backup(fn, progressCallback=update)
+		except PartMgrError as e:
+			QMessageBox.critical(self, "Backup failed", str(e))
+		finally:
+			progress.close()
 
 	def manageFootprints(self):
-		dlg = FootprintManageDialog(self.db, self)
+		dlg = _lazyDialog("FootprintManageDialog")(self.db, self)
 		dlg.edit()
 		self.stock.updateData()
 
 	def manageLocations(self):
-		dlg = LocationManageDialog(self.db, self)
+		dlg = _lazyDialog("LocationManageDialog")(self.db, self)
 		dlg.edit()
 		self.stock.updateData()
 
 	def manageSuppliers(self):
-		dlg = SupplierManageDialog(self.db, self)
+		dlg = _lazyDialog("SupplierManageDialog")(self.db, self)
 		dlg.edit()
 		self.stock.updateData()
 
 	def fetchPrices(self):
-		dlg = PriceFetchDialog(self.db, self)
+		dlg = _lazyDialog("PriceFetchDialog")(self.db, self)
 		dlg.exec()
 		self.stock.updateData()
 
+	def purgeDatabase(self):
+		try:
+			counts = self.db.purge(dryRun=True)
+		except PartMgrError as e:
+			QMessageBox.critical(self, "Purge failed", str(e))
+			return
+		if not any(counts.values()):
+			QMessageBox.information(self, "Purge database",
+				"The database does not contain orphaned data.")
+			return
+		text = "\n".join("%s: %d" % (name, count)
+				  for name, count in sorted(counts.items())
+				  if count)
+		res = QMessageBox.question(self, "Purge database",
+			"The following orphaned database entries will be "
+			"removed or reset:\n\n%s\n\nPurge the database?" % text,
+			QMessageBox.StandardButton.Yes |
+			QMessageBox.StandardButton.No)
+		if res != QMessageBox.StandardButton.Yes:
+			return
+		try:
+			self.db.purge()
+		except PartMgrError as e:
+			QMessageBox.critical(self, "Purge failed", str(e))
+		self.tree.realModel().reload()
+		self.itemChanged(Entity.NO_ID)
+
 class PartMgrMainWindow(QMainWindow):
 	def __init__(self, parent=None):
 		QMainWindow.__init__(self, parent)
@@ -139,12 +296,25 @@ class PartMgrMainWindow(QMainWindow):
 		self.dbMenu.addSeparator()
 		self.dbMenu.addAction("Update p&rices...",
 				      self.fetchPrices)
+		self.dbMenu.addSeparator()
+		self.dbMenu.addAction("&Verify database...",
+				      self.verifyDatabase)
+		self.dbMenu.addAction("P&urge orphaned data...",
+				      self.purgeDatabase)
+		self.dbMenu.addAction("&Backup database...",
+				      self.backupDatabase)
 
 		self.statMenu = QMenu("&Statistics", self)
 		self.statMenu.addAction("Show parts to &order...",
 					self.showPartsToOrder)
 		self.statMenu.addAction("Show global &statistics...",
 					self.showGlobalStats)
+		self.statMenu.addSeparator()
+		self.statMenu.addAction("Export inventory &valuation...",
+					self.exportValuation)
+		self.statMenu.addSeparator()
+		self.statMenu.addAction("&Database statistics...",
+					self.showDatabaseProfile)
 		self.menuBar().addMenu(self.statMenu)
 
 		self.__enableDbMenus(False)
@@ -172,6 +342,16 @@ class PartMgrMainWindow(QMainWindow):
 		if mainWidget:
 			mainWidget.showPartsToOrder()
 
+	def showDatabaseProfile(self):
+		mainWidget = self.centralWidget()
+		if mainWidget:
+			mainWidget.showDatabaseProfile()
+
+	def exportValuation(self):
+		mainWidget = self.centralWidget()
+		if mainWidget:
+			mainWidget.exportValuation()
+
 	def manageGlobalParams(self):
 		mainWidget = self.centralWidget()
 		if mainWidget:
@@ -197,6 +377,21 @@ class PartMgrMainWindow(QMainWindow):
 		if mainWidget:
 			mainWidget.fetchPrices()
 
+	def purgeDatabase(self):
+		mainWidget = self.centralWidget()
+		if mainWidget:
+			mainWidget.purgeDatabase()
+
+	def verifyDatabase(self):
+		mainWidget = self.centralWidget()
+		if mainWidget:
+			mainWidget.verifyDatabase()
+
+	def backupDatabase(self):
+		mainWidget = self.centralWidget()
+		if mainWidget:
+			mainWidget.backupDatabase()
+
 	def loadDatabase(self):
 		fn, filt = QFileDialog.getSaveFileName(self,
 				"Load database", "",
@@ -26,6 +26,9 @@ from partmgr.core.parameter import *
 
 
 class ParameterEditWidget(QWidget):
+	# Parameters with plain integer data
+	INT_PARAMS = ("backup_count", "backup_interval", "journal_days")
+
 	def __init__(self, parent=None):
 		QWidget.__init__(self, parent)
 		self.setLayout(QVBoxLayout(self))
@@ -37,6 +40,11 @@ class ParameterEditWidget(QWidget):
 		self.layout().addWidget(self.combo)
 		self.combo.currentIndexChanged.connect(self.__comboChanged)
 
+		self.spin = QSpinBox(self)
+		self.spin.setRange(0, 100000)
+		self.layout().addWidget(self.spin)
+		self.spin.valueChanged.connect(self.__spinChanged)
+
 		self.currentParam = None
 		self.changeBlocked = 0
 		self.updateData()
@@ -46,6 +54,7 @@ class ParameterEditWidget(QWidget):
 
 		self.combo.clear()
 		self.combo.hide()
+		self.spin.hide()
 
 		self.currentParam = param
 		if not param:
@@ -63,6 +72,9 @@ class ParameterEditWidget(QWidget):
 					selectedIndex = i
 			self.combo.setCurrentIndex(selectedIndex)
 			self.combo.show()
+		elif param.getName() in self.INT_PARAMS:
+			self.spin.setValue(param.getDataInt())
+			self.spin.show()
 		else:
 			assert(0)
 
@@ -79,6 +91,14 @@ class ParameterEditWidget(QWidget):
 		else:
 			assert(0)
 
+	def __spinChanged(self, value):
+		if self.changeBlocked:
+			return
+		if self.currentParam.getName() in self.INT_PARAMS:
+			self.currentParam.setData(value)
+		else:
+			assert(0)
+
 class GlobalParametersManageDialog(AbstractEntityManageDialog):
 	"Global parameters modify dialog"
 
@@ -36,9 +36,10 @@ class PartManageDialog(AbstractEntityManageDialog):
 		self.nameLabel.setText("Part name:")
 
 	def updateData(self, selectPart=None):
-		AbstractEntityManageDialog.updateData(
-			self, self.stockItem.getAllParts(),
-			selectPart)
+		AbstractEntityManageDialog.updateDataPaged(
+			self, "Part",
+			selectPart,
+			{ "category" : self.stockItem.category })
 
 	def entSelChanged(self, item=None, prevItem=None):
 		AbstractEntityManageDialog.entSelChanged(self,
@@ -48,29 +48,20 @@ class PartsToOrderDialog(QDialog):
 
 	def __updateTable(self):
 		self.orderTable.clear()
-
-		stockItems = self.db.getStockItemsToPurchase()
-		if not stockItems:
-			self.orderTable.setRowCount(1)
-			self.orderTable.setColumnCount(1)
-			self.orderTable.setColumnWidth(0, 400)
-			item = QTableWidgetItem("No items to purchase found.",
-						QTableWidgetItem.ItemType.Type)
-			item.setData(Qt.ItemDataRole.UserRole, None)
-			self.orderTable.setItem(0, 0, item)
-			return
+		self.orderTable.setRowCount(0)
 
 		# Build the table
 		columns = (("Item name", 200), ("Order codes", 220),
 			   ("Amount to order", 120), ("Cur. in stock", 120))
 		self.orderTable.setColumnCount(len(columns))
-		self.orderTable.setRowCount(len(stockItems))
 		self.orderTable.setHorizontalHeaderLabels(tuple(l[0] for l in columns))
 		for i, (colName, colWidth) in enumerate(columns):
 			self.orderTable.setColumnWidth(i, colWidth)
 
 		# Populate the table
-		for i, stockItem in enumerate(stockItems):
+		for i, stockItem in enumerate(self.db.iterStockItemsToPurchase()):
+			self.orderTable.setRowCount(i + 1)
+
 			def mkitem(text):
 				item = QTableWidgetItem(text, QTableWidgetItem.ItemType.Type)
 				item.setData(Qt.ItemDataRole.UserRole, stockItem.getId())
@@ -102,6 +93,16 @@ class PartsToOrderDialog(QDialog):
 						       stockItem.getGlobalQuantity(),
 						       stockItem.getQuantityUnitsShort())))
 
+		if not self.orderTable.rowCount():
+			self.orderTable.clear()
+			self.orderTable.setRowCount(1)
+			self.orderTable.setColumnCount(1)
+			self.orderTable.setColumnWidth(0, 400)
+			item = QTableWidgetItem("No items to purchase found.",
+						QTableWidgetItem.ItemType.Type)
+			item.setData(Qt.ItemDataRole.UserRole, None)
+			self.orderTable.setItem(0, 0, item)
+
 	def __tabItemClicked(self, item):
 		if not item:
 			return
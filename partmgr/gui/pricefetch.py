@@ -28,6 +28,9 @@ from partmgr.gui.util import *
 
 
 class PriceFetchDialog(QDialog):
+	# Number of origins fetched at once in "update all" mode.
+	PAGE_SIZE = 200
+
 	def __init__(self, db, parent=None):
 		QDialog.__init__(self, parent)
 		self.setLayout(QGridLayout())
@@ -201,11 +204,31 @@ class PriceFetchDialog(QDialog):
 		item.setData(Qt.ItemDataRole.UserRole, origin.getId())
 		return item
 
+	# Yields (origin, stockItem) for all origins.
+	# The stock items of each page are fetched with one query.
+	def __iterAllOrigins(self):
+		afterKey = None
+		while True:
+			origins, afterKey = self.db.page("Origin", afterKey,
+							 self.PAGE_SIZE)
+			stockItems = self.db.getStockItemsByIds(
+				origin.stockItem for origin in origins)
+			for origin in origins:
+				yield origin, stockItems.get(origin.stockItem)
+			if afterKey is None:
+				break
+			# Keep repainting, but don't handle user input
+			# while the table is incomplete.
+			QApplication.processEvents(
+				QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents, 50)
+
 	def __rebuildTable(self):
 		if self.fetchMissingRadio.isChecked():
-			stockItems = self.db.getStockItemsWithMissingPrice()
+			origins = ((origin, stockItem)
+				   for stockItem in self.db.iterStockItemsWithMissingPrice()
+				   for origin in stockItem.getOrigins())
 		elif self.updateAllRadio.isChecked():
-			stockItems = self.db.getAllStockItems()
+			origins = self.__iterAllOrigins()
 		else:
 			assert(0)
 
@@ -220,30 +243,32 @@ class PriceFetchDialog(QDialog):
 		for i, (colName, colWidth) in enumerate(columns):
 			self.table.setColumnWidth(i, colWidth)
 
+		currency = self.db.getGlobalParameter("currency")
+		currency = Param_Currency.CURRNAMES[currency.getDataInt()][0]
+
 		i = 0
-		for stockItem in stockItems:
-			for origin in stockItem.getOrigins():
-				self.table.setRowCount(self.table.rowCount() + 1)
-
-				stockItemName = stockItem.getName()
-				supplier = origin.getSupplier()
-				supplierName = supplier.getName() if supplier else ""
-				orderCode = origin.getOrderCode()
-				currency = self.db.getGlobalParameter("currency")
-				currency = Param_Currency.CURRNAMES[currency.getDataInt()][0]
-				price = origin.getPrice()
-				price = ("%.2f %s" % (price, currency))\
-					if price else "<none>"
-
-				self.table.setItem(i, 0,
-						   self.__tabItem(stockItemName, origin))
-				self.table.setItem(i, 1,
-						   self.__tabItem(supplierName, origin))
-				self.table.setItem(i, 2,
-						   self.__tabItem(orderCode, origin))
-				self.table.setItem(i, 3,
-						   self.__tabItem(price, origin))
-				i += 1
+		for origin, stockItem in origins:
+			if not stockItem:
+				continue
+			self.table.setRowCount(self.table.rowCount() + 1)
+
+			stockItemName = stockItem.getName()
+			supplier = origin.getSupplier()
+			supplierName = supplier.getName() if supplier else ""
+			orderCode = origin.getOrderCode()
+			price = origin.getPrice()
+			price = ("%.2f %s" % (price, currency))\
+				if price else "<none>"
+
+			self.table.setItem(i, 0,
+					   self.__tabItem(stockItemName, origin))
+			self.table.setItem(i, 1,
+					   self.__tabItem(supplierName, origin))
+			self.table.setItem(i, 2,
+					   self.__tabItem(orderCode, origin))
+			self.table.setItem(i, 3,
+					   self.__tabItem(price, origin))
+			i += 1
 		self.table.setSortingEnabled(True)
 
 	def __tabItemClicked(self, item):
@@ -22,6 +22,7 @@
 from partmgr.gui.partselect import *
 from partmgr.gui.footprintselect import *
 from partmgr.gui.originselect import *
+from partmgr.gui.image import *
 from partmgr.gui.util import *
 
 from partmgr.core.stockitem import *
@@ -157,22 +158,23 @@ class StockItemWidget(QWidget):
 			return
 
 		def mkstamp(stamp):
-			if stamp:
-				return stamp
+			if stamp > 0:
+				return Timestamp.toDatetime(stamp)
 			return datetime.datetime(2000, 1, 1)
 
-		createStamp = mkstamp(stockItem.getCreateTimeStamp())
-		modTimes = []
-		modTimes.append(mkstamp(stockItem.getModifyTimeStamp()))
+		# Compare the integer stamps and only convert the result.
+		origins = stockItem.getOrigins()
+		modTimes = [
+			stockItem.getModifyTimeStampInt(),
+			Entity.maxStamp(origins),
+			Entity.maxStamp(origins, "priceStamp"),
+			Entity.maxStamp(stockItem.getStorages()),
+		]
 		part = stockItem.getPart()
 		if part:
-			modTimes.append(mkstamp(part.getModifyTimeStamp()))
-		for origin in stockItem.getOrigins():
-			modTimes.append(mkstamp(origin.getModifyTimeStamp()))
-			modTimes.append(mkstamp(origin.getPriceTimeStamp()))
-		for storage in stockItem.getStorages():
-			modTimes.append(mkstamp(storage.getModifyTimeStamp()))
-		modStamp = max(modTimes)
+			modTimes.append(part.getModifyTimeStampInt())
+		createStamp = mkstamp(stockItem.getCreateTimeStampInt())
+		modStamp = mkstamp(Timestamp.maxInt(modTimes))
 
 		self.datesLabel.setText("created: %s\n"
 				        "modified: %s" %\
@@ -232,13 +234,13 @@ class StockItemWidget(QWidget):
 		self.partSel.setSelected(part)
 		footp = stock.getFootprint()
 		self.footpSel.setSelected(footp)
-		image = footp.getImage() if footp else None
-		if not image or image.isNull():
+		pix = imageToPixmap(footp.getImage() if footp else None,
+				    QSize(50, 50))
+		if pix.isNull():
 			self.footpImage.clear()
 			self.footpImage.hide()
 		else:
-			image = image.scaleToMaxSize(QSize(50, 50))
-			self.footpImage.setPixmap(image.toPixmap())
+			self.footpImage.setPixmap(pix)
 			self.footpImage.show()
 		self.storagesSel.updateData(stock)
 		self.originsSel.updateData(stock)
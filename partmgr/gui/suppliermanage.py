@@ -74,8 +74,8 @@ class SupplierManageDialog(AbstractEntityManageDialog):
 		self.nameLabel.setText("Supplier name:")
 
 	def updateData(self, selectSupplier=None):
-		AbstractEntityManageDialog.updateData(self,
-			self.db.getSuppliers(),
+		AbstractEntityManageDialog.updateDataPaged(self,
+			"Supplier",
 			selectSupplier)
 
 	def entSelChanged(self, item=None, prevItem=None):
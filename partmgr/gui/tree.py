@@ -25,6 +25,8 @@ from partmgr.core.category import *
 from partmgr.core.stockitem import *
 from partmgr.core.part import *
 
+import bisect
+
 
 class TreeItem:
 	# Types
@@ -45,12 +47,21 @@ class TreeItem:
 			assert(0)
 
 class TreeModel(QAbstractItemModel):
+	MIME_TYPE = "application/x-partmgr-treeitems"
+
 	def __init__(self, db, parent=None):
 		QAbstractItemModel.__init__(self, parent)
 		self.db = db
 
 		self.fileIconProv = QFileIconProvider()
 
+		# While stock item rows are moved, the rows of the
+		# affected categories are served from these:
+		# { categoryId : [ stockItemIds ] } and
+		# { stockItemId : categoryId }
+		self.__movingRows = {}
+		self.__movingParents = {}
+
 		self.__clearLookup()
 
 	def __clearLookup(self):
@@ -87,6 +98,11 @@ class TreeModel(QAbstractItemModel):
 		uid = self.__treeItemToUniqueId(treeItem)
 		return self.createIndex(row, column, int(uid))
 
+	def reload(self):
+		self.beginResetModel()
+		self.__clearLookup()
+		self.endResetModel()
+
 	def entityToRowNumber(self, entity):
 		parentCategory = entity.getParent()
 		if not parentCategory:
@@ -95,10 +111,21 @@ class TreeModel(QAbstractItemModel):
 		if isinstance(entity, Category):
 			return parentCategory.getChildCategories().index(entity)
 		elif isinstance(entity, StockItem):
-			return parentCategory.countChildCategories() +\
-			       parentCategory.getChildStockItems().index(entity)
+			parentCategory = self.__stockItemCategory(entity)
+			movingRows = self.__movingRows.get(parentCategory.getId())
+			if movingRows is not None:
+				stockRow = movingRows.index(entity.getId())
+			else:
+				stockRow = parentCategory.getChildStockItems().index(entity)
+			return parentCategory.countChildCategories() + stockRow
 		assert(0)
 
+	def __stockItemCategory(self, stockItem):
+		categoryId = self.__movingParents.get(stockItem.getId())
+		if categoryId is not None:
+			return self.db.getCategory(categoryId)
+		return stockItem.getCategory()
+
 	def entityToModelIndex(self, entity):
 		if not entity:
 			return QModelIndex()
@@ -115,10 +142,75 @@ class TreeModel(QAbstractItemModel):
 
 	def flags(self, index):
 		if not index.isValid():
-			return Qt.ItemFlag.NoItemFlags
-		return Qt.ItemFlag.ItemIsEnabled |\
-		       Qt.ItemFlag.ItemIsSelectable |\
-		       Qt.ItemFlag.ItemIsEditable
+			return Qt.ItemFlag.ItemIsDropEnabled
+		flags = Qt.ItemFlag.ItemIsEnabled |\
+			Qt.ItemFlag.ItemIsSelectable |\
+			Qt.ItemFlag.ItemIsEditable |\
+			Qt.ItemFlag.ItemIsDragEnabled
+		treeItem = self.modelIndexToTreeItem(index)
+		if treeItem.entityType == TreeItem.CATEGORY:
+			flags |= Qt.ItemFlag.ItemIsDropEnabled
+		return flags
+
+	def supportedDragActions(self):
+		return Qt.DropAction.MoveAction
+
+	def supportedDropActions(self):
+		return Qt.DropAction.MoveAction
+
+	def mimeTypes(self):
+		return [ self.MIME_TYPE ]
+
+	def mimeData(self, indexes):
+		items = []
+		for index in indexes:
+			treeItem = self.modelIndexToTreeItem(index)
+			if treeItem:
+				items.append("%d:%d" % (treeItem.entityType,
+							treeItem.entityId))
+		mimeData = QMimeData()
+		mimeData.setData(self.MIME_TYPE,
+				 QByteArray(",".join(items).encode("ASCII")))
+		return mimeData
+
+	def __decodeMimeData(self, mimeData):
+		if not mimeData.hasFormat(self.MIME_TYPE):
+			return []
+		data = bytes(mimeData.data(self.MIME_TYPE).data()).decode("ASCII")
+		items = []
+		for item in data.split(","):
+			try:
+				entityType, entityId = item.split(":")
+				items.append(TreeItem(int(entityType), int(entityId)))
+			except ValueError:
+				return []
+		return items
+
+	def canDropMimeData(self, mimeData, action, row, column, parentIndex):
+		if action != Qt.DropAction.MoveAction:
+			return False
+		items = self.__decodeMimeData(mimeData)
+		if not items:
+			return False
+		if not parentIndex.isValid():
+			# Only categories can be dropped to the root.
+			return all(i.entityType == TreeItem.CATEGORY
+				   for i in items)
+		treeItem = self.modelIndexToTreeItem(parentIndex)
+		return treeItem.entityType == TreeItem.CATEGORY
+
+	def dropMimeData(self, mimeData, action, row, column, parentIndex):
+		if not self.canDropMimeData(mimeData, action, row,
+					    column, parentIndex):
+			return False
+		target = self.modelIndexToTreeItem(parentIndex)
+		try:
+			self.moveTreeItems(self.__decodeMimeData(mimeData), target)
+		except PartMgrError as e:
+			self.reload()
+			QMessageBox.critical(None, "Move failed", str(e))
+			return False
+		return True
 
 	def columnCount(self, parentIndex=QModelIndex()):
 		return 1
@@ -129,7 +221,11 @@ class TreeModel(QAbstractItemModel):
 			if treeItem.entityType == TreeItem.CATEGORY:
 				parentCatId = treeItem.entityId
 				nrCats = self.db.countChildCategories(parentCatId)
-				nrItems = self.db.countStockItemsByCategory(parentCatId)
+				movingRows = self.__movingRows.get(parentCatId)
+				if movingRows is not None:
+					nrItems = len(movingRows)
+				else:
+					nrItems = self.db.countStockItemsByCategory(parentCatId)
 				return nrCats + nrItems
 		else:
 			return self.db.countRootCategories()
@@ -149,6 +245,12 @@ class TreeModel(QAbstractItemModel):
 				return self.__makeModelIndex(origRow, origColumn,
 							     childCats[row])
 			row -= len(childCats)
+			movingRows = self.__movingRows.get(parentCatId)
+			if movingRows is not None:
+				if row < len(movingRows):
+					return self.__makeModelIndex(origRow, origColumn,
+						self.db.getStockItem(movingRows[row]))
+				assert(0)
 			childItems = self.db.getStockItemsByCategory(parentCatId)
 			if row < len(childItems):
 				return self.__makeModelIndex(origRow, origColumn,
@@ -174,7 +276,7 @@ class TreeModel(QAbstractItemModel):
 			stockItem = treeItem.toEntity(self.db)
 			if not stockItem:
 				return QModelIndex()
-			parentCat = stockItem.getCategory()
+			parentCat = self.__stockItemCategory(stockItem)
 		else:
 			assert(0)
 		if parentCat is None:
@@ -253,6 +355,153 @@ class TreeModel(QAbstractItemModel):
 		self.rowsRemoved.emit(self.entityToModelIndex(parentCat),
 				      entityRow, entityRow)
 
+	# Copy a TreeItem (stock or category subtree) into the same parent.
+	def copyTreeItem(self, treeItem):
+		entity = treeItem.toEntity(self.db)
+		parentCat = entity.getParent()
+		if treeItem.entityType == TreeItem.CATEGORY:
+			newEntity = self.db.copyCategorySubtree(entity, parentCat)
+		else:
+			newEntity = self.db.copyStockItem(entity, parentCat)
+
+		entityRow = self.entityToRowNumber(newEntity)
+		self.rowsInserted.emit(self.entityToModelIndex(parentCat),
+				       entityRow, entityRow)
+
+		return self.entityToModelIndex(newEntity)
+
+	# Move TreeItems (stock or category) into the category 'targetTreeItem'
+	# (or to the root, if None).
+	def moveTreeItems(self, treeItems, targetTreeItem):
+		targetCat = targetTreeItem.toEntity(self.db) if targetTreeItem\
+			    else None
+		targetCatId = Entity.toId(targetCat)
+		targetIndex = self.entityToModelIndex(targetCat)
+
+		# The categories from the target up to the root.
+		# None of them can be moved into the target.
+		ancestorIds = set()
+		cat = targetCat
+		while cat:
+			ancestorIds.add(cat.getId())
+			cat = cat.getParent()
+
+		entities = []
+		for treeItem in treeItems:
+			entity = treeItem.toEntity(self.db)
+			if not entity:
+				continue
+			if isinstance(entity, Category):
+				if entity.getId() in ancestorIds:
+					raise PartMgrError("Cannot move category '%s' "
+						"into its own sub-category" %\
+						entity.getName())
+			elif not targetCat:
+				raise PartMgrError("Stock items can not be moved "
+						   "to the root")
+			entities.append(entity)
+
+		# Don't move entities, if an ancestor category is moved, too.
+		movedCatIds = { e.getId() for e in entities
+				if isinstance(e, Category) }
+		def ancestorMoved(entity):
+			cat = entity.getParent()
+			while cat:
+				if cat.getId() in movedCatIds:
+					return True
+				cat = cat.getParent()
+			return False
+		entities = [ e for e in entities if not ancestorMoved(e) ]
+
+		categories = [ e for e in entities
+			       if isinstance(e, Category) and
+			       Entity.toId(e.getParent()) != targetCatId ]
+		stockItems = [ e for e in entities
+			       if isinstance(e, StockItem) and
+			       Entity.toId(e.getParent()) != targetCatId ]
+
+		with self.db.transaction():
+			for category in categories:
+				parentCat = category.getParent()
+				srcRow = self.entityToRowNumber(category)
+				siblings = targetCat.getChildCategories()\
+					   if targetCat else\
+					   self.db.getRootCategories()
+				dstRow = len([ c for c in siblings
+					       if c.getId() < category.getId() ])
+				self.beginMoveRows(self.entityToModelIndex(parentCat),
+						   srcRow, srcRow,
+						   targetIndex, dstRow)
+				try:
+					self.db.moveCategory(category, targetCat)
+				finally:
+					self.endMoveRows()
+
+			if stockItems:
+				self.__moveStockRows(stockItems, targetCat)
+
+	# Move the rows of 'stockItems' into 'targetCat'.
+	# The database is changed with one moveStockItems() call up front.
+	# The views are then notified with one beginMoveRows()/endMoveRows()
+	# pair per run of items that is contiguous in the source and in the
+	# target category. In between, the model serves the rows of the
+	# affected categories from __movingRows, so that every
+	# notification matches the rows the model reports.
+	def __moveStockRows(self, stockItems, targetCat):
+		movingRows = { targetCat.getId() : [ s.getId() for s in
+					targetCat.getChildStockItems() ] }
+		movingParents = {}
+		for stockItem in stockItems:
+			srcCat = stockItem.getCategory()
+			if srcCat.getId() not in movingRows:
+				movingRows[srcCat.getId()] = [ s.getId() for s in
+					srcCat.getChildStockItems() ]
+			movingParents[stockItem.getId()] = srcCat.getId()
+
+		# Row positions before the move and after the move.
+		srcPos = { stockItemId : pos
+			   for catId, ids in movingRows.items()
+			   if catId != targetCat.getId()
+			   for pos, stockItemId in enumerate(ids) }
+		dstPos = { stockItemId : pos for pos, stockItemId in
+			   enumerate(sorted(movingRows[targetCat.getId()] +
+					    list(movingParents.keys()))) }
+		runs = []
+		for stockItemId in sorted(movingParents.keys()):
+			srcCatId = movingParents[stockItemId]
+			if runs:
+				prevCatId, run = runs[-1]
+				if prevCatId == srcCatId and\
+				   srcPos[run[-1]] + 1 == srcPos[stockItemId] and\
+				   dstPos[run[-1]] + 1 == dstPos[stockItemId]:
+					run.append(stockItemId)
+					continue
+			runs.append((srcCatId, [ stockItemId ]))
+
+		self.db.moveStockItems(stockItems, targetCat)
+
+		self.__movingRows, self.__movingParents = movingRows, movingParents
+		try:
+			targetIndex = self.entityToModelIndex(targetCat)
+			targetIds = movingRows[targetCat.getId()]
+			for srcCatId, run in runs:
+				srcCat = self.db.getCategory(srcCatId)
+				srcIds = movingRows[srcCatId]
+				first = srcIds.index(run[0])
+				srcRow = srcCat.countChildCategories() + first
+				dst = bisect.bisect_left(targetIds, run[0])
+				self.beginMoveRows(self.entityToModelIndex(srcCat),
+						   srcRow, srcRow + len(run) - 1,
+						   targetIndex,
+						   targetCat.countChildCategories() + dst)
+				del srcIds[first : first + len(run)]
+				targetIds[dst:dst] = run
+				for stockItemId in run:
+					movingParents[stockItemId] = targetCat.getId()
+				self.endMoveRows()
+		finally:
+			self.__movingRows, self.__movingParents = {}, {}
+
 	# Rename a TreeItem (stock or category).
 	def renameTreeItem(self, treeItem, newName):
 		entity = treeItem.toEntity(self.db)
@@ -323,6 +572,13 @@ class Tree(QTreeView):
 		self.setSortingEnabled(True)
 		self.sortByColumn(0, Qt.SortOrder.AscendingOrder)
 
+		self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+		self.setDragEnabled(True)
+		self.setAcceptDrops(True)
+		self.setDropIndicatorShown(True)
+		self.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
+		self.setDefaultDropAction(Qt.DropAction.MoveAction)
+
 	def __modelDataChanged(self):
 		selected = self.model().mapToSource(self.currentIndex())
 		treeItem = self.realModel().modelIndexToTreeItem(selected)
@@ -356,11 +612,15 @@ class Tree(QTreeView):
 				menu.addSeparator()
 				menu.addAction("&Rename category",
 					       self.renameCategory)
+				menu.addAction("C&opy category",
+					       self.copyTreeItem)
 				menu.addAction("&Delete category",
 					       self.delCategory)
 			elif treeItem.entityType == TreeItem.STOCKITEM:
 				menu.addAction("R&ename stock item",
 					       self.renameStockItem)
+				menu.addAction("C&opy stock item",
+					       self.copyTreeItem)
 				menu.addAction("De&lete stock item",
 					       self.delStockItem)
 			else:
@@ -437,6 +697,17 @@ class Tree(QTreeView):
 			return
 		self.realModel().renameTreeItem(self.contextTreeItem, newName)
 
+	def copyTreeItem(self):
+		try:
+			newModelIndex = self.realModel().copyTreeItem(
+						self.contextTreeItem)
+		except PartMgrError as e:
+			QMessageBox.critical(self, "Copy failed", str(e))
+			return
+		newModelIndex = self.model().mapFromSource(newModelIndex)
+		self.setCurrentIndex(newModelIndex)
+		self.edit(newModelIndex)
+
 	def addStockItem(self):
 		assert(self.contextTreeItem.entityType == TreeItem.CATEGORY)
 		stockItem = StockItem("")
@@ -19,6 +19,7 @@ extraKeywords = {}
 if cx_Freeze:
 	extraKeywords["executables"] = [
 		Executable(script="partmgr-gui"),
+		Executable(script="partmgr-cli"),
 	]
 	extraKeywords["options"] = {
 		"build_exe" : {
@@ -40,8 +41,10 @@ setup(
 	packages	= [ "partmgr",
 			    "partmgr/core",
 			    "partmgr/pricefetch",
-			    "partmgr/gui", ],
-	scripts		= [ "partmgr-gui", ],
+			    "partmgr/gui",
+			    "partmgr/cli", ],
+	scripts		= [ "partmgr-gui",
+			    "partmgr-cli", ],
 	keywords	= [ ],
 	install_requires = [ "PySide6", ],
 	classifiers	= [
@@ -1 +1,6 @@
 from test_pricefetch import *
+from test_database import *
+from test_queryplan import *
+from test_headless import *
+from test_startup import *
+from test_cli import *
@@ -0,0 +1,155 @@
+from partmgr_tstlib import *
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+
+from partmgr.core.database import *
+from partmgr.cli.cli import *
+
+
+class Test_Cli(TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.filename = os.path.join(self.tmpdir.name, "test.pmg")
+		db = Database(self.filename)
+		try:
+			parent = Category("Passive")
+			db.modifyCategory(parent)
+			cat = Category("Resistors", parent=parent)
+			db.modifyCategory(cat)
+			supplier = Supplier("Shop")
+			db.modifySupplier(supplier)
+			self.loc1 = Location("box 1")
+			db.modifyLocation(self.loc1)
+			self.loc2 = Location("box 2")
+			db.modifyLocation(self.loc2)
+			self.items = []
+			for i, (name, qty, minQty) in enumerate((("R 1k", 10, 20),
+								 ("R 10k", 50, 5),
+								 ("C 100n", 3, 0))):
+				item = StockItem(name, category=cat,
+						 minQuantity=minQty,
+						 targetQuantity=minQty * 2)
+				db.modifyStockItem(item)
+				db.modifyStorage(Storage("", stockItem=item,
+							 location=self.loc1,
+							 quantity=qty))
+				db.modifyOrigin(Origin("", stockItem=item,
+						       supplier=supplier,
+						       orderCode="OC%d" % i,
+						       price=0.1 * (i + 1)))
+				self.items.append(item.getId())
+		finally:
+			db.close()
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def run_cli(self, *args, fmt="csv", inp=""):
+		out = io.StringIO()
+		with contextlib.redirect_stdout(io.StringIO()),\
+		     contextlib.redirect_stderr(io.StringIO()) as err:
+			ret = main([ "partmgr-cli", "-f", fmt, self.filename ] +
+				   [ str(a) for a in args ],
+				   out, io.StringIO(inp))
+		self.stderr = err.getvalue()
+		return ret, out.getvalue()
+
+	def run_json(self, *args):
+		ret, out = self.run_cli(*args, fmt="json")
+		self.assertEqual(ret, 0, self.stderr)
+		return [ json.loads(line) for line in out.splitlines() ]
+
+	def test_search(self):
+		ret, out = self.run_cli("search", "r ")
+		self.assertEqual(ret, 0, self.stderr)
+		lines = out.splitlines()
+		self.assertEqual(lines[0], ",".join(Cli.STOCK_FIELDS))
+		self.assertEqual(len(lines), 3)
+
+		records = self.run_json("search", "10K", "-c", "Passive")
+		self.assertEqual([ r["name"] for r in records ], [ "R 10k" ])
+		self.assertEqual(records[0]["category"], "Passive/Resistors")
+		self.assertEqual(records[0]["quantity"], 50)
+		# Above the target quantity. Nothing to order.
+		self.assertEqual(records[0]["orderQuantity"], 0)
+		self.assertEqual(self.run_json("search", "R", "-c", "Active"), [])
+
+	def test_show(self):
+		obj, = self.run_json("show", self.items[0])
+		self.assertEqual(obj["name"], "R 1k")
+		self.assertEqual(obj["origins"][0]["orderCode"], "OC0")
+		self.assertEqual(obj["storages"][0]["location"], "box 1")
+		ret, out = self.run_cli("show", 12345)
+		self.assertEqual(ret, 1)
+		self.assertIn("does not exist", self.stderr)
+
+	def test_quantities(self):
+		itemId = self.items[0]
+		rec, = self.run_json("set-qty", itemId, 7)
+		self.assertEqual((rec["oldQuantity"], rec["quantity"]), (10, 7))
+		rec, = self.run_json("add-stock", itemId, 5)
+		self.assertEqual((rec["oldQuantity"], rec["quantity"]), (7, 12))
+		ret, out = self.run_cli("add-stock", itemId, -20)
+		self.assertEqual(ret, 1)
+		self.assertEqual(out, "")
+		self.assertEqual(self.run_json("show", itemId)[0]["quantity"], 12)
+
+		ret, out = self.run_cli("add-stock", itemId, 3, "-l", "box 2")
+		self.assertEqual(ret, 1)
+		rec, = self.run_json("add-stock", itemId, 3, "-l", "box 2", "-C")
+		self.assertEqual((rec["location"], rec["quantity"]), ("box 2", 3))
+		self.assertEqual(self.run_json("show", itemId)[0]["quantity"], 15)
+		# Ambiguous without --location.
+		ret, out = self.run_cli("set-qty", itemId, 1)
+		self.assertEqual(ret, 1)
+		self.assertEqual(out, "")
+
+	def test_toOrder(self):
+		records = self.run_json("to-order")
+		self.assertEqual([ r["name"] for r in records ], [ "R 1k" ])
+		self.assertEqual(records[0]["orderQuantity"], 30)
+		self.assertEqual(records[0]["orderCodes"], "Shop: OC0")
+
+	def test_stats(self):
+		obj, = self.run_json("stats")
+		self.assertEqual(obj["counts"]["stock"], 3)
+		self.assertEqual(obj["totalQuantity"], 63)
+		self.assertEqual(obj["belowMinimum"], 1)
+
+	def test_exportImport(self):
+		ret, exported = self.run_cli("export")
+		self.assertEqual(ret, 0, self.stderr)
+		self.assertEqual(len(exported.splitlines()), 4)
+		os.unlink(self.filename)
+		Database(self.filename).close()
+		ret, out = self.run_cli("import", "-", inp=exported)
+		self.assertEqual(ret, 0, self.stderr)
+		ret, reexported = self.run_cli("export")
+		self.assertEqual(ret, 0, self.stderr)
+		self.assertEqual(sorted(reexported.splitlines()),
+				 sorted(exported.splitlines()))
+
+	def test_readOnly(self):
+		args = parseArgs([ "partmgr-cli", self.filename, "stats" ])
+		self.assertFalse(Cli.needsWrite(args))
+		args = parseArgs([ "partmgr-cli", self.filename,
+				   "fetch-prices", "--dry-run" ])
+		self.assertFalse(Cli.needsWrite(args))
+		args = parseArgs([ "partmgr-cli", self.filename, "set-qty", "1", "2" ])
+		self.assertTrue(Cli.needsWrite(args))
+
+		with contextlib.redirect_stdout(io.StringIO()):
+			db = Database(self.filename, readOnly=True)
+			try:
+				self.assertEqual(db.getStockItem(self.items[0]).getName(), "R 1k")
+				with self.assertRaises(PartMgrError):
+					db.modifyLocation(Location("new"))
+			finally:
+				db.close()
+			with self.assertRaises(PartMgrError):
+				Database(os.path.join(self.tmpdir.name, "missing.pmg"),
+					 readOnly=True)
@@ -0,0 +1,836 @@
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from partmgr_tstlib import *
+from partmgr.core.database import *
+from partmgr.core.asyncdatabase import *
+from partmgr.core.importer import *
+from partmgr.core.bom import *
+from partmgr.core.planner import *
+
+class DatabaseTestCase(TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.filename = os.path.join(self.tmpdir.name, "test.pmg")
+		self.db = Database(self.filename)
+
+	def tearDown(self):
+		self.db.close()
+		self.tmpdir.cleanup()
+
+	def makeStockItem(self, category, name, quantity=0, price=None):
+		stockItem = StockItem(name, category=category)
+		self.db.modifyStockItem(stockItem)
+		storage = Storage("", stockItem=stockItem, quantity=quantity)
+		self.db.modifyStorage(storage)
+		if price is not None:
+			origin = Origin("", stockItem=stockItem, price=price)
+			self.db.modifyOrigin(origin)
+		return stockItem
+
+class Test_AsyncDatabase(DatabaseTestCase):
+	def test_calls(self):
+		async def run():
+			adb = await AsyncDatabase.open(self.filename)
+			try:
+				cat = Category("cat")
+				await adb.modifyCategory(cat)
+				items = [ StockItem("item%d" % i, category=cat)
+					  for i in range(10) ]
+				ids = await asyncio.gather(*(adb.modifyStockItem(item)
+							     for item in items))
+				self.assertEqual(len(set(ids)), 10)
+				item = await adb.getStockItem(ids[3])
+				self.assertEqual(item.getName(), "item3")
+				self.assertEqual(await adb.countStockItemsByCategory(cat), 10)
+				names = [ item.getName() async for item in
+					  adb.iterate("getStockItemsByCategory", cat,
+						      chunkSize=3) ]
+				self.assertEqual(names, [ "item%d" % i for i in range(10) ])
+				qty = await adb.run(lambda db: db.getStockItem(ids[0]).getGlobalQuantity())
+				self.assertEqual(qty, 0)
+				with self.assertRaises(AttributeError):
+					adb.doesNotExist
+			finally:
+				await adb.close()
+		asyncio.run(run())
+
+class Test_Timestamp(TestCase):
+	def test_conversion(self):
+		stamp = Timestamp(1000)
+		self.assertTrue(stamp.isValid())
+		self.assertIs(stamp.getStamp(), Timestamp(1000).getStamp())
+		self.assertEqual(Timestamp(stamp.getStamp()).getStampInt(), 1000)
+		self.assertEqual(Timestamp.toInt(stamp), 1000)
+		self.assertEqual(Timestamp.toInt(None), 0)
+		self.assertFalse(Timestamp().isValid())
+		self.assertIsNone(Timestamp().getStamp())
+
+	def test_entityStamps(self):
+		items = [ StockItem("item%d" % i,
+				    createTimeStamp=1000 + i,
+				    modifyTimeStamp=2000 - i)
+			  for i in range(10) ]
+		self.assertEqual(Entity.maxStamp(items), 2000)
+		self.assertEqual(Entity.minStamp(items), 1991)
+		self.assertEqual(Entity.maxStamp(items, "createStamp"), 1009)
+		self.assertEqual(Entity.maxStamp([]), 0)
+		self.assertEqual([ s.getName() for s in
+				   Entity.filterByStamp(items, 1995, 1998) ],
+				 [ "item2", "item3", "item4", "item5" ])
+		self.assertEqual(len(Entity.filterByStamp(items, end=1991)), 1)
+		origins = [ Origin("", priceTimeStamp=0), Origin("") ]
+		self.assertEqual(Entity.maxStamp(origins, "priceStamp"), 0)
+		self.assertEqual(Entity.minStamp(origins, "priceStamp"), 0)
+
+class Test_Iterators(DatabaseTestCase):
+	def test_iterStockItems(self):
+		cat = Category("cat")
+		self.db.modifyCategory(cat)
+		for i in range(10):
+			self.makeStockItem(cat, "item%d" % i,
+					   quantity=i, price=None if i % 2 else 1.0)
+		self.db.ITER_CHUNK_SIZE = 3
+		it = self.db.iterStockItems()
+		self.assertEqual(next(it).getName(), "item0")
+		self.assertEqual([ s.getName() for s in it ],
+				 [ "item%d" % i for i in range(1, 10) ])
+		self.assertEqual(len(list(self.db.iterStockItems(cat))), 10)
+		self.assertEqual(list(self.db.iterStockItems(Entity.NO_ID)), [])
+		self.assertEqual([ s.getName() for s in self.db.iterStockItemsToPurchase() ],
+				 [])
+		self.assertEqual(self.db.getParts(), list(self.db.iterParts()))
+
+	def test_getStockItemsByIds(self):
+		cat = Category("cat")
+		self.db.modifyCategory(cat)
+		items = [ self.makeStockItem(cat, "item%d" % i)
+			  for i in range(5) ]
+		self.db.LOOKUP_CHUNK_SIZE = 2
+		byId = self.db.getStockItemsByIds([ items[0], items[3].getId(),
+						    items[4], 12345 ])
+		self.assertEqual({ i : s.getName() for i, s in byId.items() },
+				 { items[0].getId() : "item0",
+				   items[3].getId() : "item3",
+				   items[4].getId() : "item4" })
+		self.assertEqual(self.db.getStockItemsByIds(()), {})
+
+class Test_Page(DatabaseTestCase):
+	def test_page(self):
+		cat = Category("cat")
+		self.db.modifyCategory(cat)
+		other = Category("other")
+		self.db.modifyCategory(other)
+		items = [ self.makeStockItem(cat if i % 3 else other, "item%d" % i)
+			  for i in range(25) ]
+		for orderBy in ("id", "modifyTimeStamp"):
+			names, key = [], None
+			while True:
+				page, key = self.db.page("StockItem", key, limit=4,
+							 orderBy=orderBy,
+							 filter={ "category" : cat })
+				names.extend(s.getName() for s in page)
+				if key is None:
+					break
+			self.assertEqual(names, [ "item%d" % i for i in range(25) if i % 3 ])
+		storages, key = self.db.page("Storage", limit=100)
+		self.assertEqual(len(storages), 25)
+		self.assertIsNone(key)
+		with self.assertRaises(PartMgrError):
+			self.db.page("StockItem", orderBy="name")
+		with self.assertRaises(PartMgrError):
+			self.db.page("StockItem", filter={ "footprint" : 1 })
+
+class Test_Changes(DatabaseTestCase):
+	def test_changesSince(self):
+		seq = self.db.getChangeSeq()
+		cat = Category("cat")
+		self.db.modifyCategory(cat)
+		cat.setName("renamed")
+		item = StockItem("item", category=cat)
+		self.db.modifyStockItem(item)
+		item.delete()
+		changes = self.db.changesSince(seq)
+		self.assertEqual([ c[1:4] for c in changes ], [
+			("categories", cat.getId(), Database.CHANGE_INSERT),
+			("categories", cat.getId(), Database.CHANGE_UPDATE),
+			("stock", changes[2][2], Database.CHANGE_INSERT),
+			("stock", changes[2][2], Database.CHANGE_DELETE),
+		])
+		self.assertEqual(self.db.changesSince(changes[1][0], limit=1),
+				 changes[2:3])
+		self.db.trimChanges(changes[-1][0])
+		self.assertEqual(self.db.changesSince(0), [])
+		self.assertEqual(self.db.getChangeSeq(), changes[-1][0])
+
+	def test_timeBase(self):
+		# The journal uses the time base of the entity stamps
+		# in any time zone.
+		oldTz = os.environ.get("TZ")
+		try:
+			for tz in ("UTC", "XYZ-03", "XYZ+07"):
+				os.environ["TZ"] = tz
+				time.tzset()
+				seq = self.db.getChangeSeq()
+				cat = Category("cat")
+				self.db.modifyCategory(cat)
+				change, = self.db.changesSince(seq)
+				self.assertLessEqual(abs(change[4] -
+					cat.getModifyTimeStampInt()), 2)
+		finally:
+			if oldTz is None:
+				os.environ.pop("TZ", None)
+			else:
+				os.environ["TZ"] = oldTz
+			time.tzset()
+
+	def test_retention(self):
+		self.db.modifyCategory(Category("cat"))
+		seq = self.db.getChangeSeq()
+		self.db.trimChangesBefore(Timestamp.nowInt() - 60)
+		self.assertEqual(len(self.db.changesSince(0)), seq)
+		self.db.trimChangesBefore(Timestamp.nowInt() + 60)
+		self.assertEqual(self.db.changesSince(0), [])
+
+		self.db.getGlobalParameter("journal_days").setData(1)
+		self.db.modifyCategory(Category("cat2"))
+		self.db.close()
+		conn = sqlite3.connect(self.filename)
+		conn.execute("UPDATE changes SET timeStamp = timeStamp - 2 * 86400 "
+			     "WHERE seq <= ?;", (seq + 1,))
+		conn.commit()
+		conn.close()
+		self.db = Database(self.filename)
+		# The aged entries are gone. The new ones are kept.
+		self.assertEqual(self.db.changesSince(0)[0][0], seq + 2)
+
+class Test_ExternalChanges(DatabaseTestCase):
+	def test_dataVersion(self):
+		self.db.DATA_VERSION_POLL_INTERVAL = 0.0
+		cat = Category("cat")
+		self.db.modifyCategory(cat)
+		self.assertEqual(self.db.getCategory(cat.getId()).getName(), "cat")
+		self.assertEqual(self.db.countStockItemsByCategory(cat), 0)
+		self.assertFalse(self.db.checkExternalChanges())
+
+		other = Database(self.filename)
+		try:
+			otherCat = other.getCategory(cat.getId())
+			otherCat.setName("renamed")
+			other.modifyStockItem(StockItem("item", category=cat))
+		finally:
+			other.close()
+
+		self.assertEqual(self.db.getCategory(cat.getId()).getName(), "renamed")
+		self.assertEqual(self.db.countStockItemsByCategory(cat), 1)
+		self.assertEqual(self.db.getExternalChangeCount(), 1)
+
+class Test_Transaction(DatabaseTestCase):
+	def test_rollback(self):
+		cat = Category("cat")
+		self.db.modifyCategory(cat)
+		with self.db.transaction():
+			self.makeStockItem(cat, "item0")
+			with self.assertRaises(PartMgrError):
+				with self.db.transaction():
+					self.makeStockItem(cat, "item1")
+					raise PartMgrError("abort")
+		self.assertEqual([ s.getName() for s in cat.getChildStockItems() ],
+				 [ "item0" ])
+		with self.assertRaises(PartMgrError):
+			with self.db.transaction():
+				self.makeStockItem(cat, "item2")
+				raise PartMgrError("abort")
+		self.assertEqual(self.db.countStockItemsByCategory(cat), 1)
+
+class Test_Importer(DatabaseTestCase):
+	def test_csv(self):
+		importer = StockImporter(self.db)
+		importer.CHUNK_SIZE = 2
+		data = ("name,category,part,supplier,price,location,quantity,quantityUnits\n"
+			"R1,a/b,10k,Shop,0.5,Box,10,pc\n"
+			"R2,a/b,10k,Shop,,Box,,\n"
+			"C1,a/c,,,,,3,\n")
+		result = importer.importCsv(io.StringIO(data))
+		self.assertEqual(result.rows, 3)
+		items = self.db.getAllStockItems()
+		self.assertEqual([ s.getName() for s in items ], [ "R1", "R2", "C1" ])
+		self.assertEqual(items[0].getCategory().getName(), "b")
+		self.assertEqual(items[0].getCategory().getParent().getName(), "a")
+		self.assertEqual(items[2].getCategory().getParent(),
+				 items[0].getCategory().getParent())
+		self.assertEqual(items[0].getPart(), items[1].getPart())
+		self.assertEqual(items[0].getGlobalQuantity(), 10)
+		self.assertEqual(items[2].getGlobalQuantity(), 3)
+		self.assertEqual(items[0].getOrigins()[0].getPrice(), 0.5)
+		self.assertEqual(items[1].getOrigins()[0].getSupplier().getName(),
+				 "Shop")
+		self.assertEqual(len(self.db.getSuppliers()), 1)
+		self.assertEqual(len(self.db.getLocations()), 1)
+
+	def test_json(self):
+		importer = StockImporter(self.db)
+		importer.JSON_READ_SIZE = 7
+		importer.importJson(io.StringIO(
+			'[{"name": "a", "category": "x"},\n'
+			' {"name": "b", "category": "x", "quantity": 2}]'))
+		importer.importJson(io.StringIO(
+			'{"name": "c", "category": "x"}\n'
+			'{"name": "d", "category": "x/y"}\n'))
+		self.assertEqual([ s.getName() for s in self.db.getAllStockItems() ],
+				 [ "a", "b", "c", "d" ])
+		self.assertEqual(len(self.db.getRootCategories()), 1)
+		with self.assertRaises(PartMgrError):
+			importer.importJson(io.StringIO(
+				'{"name": "e", "category": "x"}\n'
+				'{"name": "f", "category": "x", "quantity": "many"}\n'))
+		self.assertEqual(len(self.db.getAllStockItems()), 4)
+
+class Test_Bom(DatabaseTestCase):
+	def setUp(self):
+		super().setUp()
+		StockImporter(self.db).importCsv(io.StringIO(
+			"name,category,part,quantity\n"
+			"R 10k,R,10k,100\n"
+			"C 100n,C,,5\n"
+			"LED red,LED,,0\n"))
+		items = self.db.getAllStockItems()
+		self.db.modifyParameter(Parameter("Value",
+			parentType=Parameter.PTYPE_STOCKITEM,
+			parent=items[1], data="100n"))
+
+	def test_csv(self):
+		bom = Bom.fromKiCadCsv(io.StringIO(
+			"Source:,board.kicad_sch\n"
+			"\n"
+			'"Refs","Value","Footprint","Qty","DNP"\n'
+			'"R1,R2,R3","10k","R:R_0603","3",""\n'
+			'"C1,C2","100n","C:C_0603","2",""\n'
+			'"C3","100n","C:C_0603","1",""\n'
+			'"D1","LED red","","1",""\n'
+			'"U1","MCU","","1",""\n'
+			'"R4","10k","","1","DNP"\n'))
+		self.assertEqual([ (l.value, l.quantity) for l in bom.getLines() ],
+				 [ ("10k", 3), ("100n", 3), ("LED red", 1), ("MCU", 1) ])
+		check = checkBom(self.db, bom, count=2)
+		self.assertEqual([ (c.stockItem.getName() if c.stockItem else None,
+				    c.required, c.available, c.getToOrder())
+				   for c in check ],
+				 [ ("R 10k", 6, 100, 0),
+				   ("C 100n", 6, 5, 1),
+				   ("LED red", 2, 0, 2),
+				   (None, 2, 0, 2) ])
+		out = io.StringIO()
+		writeShortageReportCsv(out, check, shortOnly=True)
+		self.assertEqual(len(out.getvalue().splitlines()), 4)
+
+	def test_xml(self):
+		bom = Bom.fromKiCadXml(io.BytesIO(b"""<?xml version="1.0"?>
+			<export version="E"><components>
+			<comp ref="R1"><value>10k</value><footprint>R:R_0603</footprint></comp>
+			<comp ref="R2"><value>10k</value><footprint>R:R_0603</footprint></comp>
+			<comp ref="R3"><value>10k</value><property name="dnp"/></comp>
+			</components></export>"""))
+		self.assertEqual([ (l.value, l.references, l.quantity)
+				   for l in bom.getLines() ],
+				 [ ("10k", [ "R1", "R2" ], 2) ])
+
+class Test_Planner(DatabaseTestCase):
+	def test_plan(self):
+		StockImporter(self.db).importCsv(io.StringIO(
+			"name,category,quantity\n"
+			"10k,R,100\n"
+			"100n,C,30\n"))
+		boardA = Bom("A", [ BomLine("10k", quantity=2),
+				    BomLine("100n", quantity=1) ])
+		boardB = Bom("B", [ BomLine("100n", quantity=1),
+				    BomLine("MCU", quantity=1) ])
+		planner = BuildPlanner(self.db)
+		planner.addBom(boardA, 50)
+		planner.addBom(boardB, 20)
+		plan = planner.plan()
+		a, b = plan.getPlannedBoms()
+		self.assertEqual((a.maxBuildable, a.buildable), (30, 21))
+		self.assertEqual((b.maxBuildable, b.buildable), (0, 0))
+		self.assertFalse(plan.isBuildable())
+		self.assertEqual([ (p.getName(), p.demand, p.available, p.getToOrder())
+				   for p in plan.getPurchaseList() ],
+				 [ ("100n", 70, 30, 40), ("MCU", 20, 0, 20) ])
+
+	def test_invalidCount(self):
+		board = Bom("A", [ BomLine("10k", quantity=2) ])
+		planner = BuildPlanner(self.db)
+		for count in (0, -1, 1.5, "3", True):
+			with self.assertRaises(PartMgrError):
+				planner.addBom(board, count)
+		planner.addBom(board, 1)
+		a, = planner.plan().getPlannedBoms()
+		self.assertEqual((a.maxBuildable, a.buildable), (0, 0))
+
+class Test_Purge(DatabaseTestCase):
+	def test_purge(self):
+		root = Category("root")
+		self.db.modifyCategory(root)
+		child = Category("child", parent=root)
+		self.db.modifyCategory(child)
+		grandChild = Category("grandchild", parent=child)
+		self.db.modifyCategory(grandChild)
+		keep = self.makeStockItem(root, "keep", quantity=1, price=1.0)
+		lost = self.makeStockItem(grandChild, "lost", quantity=1, price=1.0)
+		supplier = Supplier("supplier")
+		self.db.modifySupplier(supplier)
+		origin = keep.getOrigins()[0]
+		origin.setSupplier(supplier)
+		self.db.modifyParameter(Parameter("p",
+			parentType=Parameter.PTYPE_STOCKITEM, parent=lost))
+		self.db.delCategory(child)
+		self.db.delSupplier(supplier)
+
+		expected = { "categories" : 1, "stock" : 1, "parts" : 0,
+			     "origins" : 1, "storages" : 1, "price_history" : 1,
+			     "parameters" : 1,
+			     "references" : 1, }
+		self.assertEqual(self.db.purge(dryRun=True), expected)
+		self.assertEqual(self.db.countStockItemsByCategory(grandChild), 1)
+		self.assertEqual(self.db.purge(), expected)
+		self.assertIsNone(self.db.getCategory(grandChild.getId()))
+		self.assertIsNone(self.db.getStockItem(lost.getId()))
+		self.assertEqual(len(self.db.getAllStockItems()), 1)
+		self.assertEqual(keep.getOrigins()[0].supplier, Entity.NO_ID)
+		self.assertFalse(any(self.db.purge().values()))
+
+class Test_Copy(DatabaseTestCase):
+	def setUp(self):
+		super().setUp()
+		StockImporter(self.db).importCsv(io.StringIO(
+			"name,category,part,supplier,price,location,quantity\n"
+			"R1,a/b,R1,Shop,0.5,Box,10\n"
+			"R2,a/b/c,R2,Shop,0.7,Box,20\n"
+			"X,x,X,,,,1\n"))
+		self.r1, self.r2, self.x = self.db.getAllStockItems()
+		self.db.modifyParameter(Parameter("Value",
+			parentType=Parameter.PTYPE_STOCKITEM,
+			parent=self.r1, data="10k"))
+
+	def test_copyStockItem(self):
+		target = self.x.getCategory()
+		copy = self.db.copyStockItem(self.r1, target)
+		self.assertNotEqual(copy.getId(), self.r1.getId())
+		self.assertEqual(copy.getName(), "R1")
+		self.assertEqual(copy.getCategory(), target)
+		self.assertNotEqual(copy.getPart(), self.r1.getPart())
+		self.assertEqual(copy.getPart().getName(), "R1")
+		self.assertEqual(copy.getPart().getCategory(), target)
+		origin = copy.getOrigins()[0]
+		self.assertEqual(origin.getPrice(), 0.5)
+		self.assertEqual(origin.getSupplier(),
+				 self.r1.getOrigins()[0].getSupplier())
+		self.assertEqual(copy.getGlobalQuantity(), 0)
+		self.assertEqual(len(copy.getStorages()), 1)
+		self.assertEqual(self.db.getParameterByParent("Value",
+				 Parameter.PTYPE_STOCKITEM, copy).getDataString(), "10k")
+		self.assertEqual(self.db.countStockItemsByCategory(target), 2)
+
+		copy = self.db.copyStockItem(self.r1, target, copyQuantities=True)
+		self.assertEqual(copy.getGlobalQuantity(), 10)
+		with self.assertRaises(PartMgrError):
+			self.db.copyStockItem(1000, target)
+
+	def test_copyCategorySubtree(self):
+		a = self.r1.getCategory().getParent()
+		b = self.r1.getCategory()
+		copy = self.db.copyCategorySubtree(b, a)
+		self.assertNotEqual(copy, b)
+		self.assertEqual(copy.getName(), "b")
+		self.assertEqual(copy.getParent(), a)
+		items = copy.getChildStockItems()
+		self.assertEqual([ s.getName() for s in items ], [ "R1" ])
+		self.assertEqual(items[0].getPart().getCategory(), copy)
+		self.assertEqual(self.db.getParameterByParent("Value",
+				 Parameter.PTYPE_STOCKITEM, items[0]).getDataString(), "10k")
+		c, = copy.getChildCategories()
+		self.assertEqual(c.getName(), "c")
+		items = c.getChildStockItems()
+		self.assertEqual([ s.getName() for s in items ], [ "R2" ])
+		self.assertEqual(items[0].getOrigins()[0].getPrice(), 0.7)
+		self.assertEqual(items[0].getPart().getCategory(), c)
+		self.assertEqual(len(self.db.getAllStockItems()), 5)
+
+		# Copy into the own subtree.
+		copy = self.db.copyCategorySubtree(a, b)
+		self.assertEqual(copy.getParent(), b)
+		self.assertEqual(len(self.db.getAllStockItems()), 9)
+		self.assertFalse(any(self.db.purge(dryRun=True).values()))
+
+class Test_Move(DatabaseTestCase):
+	def test_moveStockItems(self):
+		StockImporter(self.db).importCsv(io.StringIO(
+			"name,category,part\n"
+			"R1,a,R\n"
+			"R2,a,R\n"
+			"C1,a,C\n"
+			"X,b,X\n"))
+		r1, r2, c1, x = self.db.getAllStockItems()
+		a, b = self.db.getRootCategories()
+		self.db.moveStockItems([ r1, c1.getId() ], b)
+		self.assertEqual([ s.getName() for s in b.getChildStockItems() ],
+				 [ "R1", "C1", "X" ])
+		self.assertEqual(self.db.countStockItemsByCategory(a), 1)
+		# Part R is still used by R2 in 'a'. Part C moved along.
+		self.assertEqual(self.db.getStockItem(r1.getId()).getPart().getCategory(), a)
+		self.assertEqual(self.db.getStockItem(c1.getId()).getPart().getCategory(), b)
+		self.db.moveStockItems([ r2 ], b)
+		self.assertEqual(self.db.getStockItem(r2.getId()).getPart().getCategory(), b)
+		with self.assertRaises(PartMgrError):
+			self.db.moveStockItems([ r2 ], None)
+		# Without the parts.
+		self.db.moveStockItems([ x ], a, moveParts=False)
+		self.assertEqual(self.db.getStockItem(x.getId()).getCategory(), a)
+		self.assertEqual(self.db.getStockItem(x.getId()).getPart().getCategory(), b)
+
+	def test_moveCategory(self):
+		a = Category("a")
+		self.db.modifyCategory(a)
+		b = Category("b", parent=a)
+		self.db.modifyCategory(b)
+		c = Category("c", parent=b)
+		self.db.modifyCategory(c)
+		with self.assertRaises(PartMgrError):
+			self.db.moveCategory(a, c)
+		with self.assertRaises(PartMgrError):
+			self.db.moveCategory(a, a)
+		self.db.moveCategory(c, None)
+		self.assertEqual(len(self.db.getRootCategories()), 2)
+		self.db.moveCategory(a, c)
+		self.assertEqual(self.db.getCategory(a.getId()).parent, c.getId())
+		self.assertEqual([ cat.getId() for cat in self.db.getRootCategories() ],
+				 [ c.getId() ])
+
+class Test_GlobalStats(DatabaseTestCase):
+	def test_stats(self):
+		StockImporter(self.db).importCsv(io.StringIO(
+			"name,category,supplier,price,priceFact,location,quantity,minQuantity\n"
+			"a,x,s1,2.0,1,l1,3,5\n"
+			"b,x,s1,1.0,0.5,l2,4,0\n"
+			"c,x/y,,,,l1,1,0\n"))
+		stats = self.db.getGlobalStats()
+		self.assertEqual(stats.counts["stock"], 3)
+		self.assertEqual(stats.counts["categories"], 2)
+		self.assertEqual(stats.belowMinimum, 1)
+		self.assertEqual(stats.withoutPrice, 1)
+		self.assertEqual(stats.totalQuantity, 8)
+		self.assertEqual(stats.inventoryValue, { "EUR" : 8.0 })
+		self.assertEqual([ s[1:] for s in stats.suppliers ], [ ("s1", 2, 2) ])
+		self.assertEqual([ l[1:] for l in stats.locations ],
+				 [ ("l1", 2, 4), ("l2", 1, 4) ])
+		self.assertEqual([ c[1:] for c in stats.largestCategories ],
+				 [ ("x", 2), ("y", 1) ])
+
+	def test_withoutPrice(self):
+		category = Category("c")
+		self.db.modifyCategory(category)
+		priced = self.makeStockItem(category, "priced", price=1.0)
+		self.makeStockItem(category, "unpriced")
+		self.makeStockItem(category, "unpriced2")
+		# Several priced origins per item and priced
+		# orphaned origins don't hide unpriced items.
+		self.db.modifyOrigin(Origin("", price=2.0, stockItem=priced,
+					    db=self.db))
+		for i in range(3):
+			self.db.modifyOrigin(Origin("", price=1.0, stockItem=4242 + i,
+						    db=self.db))
+		self.assertEqual(self.db.getGlobalStats().withoutPrice, 2)
+
+class Test_Valuation(DatabaseTestCase):
+	def test_valuation(self):
+		StockImporter(self.db).importCsv(io.StringIO(
+			"name,category,supplier,price,priceFact,location,quantity\n"
+			"a,x,s1,2.0,1,l1,3\n"
+			"a2,x,s1,1.0,0.5,l2,4\n"
+			"c,x/y,,,,l1,1\n"
+			"d,x/y/z,s2,10,0.1,l1,5\n"
+			"e,w,s1,3,1,,\n"))
+		item = self.db.getStockItemsByValue(("a",))["a"][0]
+		self.db.modifyOrigin(Origin("", price=1.5, stockItem=item, db=self.db))
+		valuation = self.db.getValuation()
+		self.assertEqual(valuation.currency, "EUR")
+		self.assertEqual([ c.path for c in valuation.categories ],
+				 [ "w", "x", "x/y", "x/y/z" ])
+		cats = { c.path : c for c in valuation.categories }
+		self.assertEqual((cats["x"].ownItems, cats["x"].ownQuantity,
+				  cats["x"].ownValue, cats["x"].ownUnpriced),
+				 (2, 7, 6.5, 0))
+		self.assertEqual((cats["x"].totalItems, cats["x"].totalQuantity,
+				  cats["x"].totalValue, cats["x"].totalUnpriced),
+				 (4, 13, 11.5, 1))
+		self.assertEqual((cats["w"].totalItems, cats["w"].totalValue),
+				 (1, 0.0))
+		self.assertEqual((valuation.totalItems, valuation.totalQuantity,
+				  valuation.totalValue, valuation.totalUnpriced),
+				 (5, 13, 11.5, 1))
+		fd = io.StringIO()
+		valuation.writeCsv(fd)
+		lines = fd.getvalue().splitlines()
+		self.assertEqual(len(lines), 6)
+		self.assertEqual(lines[2], "x,2,7,6.50,0,4,13,11.50,1")
+
+class Test_PriceHistory(DatabaseTestCase):
+	def test_history(self):
+		category = Category("c")
+		self.db.modifyCategory(category)
+		item = self.makeStockItem(category, "item")
+		origin = Origin("", stockItem=item, price=1.0,
+				priceTimeStamp=1000, db=self.db)
+		self.db.modifyOrigin(origin)
+		for stamp, price in ((2000, 3.0), (3000, 2.0),
+				     (3500, 0.5), (4000, Origin.NO_PRICE)):
+			origin.price = price
+			origin.priceStamp = stamp
+			self.db.modifyOrigin(origin)
+		origin.setPriceFact(2.0)
+		self.assertEqual(len(self.db.getPriceHistory(origin)), 6)
+		self.assertEqual([ (s.getStampInt(), p) for s, p, f in
+				   self.db.getPriceHistory(origin, 2000, 3000) ],
+				 [ (2000, 3.0), (3000, 2.0) ])
+		self.assertIsNone(self.db.getPriceAt(origin, 999))
+		self.assertEqual(self.db.getPriceAt(origin, 2500), (3.0, 1.0))
+		self.assertIsNone(self.db.getPriceAt(origin, 4000))
+		self.assertEqual(self.db.getPriceRange(origin, 1500, 3200),
+				 (1.0, 3.0))
+		self.assertEqual(self.db.getPriceRange(origin, 2500, 4000),
+				 (0.5, 3.0))
+		self.assertIsNone(self.db.getPriceRange(origin, 0, 500))
+
+		# Buckets [0, 2000) [2000, 4000)
+		self.assertEqual(self.db.compactPriceHistory(4000, 2000), 1)
+		self.assertEqual([ s.getStampInt() for s, p, f in
+				   self.db.getPriceHistory(origin, end=3999) ],
+				 [ 1000, 2000, 3500 ])
+		self.assertEqual(self.db.getPriceAt(origin, 3900), (0.5, 1.0))
+		self.assertEqual(self.db.getPriceRange(origin, 2000, 3999),
+				 (0.5, 3.0))
+
+class Test_Backup(DatabaseTestCase):
+	def test_backup(self):
+		category = Category("c")
+		self.db.modifyCategory(category)
+		self.makeStockItem(category, "item", quantity=3)
+		steps = []
+		backupPath = os.path.join(self.tmpdir.name, "backup.pmg")
+		self.db.backup(backupPath, pagesPerStep=1,
+			       progressCallback=lambda r, t: steps.append((r, t)))
+		self.assertGreater(len(steps), 1)
+		self.assertEqual(steps[-1][0], 0)
+		self.assertFalse(os.path.exists(backupPath + ".tmp"))
+		backup = Database(backupPath)
+		try:
+			self.assertEqual([ s.getName() for s in backup.getAllStockItems() ],
+					 [ "item" ])
+		finally:
+			backup.close()
+
+	def test_rotate(self):
+		backupDir = os.path.join(self.tmpdir.name, "backups")
+		os.mkdir(backupDir)
+		paths = [ self.db.backupRotated(backupDir, keep=2)
+			  for i in range(4) ]
+		self.assertEqual(sorted(os.listdir(backupDir)),
+				 sorted(os.path.basename(p) for p in paths[2:]))
+
+	def test_backupOnClose(self):
+		self.db.getGlobalParameter("backup_count").setData(1)
+		self.db.close()
+		backups = [ f for f in os.listdir(self.tmpdir.name)
+			    if f.startswith("test-") ]
+		self.assertEqual(len(backups), 1)
+
+class Test_Verify(DatabaseTestCase):
+	def test_verify(self):
+		root = Category("root")
+		self.db.modifyCategory(root)
+		a = Category("a", parent=root)
+		self.db.modifyCategory(a)
+		b = Category("b", parent=a)
+		self.db.modifyCategory(b)
+		for i in range(5):
+			self.makeStockItem(root, "item%d" % i, quantity=1, price=1.0)
+		state = self.db.verify()
+		self.assertTrue(state.isOk(), state.problems)
+
+		item = self.makeStockItem(b, "broken", quantity=1)
+		storage = item.getStorages()[0]
+		c = self.db.db.cursor()
+		c.execute("UPDATE categories SET parent=? WHERE id=?;",
+			  (b.getId(), a.getId()))
+		c.execute("UPDATE stock SET part=?, quantityUnits=? WHERE id=?;",
+			  (12345, 9999, item.getId()))
+		c.execute("UPDATE storages SET location=?, name=? "
+			  "WHERE stockItem=?;",
+			  (54321, "#invalid#", item.getId()))
+		self.db.db.commit()
+
+		self.db.VERIFY_CHUNK_SIZE = 2
+		state = self.db.verify(timeBudget=0)
+		self.assertFalse(state.done)
+		nrSteps = 1
+		while not state.done:
+			state = self.db.verify(state, timeBudget=0)
+			nrSteps += 1
+		self.assertGreater(nrSteps, 20)
+		problems = sorted((p.table, p.entityId, p.message.split(":")[0])
+				  for p in state.problems)
+		self.assertEqual(problems, sorted([
+			("categories", a.getId(), "Category cycle"),
+			("categories", b.getId(), "Category cycle"),
+			("stock", item.getId(), "Dangling part reference 12345"),
+			("stock", item.getId(), "Invalid quantity units 9999"),
+			("storages", storage.getId(), "Dangling location reference 54321"),
+			("storages", storage.getId(), "Invalid name data"),
+		]))
+
+	def test_nullReferences(self):
+		category = Category("c")
+		self.db.modifyCategory(category)
+		items = [ self.makeStockItem(category, "item%d" % i, price=1.0)
+			  for i in range(3) ]
+		origin = items[2].getOrigins()[0]
+		c = self.db.db.cursor()
+		c.execute("UPDATE stock SET category=NULL WHERE id=?;",
+			  (items[0].getId(),))
+		c.execute("UPDATE stock SET category=? WHERE id=?;",
+			  (4242, items[1].getId()))
+		c.execute("UPDATE origins SET supplier=NULL WHERE stockItem=?;",
+			  (items[2].getId(),))
+		self.db.db.commit()
+
+		steps = []
+		state = self.db.verify(timeBudget=0)
+		while not state.done:
+			steps.append(state.step)
+			state = self.db.verify(state, timeBudget=0)
+		# quick_check runs in one step per table.
+		self.assertIn('quick_check("stock")', steps)
+		self.assertIn('quick_check("origins")', steps)
+		self.assertEqual(sorted((p.table, p.entityId, p.message)
+					for p in state.problems), sorted([
+			("origins", origin.getId(), "Missing supplier reference"),
+			("stock", items[0].getId(), "Missing category reference"),
+			("stock", items[1].getId(), "Dangling category reference 4242"),
+		]))
+
+class Test_Migration(DatabaseTestCase):
+	def setUp(self):
+		DatabaseTestCase.setUp(self)
+		category = Category("c")
+		self.db.modifyCategory(category)
+		for i in range(5):
+			self.makeStockItem(category, "item%d" % i)
+		self.db.close()
+
+	def makeDatabaseClass(self, step):
+		class MigratedDatabase(Database):
+			DB_VERSION = Database.DB_VERSION + 1
+			MIGRATIONS = dict(Database.MIGRATIONS)
+			MIGRATIONS[DB_VERSION] = ("Test step", step)
+		return MigratedDatabase
+
+	def test_migrate(self):
+		def step(db, migration):
+			migration.rewriteRows("stock", ("name",),
+				lambda d: (toBase64(fromBase64(d[0]).upper()),),
+				batchSize=2)
+		progress = []
+		def callback(migration, done, total):
+			progress.append((migration.toVersion, done, total))
+		cls = self.makeDatabaseClass(step)
+		self.db = cls(self.filename, migrationCallback=callback)
+		self.assertEqual(self.db.getGlobalParameter("partmgr_db_version").getDataInt(),
+				 cls.DB_VERSION)
+		self.assertEqual(sorted(s.getName() for s in self.db.getAllStockItems()),
+				 [ "ITEM%d" % i for i in range(5) ])
+		v = cls.DB_VERSION
+		self.assertEqual(progress, [ (v, 0, 0), (v, 2, 5), (v, 4, 5),
+					     (v, 5, 5), (v, 0, 0) ])
+		self.assertTrue(os.path.exists("%s.v%d.bak" % (self.filename, v - 1)))
+
+	def test_rollback(self):
+		def step(db, migration):
+			migration.rewriteRows("stock", ("name",),
+				lambda d: (toBase64("x"),))
+			raise PartMgrError("Migration failed")
+		with self.assertRaises(PartMgrError):
+			self.makeDatabaseClass(step)(self.filename)
+		self.db = Database(self.filename)
+		self.assertEqual(self.db.getGlobalParameter("partmgr_db_version").getDataInt(),
+				 Database.DB_VERSION)
+		self.assertEqual(sorted(s.getName() for s in self.db.getAllStockItems()),
+				 [ "item%d" % i for i in range(5) ])
+
+	def schema(self, filename, type):
+		conn = sqlite3.connect(filename)
+		try:
+			return sorted(conn.execute("SELECT name, sql FROM sqlite_master "
+						   "WHERE type=?;", (type,)).fetchall())
+		finally:
+			conn.close()
+
+	def test_fromVersion1(self):
+		filename = os.path.join(self.tmpdir.name, "v1.pmg")
+		shutil.copyfile(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+					     "..", "example.pmg"), filename)
+		self.assertEqual(self.schema(filename, "trigger"), [])
+		with contextlib.redirect_stdout(io.StringIO()):
+			db = Database(filename)
+		try:
+			self.assertEqual(db.getGlobalParameter("partmgr_db_version").getDataInt(),
+					 Database.DB_VERSION)
+			origins = [ o for s in db.getAllStockItems()
+				    for o in db.getOriginsByStockItem(s) if o.hasPrice() ]
+			self.assertEqual(len(origins), 7)
+			for o in origins:
+				self.assertEqual(db.getPriceHistory(o)[0][1:3],
+						 (o.getPrice(), o.getPriceFact()))
+			stockItem = db.getAllStockItems()[0]
+			seq = db.getChangeSeq()
+			stockItem.setMinQuantity(stockItem.getMinQuantity() + 1)
+			self.assertEqual([ c[1:4] for c in db.changesSince(seq) ],
+					 [ ("stock", stockItem.getId(), Database.CHANGE_UPDATE) ])
+		finally:
+			db.close()
+		# The migrated schema equals the schema of a new database.
+		for type in ("index", "trigger"):
+			self.assertEqual(self.schema(filename, type),
+					 self.schema(self.filename, type))
+
+class Test_Profiler(DatabaseTestCase):
+	def test_profile(self):
+		category = Category("c")
+		self.db.modifyCategory(category)
+		for i in range(3):
+			self.makeStockItem(category, "item%d" % i)
+		profiler = self.db.enableProfiling()
+		self.assertEqual(len(self.db.getAllStockItems()), 3)
+		self.assertEqual(len(list(self.db.iterStockItems(category))), 3)
+		self.db.getGlobalQuantities()
+		stats = { s.name : s for s in profiler.getStats() }
+		self.assertEqual(stats["getAllStockItems"].calls, 1)
+		self.assertEqual(stats["getAllStockItems"].rows, 3)
+		self.assertEqual(stats["iterStockItems"].calls, 2)
+		self.assertEqual(stats["iterStockItems"].rows, 6)
+		self.assertEqual(stats["getGlobalQuantities"].statements, 1)
+		self.assertIn("GROUP BY stockItem",
+			      list(stats["getGlobalQuantities"].sql)[0])
+		self.assertGreater(stats["getAllStockItems"].getPercentile(99), 0.0)
+		fd = io.StringIO()
+		profiler.dump(fd)
+		self.assertIn("getGlobalQuantities", fd.getvalue())
+
+		self.db.disableProfiling()
+		profiler.reset()
+		self.db.getAllStockItems()
+		self.assertEqual(profiler.getStats(), [])
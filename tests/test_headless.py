@@ -0,0 +1,59 @@
+from partmgr_tstlib import *
+
+import os
+import subprocess
+import sys
+
+
+class Test_Headless(TestCase):
+	# Maximum time for importing the core modules, in seconds.
+	IMPORT_BUDGET = 0.5
+
+	CORE_MODULES = (
+		"partmgr.core.database",
+		"partmgr.core.asyncdatabase",
+		"partmgr.core.importer",
+		"partmgr.core.bom",
+		"partmgr.core.planner",
+		"partmgr.core.profiler",
+	)
+
+	# Runs in a new interpreter with the Qt bindings made unimportable.
+	SCRIPT = """
+import sys, time
+class QtBlocker:
+	def find_spec(self, name, path=None, target=None):
+		if name.split(".")[0] in ("PySide6", "PyQt6"):
+			raise ImportError("Qt is not available: " + name)
+		return None
+sys.meta_path.insert(0, QtBlocker())
+start = time.perf_counter()
+for module in sys.argv[1:]:
+	__import__(module)
+elapsed = time.perf_counter() - start
+from partmgr.core.database import *
+db = Database(":memory:")
+footprint = Footprint("fp", image=Image(b"\\x89PNG"))
+db.modifyFootprint(footprint)
+assert db.getFootprint(footprint.getId()).getImage().toBytes() == b"\\x89PNG"
+db.close()
+qt = [ m for m in sys.modules if m.split(".")[0] in ("PySide6", "PyQt6") ]
+assert not qt, qt
+print(elapsed)
+"""
+
+	def test_importWithoutQt(self):
+		rootdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+		env = dict(os.environ)
+		env["PYTHONPATH"] = os.pathsep.join(
+			p for p in (rootdir, env.get("PYTHONPATH")) if p)
+		# Best of three, to be robust against a loaded machine.
+		times = []
+		for i in range(3):
+			proc = subprocess.run([ sys.executable, "-c", self.SCRIPT ] +
+					      list(self.CORE_MODULES),
+					      env=env, cwd=rootdir,
+					      capture_output=True, text=True)
+			self.assertEqual(proc.returncode, 0, proc.stderr)
+			times.append(float(proc.stdout.split()[-1]))
+		self.assertLess(min(times), self.IMPORT_BUDGET)
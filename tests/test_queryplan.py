@@ -0,0 +1,196 @@
+from partmgr_tstlib import *
+from partmgr.core.database import *
+from partmgr.core.profiler import *
+
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+				"..", "benchmarks"))
+from gendb import *
+
+
+class QueryPlanScenario:
+	"""Exercise the Database methods and explain each issued
+	SQL statement, while its temporary tables still exist.
+	"""
+
+	def __init__(self, db, hotTables):
+		self.db = db
+		self.hotTables = hotTables
+		# [ (method, SQL, set of scanned hot tables or error text) ]
+		self.statements = []
+		self.__profiler = None
+		self.__explaining = False
+
+	def run(self):
+		# The profiler only tracks the running method. Its trace
+		# callback is replaced, so no statement is dropped.
+		self.__profiler = DatabaseProfiler(self.db)
+		self.__profiler.enable()
+		self.db.db.set_trace_callback(self.__trace)
+		try:
+			self.__run()
+		finally:
+			self.__profiler.disable()
+		return self.statements
+
+	def __trace(self, statement):
+		if self.__explaining or\
+		   not re.match(r"^\s*(SELECT|WITH|UPDATE|DELETE|INSERT)",
+				statement, re.IGNORECASE):
+			return
+		method = self.__profiler.getCurrentMethod() or "<no method>"
+		self.__explaining = True
+		try:
+			plan = self.db.db.execute("EXPLAIN QUERY PLAN " +
+						  statement).fetchall()
+		except sqlite3.Error as e:
+			self.statements.append((method, statement, str(e)))
+			return
+		finally:
+			self.__explaining = False
+		scans = set()
+		for d in plan:
+			m = re.match(r"^SCAN (\w+)", d[3])
+			if m and m.group(1) in self.hotTables:
+				scans.add(m.group(1))
+		self.statements.append((method, statement, scans))
+
+	def __run(self):
+		db = self.db
+		root = db.getRootCategories()[0]
+		db.countRootCategories()
+		child = db.getChildCategories(root)[0]
+		db.countChildCategories(child)
+		db.getCategory(child.getId())
+		leaf = child
+		while db.countChildCategories(leaf):
+			leaf = db.getChildCategories(leaf)[0]
+		stockItems = db.getStockItemsByCategory(leaf)
+		db.countStockItemsByCategory(leaf)
+		stockItem = stockItems[0]
+		db.getStockItem(stockItem.getId())
+		origins = db.getOriginsByStockItem(stockItem)
+		storages = db.getStoragesByStockItem(stockItem)
+		db.getAllParametersByParent(Parameter.PTYPE_STOCKITEM, stockItem)
+		db.getParameterByParent("value", Parameter.PTYPE_STOCKITEM,
+					stockItem)
+		db.getGlobalParameter("currency")
+		db.getUserParameters()
+		db.getStockItemsToPurchase()
+		db.getStockItemsWithMissingPrice()
+		db.getStockItemsByValue(("R10k", "C100n"))
+		db.getGlobalQuantities(stockItems)
+		db.getStockItemsByIds(stockItems)
+		db.getFootprintNames()
+		db.getSuppliers()
+		db.getLocations()
+		db.getParts()
+		db.getPartsByCategory(leaf)
+		entities, key = db.page("StockItem", limit=100)
+		db.page("StockItem", key, limit=100)
+		db.page("StockItem", limit=100, filter={ "category" : leaf })
+		db.getChangeSeq()
+		db.changesSince(0, limit=10)
+
+		# Modifications
+		with db.transaction():
+			stockItem.minQuantity += 1
+			db.modifyStockItem(stockItem)
+			if storages:
+				storages[0].quantity += 1
+				db.modifyStorage(storages[0])
+			for origin in origins:
+				origin.price = 1.234
+				db.modifyOrigin(origin)
+				db.getPriceAt(origin, 2**31)
+				db.getPriceRange(origin, 0, 2**31)
+				db.getPriceHistory(origin)
+			newItem = StockItem("new item", category=leaf)
+			db.modifyStockItem(newItem)
+			storage = Storage("", stockItem=newItem, quantity=1)
+			db.modifyStorage(storage)
+			origin = Origin("", stockItem=newItem, price=1.0)
+			db.modifyOrigin(origin)
+			param = Parameter("value", parentType=Parameter.PTYPE_STOCKITEM,
+					  parent=newItem, data="1k")
+			db.modifyParameter(param)
+			db.delParameter(param)
+			db.delOrigin(origin)
+			db.delStorage(storage)
+			db.delStockItem(newItem)
+
+		# Bulk operations
+		db.copyStockItem(stockItem, child)
+		db.moveStockItems(stockItems[:2], child)
+		db.copyCategorySubtree(child, root)
+		db.getGlobalStats()
+		db.getValuation()
+		db.getAllStockItems()
+		db.compactPriceHistory(2**31)
+		db.verify()
+		db.purge(dryRun=True)
+
+class Test_QueryPlan(TestCase):
+	maxDiff = None
+	# Tables that must not be scanned by hot-path queries.
+	HOT_TABLES = ("stock", "storages", "origins", "parameters")
+
+	ALLOWED_SCANS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+					  "queryplan_allowed_scans.txt")
+
+	NR_STOCK_ITEMS = 2000
+
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.filename = os.path.join(self.tmpdir.name, "queryplan.pmg")
+		DatabaseGenerator(GeneratorConfig(
+			nrStockItems=self.NR_STOCK_ITEMS,
+			nrFootprints=5,
+			footprintImageSize=4)).generate(self.filename)
+		self.db = Database(self.filename)
+
+	def tearDown(self):
+		self.db.close()
+		self.tmpdir.cleanup()
+
+	@classmethod
+	def loadAllowedScans(cls):
+		"""Returns a set of (method, table) tuples.
+		"""
+		allowed = set()
+		with open(cls.ALLOWED_SCANS_FILE, "r", encoding="UTF-8") as fd:
+			for line in fd:
+				line = line.split("#", 1)[0].split()
+				if line:
+					method, table = line
+					allowed.add((method, table))
+		return allowed
+
+	def test_noHotPathScans(self):
+		statements = QueryPlanScenario(self.db, self.HOT_TABLES).run()
+		self.assertGreater(len(statements), 200)
+		unexplained = [ "%s: %s: %s" % (method, scans, " ".join(sql.split()))
+				for method, sql, scans in statements
+				if isinstance(scans, str) ]
+		self.assertEqual(unexplained, [], "Statements can not be explained")
+		allowed = self.loadAllowedScans()
+		used, violations = set(), []
+		for method, sql, scans in statements:
+			for table in sorted(scans):
+				if (method, table) in allowed:
+					used.add((method, table))
+				else:
+					violations.append("%s: SCAN %s: %s" % (
+						method, table, " ".join(sql.split())))
+		self.assertEqual(violations, [],
+				 "Unexpected full table scans. Add an index or, "
+				 "if the scan is intended, add it to %s" %\
+				 os.path.basename(self.ALLOWED_SCANS_FILE))
+		self.assertEqual(sorted(allowed - used), [],
+				 "Stale entries in %s" %\
+				 os.path.basename(self.ALLOWED_SCANS_FILE))
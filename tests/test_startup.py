@@ -0,0 +1,72 @@
+from partmgr_tstlib import *
+
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+				"..", "benchmarks"))
+from gendb import *
+from startup import *
+
+
+def haveQt():
+	for module in ("PySide6.QtWidgets", "PyQt6.QtWidgets"):
+		try:
+			__import__(module)
+			return True
+		except ImportError:
+			pass
+	return False
+
+class Test_Startup(TestCase):
+	# Maximum time from the process start until the main window
+	# is shown with a database loaded, in seconds.
+	STARTUP_BUDGET = 1.0
+
+	NR_STOCK_ITEMS = 1000
+
+	# Modules that must only be imported on first use.
+	LAZY_MODULES = (
+		"partmgr.pricefetch",
+		"partmgr.gui.pricefetch",
+		"partmgr.gui.globalstats",
+		"partmgr.gui.partstoorder",
+		"partmgr.gui.dbprofile",
+		"partmgr.gui.footprintmanage",
+		"partmgr.gui.locationmanage",
+		"partmgr.gui.suppliermanage",
+		"partmgr.gui.parametermanage",
+		"http.client",
+	)
+
+	def setUp(self):
+		if not haveQt():
+			self.skipTest("Qt is not available")
+		self.rootdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+		self.env = dict(os.environ)
+		self.env["PYTHONPATH"] = os.pathsep.join(
+			p for p in (self.rootdir, self.env.get("PYTHONPATH")) if p)
+		self.env["QT_QPA_PLATFORM"] = "offscreen"
+
+	def test_lazyModules(self):
+		proc = subprocess.run([ sys.executable, "-c",
+					"import sys\n"
+					"import partmgr.gui.mainwindow\n"
+					"print(' '.join(sys.modules))\n" ],
+				      env=self.env, cwd=self.rootdir,
+				      capture_output=True, text=True)
+		self.assertEqual(proc.returncode, 0, proc.stderr)
+		modules = set(proc.stdout.split())
+		self.assertEqual(sorted(modules.intersection(self.LAZY_MODULES)), [])
+
+	def test_startupBudget(self):
+		with tempfile.TemporaryDirectory() as tmpdir:
+			filename = os.path.join(tmpdir, "startup.pmg")
+			DatabaseGenerator(GeneratorConfig(
+				nrStockItems=self.NR_STOCK_ITEMS,
+				nrFootprints=5,
+				footprintImageSize=4)).generate(filename)
+			result = StartupBenchmark(filename, "offscreen").run(repeat=3)
+		self.assertLess(result["seconds"], self.STARTUP_BUDGET)